@@ -0,0 +1,336 @@
+"""端到端性能测试, 使用模拟的 Tree Hollow API, 不访问网络
+
+python -m benchmarks.bench --latency 0.02 --requests 200
+python -m benchmarks.bench --only render --replies 1000
+python -m benchmarks.bench --only table-rows --only flat-rows --rows 10000
+python -m benchmarks.bench --only pool --accounts 4 --account-rate 50
+python -m benchmarks.bench --only export --holes 2000
+python -m benchmarks.bench --only filter --holes 5000
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import random
+import statistics
+import tempfile
+import time
+
+from sylva.sylva import Sylva
+from sylva.sylva_async import AsyncSylva
+from sylva.sylva_render import SylvaFlatRender, SylvaRender
+from sylva.sylva_transport import RetryPolicy
+
+from .mockapi import MockTreeHollow
+
+__all__ = ["Result", "benchmarks"]
+
+
+class Result:
+    def __init__(self, name: str, latencies: list[float], elapsed: float) -> None:
+        """一项测试的结果
+
+        Args:
+            name (str): 名称
+            latencies (list[float]): 每次操作的耗时（秒）
+            elapsed (float): 总耗时（秒）
+        """
+        self.name = name
+        self.latencies = sorted(latencies)
+        self.elapsed = elapsed
+
+    def percentile(self, p: float) -> float:
+        index = min(len(self.latencies) - 1, int(len(self.latencies) * p / 100))
+        return self.latencies[index]
+
+    def asdict(self) -> dict:
+        return {
+            "name": self.name,
+            "count": len(self.latencies),
+            "elapsed": round(self.elapsed, 4),
+            "throughput": round(len(self.latencies) / self.elapsed, 1),
+            "mean": round(statistics.fmean(self.latencies) * 1000, 3),
+            "p50": round(self.percentile(50) * 1000, 3),
+            "p99": round(self.percentile(99) * 1000, 3),
+        }
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+async def asyncTimed(coro) -> float:
+    start = time.perf_counter()
+    await coro
+    return time.perf_counter() - start
+
+
+def benchFetch(mock: MockTreeHollow, args) -> Result:
+    sylva = Sylva(transport=mock.transport(), retry=RetryPolicy(backoff=0.01))
+    sylva.setToken("bench")
+    pids = [str(i % mock.holes + 1) for i in range(args.requests)]
+    start = time.perf_counter()
+    latencies = [timed(lambda: sylva.getHole(pid).json()) for pid in pids]
+    return Result("fetch", latencies, time.perf_counter() - start)
+
+
+def benchAsyncFetch(mock: MockTreeHollow, args) -> Result:
+    async def run():
+        async with AsyncSylva(
+            transport=mock.asyncTransport(), retry=RetryPolicy(backoff=0.01)
+        ) as sylva:
+            sylva.setToken("bench")
+            pids = [str(i % mock.holes + 1) for i in range(args.requests)]
+
+            async def fetch(pid):
+                (await sylva.getHole(pid)).json()
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(asyncTimed(fetch(i)) for i in pids))
+            return Result("fetch-async", latencies, time.perf_counter() - start)
+
+    return asyncio.run(run())
+
+
+def benchPagination(mock: MockTreeHollow, args) -> Result:
+    sylva = Sylva(transport=mock.transport(), retry=RetryPolicy(backoff=0.01))
+    sylva.setToken("bench")
+    latencies = []
+    start = last = time.perf_counter()
+    for _ in sylva.iterHoles(perPage=args.perPage, limit=args.holes):
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    return Result("pagination", latencies, time.perf_counter() - start)
+
+
+def benchRender(mock: MockTreeHollow, args) -> Result:
+    from rich.console import Console
+    from rich.theme import Theme
+
+    console = Console(
+        file=io.StringIO(), width=120, theme=Theme.read("theme.ini"), record=False
+    )
+    holes = [mock.hole(pid, detail=True) for pid in range(1, args.runs + 1)]
+    latencies = []
+    start = time.perf_counter()
+    for hole in holes:
+
+        def render():
+            table = SylvaRender.createContentTable()
+            table.addHole(hole)
+            cites = {i["cid"]: i for i in hole["replies"]}
+            for i in hole["replies"]:
+                table.addHoleReply(i, cites)
+            console.print(table)
+
+        latencies.append(timed(render))
+    return Result("render", latencies, time.perf_counter() - start)
+
+
+def benchFirstChunk(mock: MockTreeHollow, args) -> Result:
+    """分块输出时第一块出现的耗时, 与回复数量无关"""
+    from rich.console import Console
+    from rich.theme import Theme
+
+    console = Console(
+        file=io.StringIO(), width=120, theme=Theme.read("theme.ini"), record=False
+    )
+    holes = [mock.hole(pid, detail=True) for pid in range(1, args.runs + 1)]
+    latencies = []
+    start = time.perf_counter()
+    for hole in holes:
+
+        def render():
+            cites = {i["cid"]: i for i in hole["replies"]}
+            chunks = SylvaRender.iterContentTables(hole, hole["replies"], cites)
+            console.print(next(chunks))
+
+        latencies.append(timed(render))
+    return Result("first-chunk", latencies, time.perf_counter() - start)
+
+
+def benchRows(name: str, render: type[SylvaRender]):
+    """渲染一个有 `--rows` 条回复的树洞, 比较两种渲染器"""
+
+    def bench(mock: MockTreeHollow, args) -> Result:
+        from rich.console import Console
+        from rich.theme import Theme
+
+        console = Console(
+            file=io.StringIO(), width=120, theme=Theme.read("theme.ini"), record=False
+        )
+        hole = mock.hole(1)
+        rng = random.Random(0)
+        replies = [mock.makeReply(rng, 1, i) for i in range(args.rows)]
+        cites = {i["cid"]: i for i in replies}
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(args.rowRuns):
+
+            def run():
+                table = render.createContentTable()
+                table.addHole(hole)
+                for i in replies:
+                    table.addHoleReply(i, cites)
+                console.print(table)
+
+            latencies.append(timed(run))
+        return Result(name, latencies, time.perf_counter() - start)
+
+    return bench
+
+
+def benchPool(mock: MockTreeHollow, args) -> Result:
+    """每个账号限速 `--account-rate`, 吞吐量随账号数量增长"""
+    from sylva.sylva_pool import SylvaPool
+
+    async def run():
+        async with SylvaPool(
+            [f"bench{i}" for i in range(args.accounts)],
+            {"rate": args.accountRate},
+            transport=mock.asyncTransport(),
+        ) as pool:
+            pids = [str(i % mock.holes + 1) for i in range(args.requests)]
+
+            async def fetch(pid):
+                (await pool.request("getHole", pid)).json()
+
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(asyncTimed(fetch(i)) for i in pids))
+            return Result("pool", latencies, time.perf_counter() - start)
+
+    return asyncio.run(run())
+
+
+def benchImages(mock: MockTreeHollow, args) -> Result:
+    from sylva.sylva_download import SylvaDownloader
+
+    async def run():
+        async with AsyncSylva(transport=mock.asyncTransport()) as sylva:
+            sylva.setToken("bench")
+            with tempfile.TemporaryDirectory() as path:
+                downloader = SylvaDownloader(sylva, path, args.concurrency)
+                srcs = [f"holes/{i}.jpg" for i in range(args.images)]
+                start = time.perf_counter()
+                latencies = await asyncio.gather(
+                    *(asyncTimed(downloader.downloadImage(i, path)) for i in srcs)
+                )
+                return Result("images", latencies, time.perf_counter() - start)
+
+    return asyncio.run(run())
+
+
+def benchExport(mock: MockTreeHollow, args) -> Result:
+    """导出 `--holes` 个树洞的回复到 csv.gz, 每页记录一次检查点"""
+    from sylva.sylva_export import SylvaExporter
+
+    sylva = Sylva(cache=None, transport=mock.transport())
+    sylva.setToken("bench")
+    latencies = []
+    last = time.perf_counter()
+
+    class Exporter(SylvaExporter):
+        def saveCheckpoint(self, checkpoint):
+            nonlocal last
+            super().saveCheckpoint(checkpoint)
+            now = time.perf_counter()
+            # 按树洞平均分摊
+            latencies.extend([(now - last) / args.perPage] * args.perPage)
+            last = now
+
+    with tempfile.TemporaryDirectory() as path:
+        exporter = Exporter(
+            sylva,
+            f"{path}/replies.csv.gz",
+            "replies",
+            checkpointEvery=args.perPage,
+            workers=args.concurrency,
+        )
+        start = time.perf_counter()
+        exporter.export(limit=args.holes, perPage=args.perPage)
+        return Result("export", latencies, time.perf_counter() - start)
+
+
+def benchFilter(mock: MockTreeHollow, args) -> Result:
+    """翻页扫描 `--holes` 个树洞, 在本地判断组合条件"""
+    from sylva.sylva_filter import parseQuery
+
+    sylva = Sylva(transport=mock.transport())
+    sylva.setToken("bench")
+    query = parseQuery(
+        "school=北京大学,清华大学 not tag=吐槽 (content~/天.*堂/ or replies>=60)"
+    )
+    latencies = []
+    start = last = time.perf_counter()
+    for _ in query.scan(sylva, perPage=args.perPage, scan=args.holes):
+        now = time.perf_counter()
+        latencies.append(now - last)
+        last = now
+    return Result("filter", latencies, time.perf_counter() - start)
+
+
+benchmarks = {
+    "fetch": benchFetch,
+    "fetch-async": benchAsyncFetch,
+    "pagination": benchPagination,
+    "render": benchRender,
+    "first-chunk": benchFirstChunk,
+    "table-rows": benchRows("table-rows", SylvaRender),
+    "flat-rows": benchRows("flat-rows", SylvaFlatRender),
+    "pool": benchPool,
+    "images": benchImages,
+    "export": benchExport,
+    "filter": benchFilter,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", action="append", choices=list(benchmarks))
+    parser.add_argument("--latency", type=float, default=0.005, help="请求延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟波动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, dest="errorRate")
+    parser.add_argument("--requests", type=int, default=200, help="fetch 请求数")
+    parser.add_argument("--holes", type=int, default=1000, help="分页获取的树洞数")
+    parser.add_argument("--per-page", type=int, default=50, dest="perPage")
+    parser.add_argument("--replies", type=int, default=50, help="平均回复数")
+    parser.add_argument("--runs", type=int, default=20, help="渲染的树洞数")
+    parser.add_argument("--rows", type=int, default=1000, help="渲染的回复数")
+    parser.add_argument("--row-runs", type=int, default=3, dest="rowRuns")
+    parser.add_argument("--images", type=int, default=100, help="下载的图片数")
+    parser.add_argument("--image-size", type=int, default=256 * 1024, dest="imageSize")
+    parser.add_argument("--accounts", type=int, default=4, help="pool 的账号数")
+    parser.add_argument("--account-rate", type=float, default=50, dest="accountRate")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--json", action="store_true", help="以 JSON Lines 输出")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    mock = MockTreeHollow(
+        holes=max(args.holes, args.requests),
+        replies=args.replies,
+        imageSize=args.imageSize,
+        latency=args.latency,
+        jitter=args.jitter,
+        errorRate=args.errorRate,
+    )
+    if not args.json:
+        print(f"{'name':<12}{'count':>8}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for name in args.only or benchmarks:
+        result = benchmarks[name](mock, args).asdict()
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['name']:<12}{result['count']:>8}{result['throughput']:>12}"
+                f"{result['p50']:>10}{result['p99']:>10}"
+            )
+
+
+if __name__ == "__main__":
+    main()
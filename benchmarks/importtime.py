@@ -0,0 +1,75 @@
+"""import 耗时回归测试
+
+用 `python -X importtime` 导入 sylva, 检查较慢的依赖没有在启动时被导入,
+并且 sylva 的累计导入耗时没有超出预算
+
+    python benchmarks/importtime.py --budget 150 --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# 这些模块应在首次使用时才导入
+Lazy = ["httpx", "rich", "maya", "dateparser", "pendulum", "asyncio"]
+
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importTime(statement: str) -> dict:
+    """导入一次并解析 `-X importtime` 的输出
+
+    Args:
+        statement (str): 导入语句
+
+    Returns:
+        dict: 模块 -> 累计耗时（微秒）
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=Root,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="sylva", help="计时的顶层模块")
+    parser.add_argument("--statement", default="from sylva import SylvaCLI")
+    parser.add_argument("--budget", type=float, default=150, help="预算（毫秒）")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [importTime(args.statement) for _ in range(args.runs)]
+    median = statistics.median(i[args.module] for i in runs) / 1000
+    modules = runs[-1]
+
+    print(f"{args.statement}: {median:.1f} ms (median of {args.runs})")
+    for name, cumulative in sorted(modules.items(), key=lambda i: -i[1])[: args.top]:
+        print(f"{cumulative / 1000:10.1f} ms  {name}")
+
+    failed = False
+    eager = [i for i in Lazy if i in modules]
+    if eager:
+        print(f"FAIL: 启动时导入了 {', '.join(eager)}")
+        failed = True
+    if median > args.budget:
+        print(f"FAIL: 导入耗时 {median:.1f} ms 超出预算 {args.budget} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""离线模拟的 Tree Hollow API
+
+from sylva.sylva import Sylva
+
+mock = MockTreeHollow(holes=1000, replies=50, latency=0.02)
+sylva = Sylva(transport=mock.transport())
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+
+import httpx
+
+__all__ = ["MockTreeHollow"]
+
+Words = "树洞今天天气很好考试食堂图书馆宿舍实验论文导师同学社团"
+
+
+class MockTreeHollow:
+    def __init__(
+        self,
+        holes: int = 1000,
+        replies: int = 20,
+        contentSize: int = 80,
+        imageSize: int = 64 * 1024,
+        imageRate: float = 0.2,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        errorRate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        """模拟的 Tree Hollow API, 数据由 pid 确定性生成
+
+        Args:
+            holes (int, optional): 树洞数量, pid 为 1 到 `holes`
+            replies (int, optional): 每个树洞的平均回复数
+            contentSize (int, optional): 内容的平均字数
+            imageSize (int, optional): 图片字节数
+            imageRate (float, optional): 带图片的树洞与回复比例
+            latency (float, optional): 每个请求的延迟（秒）
+            jitter (float, optional): 延迟的随机波动（秒）
+            errorRate (float, optional): 返回 503 的比例
+            seed (int, optional): 随机种子
+        """
+        self.holes = holes
+        self.replies = replies
+        self.contentSize = contentSize
+        self.imageSize = imageSize
+        self.imageRate = imageRate
+        self.latency = latency
+        self.jitter = jitter
+        self.errorRate = errorRate
+        self.seed = seed
+        self.now = int(time.time())
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        # 写操作追加的回复
+        self.extra = {}
+        self.requests = 0
+
+    def transport(self) -> httpx.MockTransport:
+        """同步传输层
+
+        Returns:
+            httpx.MockTransport: 传输层
+        """
+        return httpx.MockTransport(self.handler)
+
+    def asyncTransport(self) -> httpx.MockTransport:
+        """异步传输层
+
+        Returns:
+            httpx.MockTransport: 传输层
+        """
+        return httpx.MockTransport(self.asyncHandler)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+        return self.respond(request)
+
+    async def asyncHandler(self, request: httpx.Request) -> httpx.Response:
+        delay = self.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self.respond(request)
+
+    def delay(self) -> float:
+        with self.lock:
+            self.requests += 1
+            return max(0.0, self.latency + self.random.uniform(-1, 1) * self.jitter)
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        with self.lock:
+            failed = self.random.random() < self.errorRate
+        if failed:
+            return httpx.Response(503, json={"code": 503, "msg": "mock error"})
+
+        path = request.url.path
+        params = request.url.params
+        if request.url.host.startswith("img."):
+            return self.image(request)
+        match (request.method, path.removeprefix("/v5")):
+            case ("GET", "/holes"):
+                return self.json(self.list(params))
+            case ("GET", "/holes/detail"):
+                pid = int(params["pid"])
+                if not 1 <= pid <= self.holes:
+                    return self.json({"code": 404, "msg": "树洞不存在"})
+                return self.json(self.hole(pid, detail=True))
+            case ("POST", "/holes/replies"):
+                body = json.loads(request.content)
+                return self.json(self.reply(body))
+            case ("POST", "/holes/votes"):
+                body = json.loads(request.content)
+                vote = {
+                    "options": ["A", "B"],
+                    "results": [3, 5],
+                    "voted": body["option"],
+                }
+                return self.json(vote)
+            case ("GET", "/user/devices"):
+                devices = [
+                    {
+                        "uuid": f"device-{i}",
+                        "login_time": self.now - i * 3600,
+                        "name": f"d{i}",
+                    }
+                    for i in range(3)
+                ]
+                return self.json(devices)
+            case ("GET", "/user/notifications" | "/user/system-messages"):
+                return self.json([])
+            case ("POST" | "PUT" | "DELETE", _):
+                return httpx.Response(204)
+        return httpx.Response(404, json={"code": 404, "msg": "not found"})
+
+    def json(self, data) -> httpx.Response:
+        return httpx.Response(200, json=data)
+
+    def list(self, params) -> list:
+        perPage = int(params.get("per_page", 20))
+        after = params.get("after")
+        search = params.get("search")
+        start = int(after) - 1 if after else self.holes
+        holes = []
+        for pid in range(start, 0, -1):
+            hole = self.hole(pid)
+            if search and search not in hole["content"]:
+                continue
+            holes.append(hole)
+            if len(holes) == perPage:
+                break
+        return holes
+
+    def text(self, rng: random.Random) -> str:
+        size = max(1, int(rng.expovariate(1 / self.contentSize)))
+        return "".join(rng.choice(Words) for _ in range(size))
+
+    def hole(self, pid: int, detail: bool = False) -> dict:
+        rng = random.Random(self.seed * 1_000_003 + pid)
+        count = int(rng.expovariate(1 / self.replies)) if self.replies else 0
+        hole = {
+            "pid": pid,
+            "content": self.text(rng),
+            "created_at": self.now - (self.holes - pid + 1) * 60,
+            "followed": False,
+            "followers_count": rng.randint(0, 50),
+            "replies_count": count + len(self.extra.get(pid, [])),
+            "school_name": rng.choice(["北京大学", "清华大学", "复旦大学"]),
+        }
+        if rng.random() < 0.3:
+            hole["tag"] = rng.choice(["求助", "吐槽", "日常"])
+        if rng.random() < self.imageRate:
+            hole["image"] = {"src": f"holes/{pid}.jpg"}
+        if detail:
+            hole["replies"] = [self.makeReply(rng, pid, i) for i in range(count)]
+            hole["replies"].extend(self.extra.get(pid, []))
+        return hole
+
+    def makeReply(self, rng: random.Random, pid: int, index: int) -> dict:
+        cid = pid * 100_000 + index + 1
+        reply = {
+            "cid": cid,
+            "pid": pid,
+            "name": rng.choice(["Alice", "Bob", "Carol", "Dave", "Eve"]),
+            "school_name": rng.choice(["北京大学", "清华大学", "复旦大学"]),
+            "content": self.text(rng),
+            "created_at": self.now - rng.randint(0, 86400),
+        }
+        if index and rng.random() < 0.3:
+            reply["reply_cid"] = cid - rng.randint(1, index)
+        if rng.random() < self.imageRate:
+            reply["image"] = {"src": f"replies/{cid}.jpg"}
+        return reply
+
+    def reply(self, body: dict) -> dict:
+        pid = int(body["pid"])
+        with self.lock:
+            replies = self.extra.setdefault(pid, [])
+            reply = {
+                "cid": pid * 100_000 + 50_000 + len(replies),
+                "pid": pid,
+                "name": "Me",
+                "content": body["content"],
+                "created_at": int(time.time()),
+            }
+            # CLI 传入的 cid 是字符串, 真实的 API 返回整数
+            if body.get("reply_cid") is not None:
+                reply["reply_cid"] = int(body["reply_cid"])
+            replies.append(reply)
+        return reply
+
+    def image(self, request: httpx.Request) -> httpx.Response:
+        content = bytes(range(256)) * (self.imageSize // 256 + 1)
+        content = content[: self.imageSize]
+        if "range" in request.headers:
+            offset = int(request.headers["range"].removeprefix("bytes=").rstrip("-"))
+            return httpx.Response(206, content=content[offset:])
+        return httpx.Response(200, content=content)
@@ -1,4 +1,25 @@
+import argparse
+import sys
+
 from sylva import SylvaCLI
 
 if __name__ == "__main__":
-    SylvaCLI().main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sylva CLI")
+    parser.add_argument(
+        "-c", "--command", action="append", help="执行命令后退出, 可重复使用"
+    )
+    parser.add_argument("-b", "--batch", help="执行脚本中的命令, `-` 表示标准输入")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="批量模式并发数")
+    parser.add_argument("--debug", action="store_true", help="调试模式")
+    args = parser.parse_args()
+
+    SylvaCLI.Debug = args.debug
+    if args.command:
+        SylvaCLI().batch(args.command, args.workers)
+    elif args.batch == "-":
+        SylvaCLI().batch(sys.stdin, args.workers)
+    elif args.batch:
+        with open(args.batch) as f:
+            SylvaCLI().batch(f, args.workers)
+    else:
+        SylvaCLI().main()
@@ -0,0 +1,123 @@
+import functools
+import inspect
+
+from ._trace import tracer
+
+__all__ = ["cached", "invalidates", "formatKey"]
+
+# 参数 -> 转换, CLI 传入字符串的 pid, 转换后才能与 int 的 pid 共用缓存与请求
+Normalize = {"pid": int}
+
+
+def formatKey(key: str, arguments: dict) -> str:
+    """由方法参数填充键模板
+
+    Args:
+        key (str): 键模板, 如 `hole:{pid}`
+        arguments (dict): 参数名 -> 值
+
+    Returns:
+        str: 键
+    """
+    arguments = dict(arguments)
+    for k, convert in Normalize.items():
+        if k in arguments:
+            try:
+                arguments[k] = convert(arguments[k])
+            except (TypeError, ValueError):
+                pass
+    return key.format(**arguments)
+
+
+def cached(key: str):
+    """缓存响应, `self.cache` 为 `None` 时不缓存
+
+    Args:
+        key (str): 缓存键模板, 如 `hole:{pid}`, 由方法参数填充
+    """
+
+    def warpperA(func):
+        signature = inspect.signature(func)
+
+        def makeKey(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            return formatKey(key, bound.arguments)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def warpperB(self, *args, **kwargs):
+                if self.cache is None:
+                    return await func(self, *args, **kwargs)
+                name = makeKey(self, *args, **kwargs)
+                res = await self.cache.getAsync(name)
+                tracer.annotate(cached=res is not None)
+                if res is None:
+                    version = self.cache.version(name)
+                    res = await func(self, *args, **kwargs)
+                    await self.cache.setAsync(name, res, version)
+                return res
+
+        else:
+
+            @functools.wraps(func)
+            def warpperB(self, *args, **kwargs):
+                if self.cache is None:
+                    return func(self, *args, **kwargs)
+                name = makeKey(self, *args, **kwargs)
+                res = self.cache.get(name)
+                tracer.annotate(cached=res is not None)
+                if res is None:
+                    version = self.cache.version(name)
+                    res = func(self, *args, **kwargs)
+                    self.cache.set(name, res, version)
+                return res
+
+        return warpperB
+
+    return warpperA
+
+
+def invalidates(*keys: str):
+    """写操作后使缓存失效, 并且之后的读请求不再合并到写之前发出的请求
+
+    Args:
+        keys (str): 缓存键模板, 以 `:` 结尾的键按前缀失效, 如 `holes:`
+    """
+
+    def warpperA(func):
+        signature = inspect.signature(func)
+
+        def makeKeys(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            return [formatKey(key, bound.arguments) for key in keys]
+
+        def invalidate(self, *args, **kwargs):
+            for name in makeKeys(self, *args, **kwargs):
+                self.flights.forget(name)
+                if self.cache is not None:
+                    self.cache.invalidate(name)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def warpperB(self, *args, **kwargs):
+                res = await func(self, *args, **kwargs)
+                for name in makeKeys(self, *args, **kwargs):
+                    self.flights.forget(name)
+                    if self.cache is not None:
+                        await self.cache.invalidateAsync(name)
+                return res
+
+        else:
+
+            @functools.wraps(func)
+            def warpperB(self, *args, **kwargs):
+                res = func(self, *args, **kwargs)
+                invalidate(self, *args, **kwargs)
+                return res
+
+        return warpperB
+
+    return warpperA
@@ -0,0 +1,240 @@
+import re
+from typing import Callable
+
+from ._exception import UnknownCommand
+
+__all__ = ["tokenize", "Registry", "toSet", "toBool", "toChoice"]
+
+# 一个参数由若干段组成, 如 `a"b c"` 为 `ab c`
+Token = re.compile(
+    r"""\s*(?:(?P<sep>;)|(?P<word>(?:[^\s'"\\;]+|'[^']*'|"(?:[^"\\]|\\.)*"|\\.)+)"""
+    r"""|(?P<bad>\S))""",
+    re.DOTALL,
+)
+Piece = re.compile(r"""'([^']*)'|"((?:[^"\\]|\\.)*)"|\\(.)|([^'"\\]+)""", re.DOTALL)
+# 双引号中只有这些字符可以转义, 与 shell 相同
+Escaped = re.compile(r"""\\([\\"])""")
+Special = re.compile(r"""['"\\;]""")
+
+
+def tokenize(line: str) -> list[list[str]]:
+    """拆分一行命令, 引号与反斜杠的规则与 shell 相同, `;` 分隔多条命令
+
+    Args:
+        line (str): 一行命令
+
+    Raises:
+        UnknownCommand: 引号不匹配
+
+    Returns:
+        list[list[str]]: 每条命令的参数, 不包含空命令
+    """
+    # 大多数命令没有引号
+    if Special.search(line) is None:
+        args = line.split()
+        return [args] if args else []
+    commands, args = [], []
+    for match in Token.finditer(line):
+        if match["sep"] is not None:
+            if args:
+                commands.append(args)
+            args = []
+        elif match["word"] is not None:
+            args.append(unquote(match["word"]))
+        elif match["bad"] is not None:
+            raise UnknownCommand(f"引号不匹配：{line}")
+    if args:
+        commands.append(args)
+    return commands
+
+
+def unquote(word: str) -> str:
+    if Special.search(word) is None:
+        return word
+    pieces = []
+    for single, double, escaped, plain in Piece.findall(word):
+        if single or double or escaped or plain:
+            pieces.append(plain or single or escaped or Escaped.sub(r"\1", double))
+    return "".join(pieces)
+
+
+def toSet(value: str) -> set[str]:
+    """逗号分隔的多个值, 如 `Alice,Bob`"""
+    return {i for i in value.split(",") if i}
+
+
+def toBool(value: str) -> bool:
+    """`yes`, `no`, `true`, `false`, `on`, `off`, `1` 或 `0`"""
+    match value.lower():
+        case "yes" | "true" | "on" | "1":
+            return True
+        case "no" | "false" | "off" | "0":
+            return False
+    raise ValueError(value)
+
+
+def toChoice(*choices: str) -> Callable[[str], str]:
+    """只能取 `choices` 中的一个值, 用于选项, 参数使用 `<name:a|b>`"""
+
+    def convert(value: str) -> str:
+        if value not in choices:
+            raise ValueError(value)
+        return value
+
+    return convert
+
+
+class Command:
+    def __init__(self, usage: str, func: Callable, readOnly: bool, types: dict) -> None:
+        """一条命令, 用法如 `r|reply <pid> [cid] <content>`
+
+        `<name>` 为必需参数, `[name]` 为可选参数, `<name...>` 为一个或多个参数,
+        `<name:a|b>` 只能取 `a` 或 `b`. 选项写作 `key=value` 或 `--key value`,
+        可以出现在任意位置, 其余单词都是参数, `--` 之后的单词都是参数
+
+        Args:
+            usage (str): 用法, 开头的单词为命令名, `|` 分隔别名
+            func (Callable): 执行命令的方法, 参数按名称传入
+            readOnly (bool): 是否只读, 只读命令在批量模式下可以并发执行
+            types (dict): 参数与选项 -> 类型转换函数, 未列出的参数为 `str`,
+                只有列出的名称可以作为选项
+        """
+        self.usage = usage
+        self.func = func
+        self.readOnly = readOnly
+        self.types = types
+        self.names = []
+        # (名称, 是否必需, 可选值)
+        self.positional = []
+        self.varargs = None
+        for word in usage.split():
+            if word[0] not in "<[":
+                self.names.append(word.split("|"))
+                continue
+            name, _, choices = word[1:-1].partition(":")
+            if name.endswith("..."):
+                self.varargs = name[:-3]
+            else:
+                choices = set(choices.split("|")) if choices else None
+                self.positional.append((name, word[0] == "<", choices))
+        self.required = sum(i[1] for i in self.positional)
+
+    def keys(self) -> list[tuple[str, ...]]:
+        """命令名的所有组合, 如 `("a", "list")` 与 `("archive", "list")`"""
+        keys = [()]
+        for alternatives in self.names:
+            keys = [(*k, i) for k in keys for i in alternatives]
+        return keys
+
+    def convert(self, name: str, value: str):
+        try:
+            return self.types.get(name, str)(value)
+        except ValueError:
+            raise UnknownCommand(f"{name} 的值无效：{value}") from None
+
+    def bind(self, args: list[str]) -> tuple[list, dict]:
+        """把参数与选项转换为方法的参数
+
+        Args:
+            args (list[str]): 命令名之后的参数
+
+        Raises:
+            UnknownCommand: 参数数量不对、未知选项或值无效
+
+        Returns:
+            tuple[list, dict]: 位置参数与关键字参数
+        """
+        # 只有明确写成选项的才是选项, 与选项同名的单词仍然是参数
+        values, options = [], []
+        words = iter(args)
+        for word in words:
+            if word == "--":
+                values.extend(words)
+                break
+            key, sep, value = word.removeprefix("--").partition("=")
+            if word.startswith("--"):
+                if not sep:
+                    value = next(words, None)
+                    if value is None:
+                        raise UnknownCommand(f"选项 {key} 缺少值")
+                if key not in self.types:
+                    raise UnknownCommand(f"未知选项：{key}")
+                options.append((key, value))
+            elif sep and key in self.types:
+                options.append((key, value))
+            else:
+                values.append(word)
+        count = len(values)
+        minimum = self.required + (self.varargs is not None)
+        if count < minimum:
+            raise UnknownCommand(f"缺少参数：{self.usage}")
+
+        kwargs = {}
+        extra = count - self.required
+        for name, required, choices in self.positional:
+            if not required:
+                if extra <= 0:
+                    continue
+                extra -= 1
+            value = values.pop(0)
+            if choices is not None and value not in choices:
+                raise UnknownCommand(f"{name} 只能是 {'、'.join(sorted(choices))}")
+            kwargs[name] = self.convert(name, value)
+        if values and self.varargs is None:
+            raise UnknownCommand(f"参数过多：{self.usage}")
+        varargs = [self.convert(self.varargs, i) for i in values]
+
+        for key, value in options:
+            if key in kwargs:
+                raise UnknownCommand(f"重复的选项：{key}")
+            kwargs[key] = self.convert(key, value)
+        return varargs, kwargs
+
+
+class Registry:
+    def __init__(self) -> None:
+        """命令表, 在类中用 `register` 装饰执行命令的方法"""
+        # 命令名 -> 命令
+        self.commands = {}
+
+    def register(self, usage: str, readOnly: bool = False, **types):
+        """注册命令
+
+        Args:
+            usage (str): 用法, 见 `Command`
+            readOnly (bool, optional): 是否只读
+            types: 参数与选项 -> 类型转换函数
+        """
+
+        def warpperA(func):
+            command = Command(usage, func, readOnly, types)
+            for key in command.keys():
+                self.commands[key] = command
+            return func
+
+        return warpperA
+
+    def find(self, args: list[str]) -> tuple[Command, list[str]]:
+        """查找命令, 优先匹配更长的命令名, 如 `cache clear` 优先于 `cache`
+
+        Args:
+            args (list[str]): 参数
+
+        Raises:
+            UnknownCommand: 未知命令
+
+        Returns:
+            tuple[Command, list[str]]: 命令与命令名之后的参数
+        """
+        for length in (2, 1):
+            command = self.commands.get(tuple(args[:length]))
+            if command is not None and len(args) >= length:
+                return command, args[length:]
+        raise UnknownCommand(f"未知命令：{' '.join(args)}")
+
+    def readOnly(self, args: list[str]) -> bool:
+        """命令是否只读, 未知命令不是只读的"""
+        try:
+            return self.find(args)[0].readOnly
+        except UnknownCommand:
+            return False
@@ -1,4 +1,10 @@
-__all__ = ["LoginError", "UnknownCommand", "UnexpectedCode"]
+__all__ = [
+    "LoginError",
+    "UnknownCommand",
+    "UnexpectedCode",
+    "IncompleteDownload",
+    "InvalidQuery",
+]
 
 
 class LoginError(Exception):
@@ -14,3 +20,13 @@ class UnknownCommand(Exception):
 class UnexpectedCode(Exception):
     def __init__(self, *args):
         super().__init__(*args)
+
+
+class IncompleteDownload(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
+
+
+class InvalidQuery(Exception):
+    def __init__(self, *args):
+        super().__init__(*args)
@@ -0,0 +1,137 @@
+import functools
+import inspect
+import threading
+
+from ._cache import formatKey
+from ._trace import tracer
+
+__all__ = ["SingleFlight", "coalesced"]
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        """合并相同的并发请求, 同一时刻相同的键只发出一个请求, 其余调用等待并共享结果"""
+        self.lock = threading.Lock()
+        # 键 -> 正在进行的调用
+        self.calls = {}
+        # 共享了结果的调用次数
+        self.shared = 0
+
+    def do(self, key: str, func, *args, **kwargs):
+        """执行或等待相同键的调用
+
+        Args:
+            key (str): 键
+            func: 函数
+
+        Returns:
+            函数的返回值, 函数抛出的异常会在所有等待者中抛出
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is None:
+                call = self.calls[key] = {"done": threading.Event()}
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+        if not leader:
+            tracer.annotate(coalesced=True)
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = func(*args, **kwargs)
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                if self.calls.get(key) is call:
+                    del self.calls[key]
+            call["done"].set()
+
+    async def doAsync(self, key: str, func, *args, **kwargs):
+        """执行或等待相同键的异步调用
+
+        Args:
+            key (str): 键
+            func: 异步函数
+
+        Returns:
+            函数的返回值, 函数抛出的异常会在所有等待者中抛出
+        """
+        import asyncio
+
+        future = self.calls.get(key)
+        if future is not None:
+            self.shared += 1
+            tracer.annotate(coalesced=True)
+            # 等待者被取消时不影响其他调用
+            return await asyncio.shield(future)
+        future = self.calls[key] = asyncio.ensure_future(func(*args, **kwargs))
+        future.add_done_callback(lambda _: self._remove(key, future))
+        return await asyncio.shield(future)
+
+    def forget(self, key: str) -> None:
+        """之后的调用不再等待正在进行的调用, 写操作后使用, 避免读到写之前的结果
+
+        Args:
+            key (str): 键, 以 `:` 结尾时包括所有以其开头的键
+        """
+        with self.lock:
+            if key.endswith(":"):
+                for i in [i for i in self.calls if i.startswith(key)]:
+                    del self.calls[i]
+            else:
+                self.calls.pop(key, None)
+
+    def _remove(self, key: str, call) -> None:
+        with self.lock:
+            if self.calls.get(key) is call:
+                del self.calls[key]
+
+    @property
+    def stats(self) -> dict:
+        """合并统计
+
+        Returns:
+            dict: 正在进行的请求数与共享结果的次数
+        """
+        return {"inflight": len(self.calls), "coalesced": self.shared}
+
+
+def coalesced(key: str):
+    """合并相同的并发读请求, 不要用于写操作
+
+    Args:
+        key (str): 键模板, 如 `hole:{pid}`, 由方法参数填充
+    """
+
+    def warpperA(func):
+        signature = inspect.signature(func)
+
+        def makeKey(self, *args, **kwargs):
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            return formatKey(key, bound.arguments)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def warpperB(self, *args, **kwargs):
+                name = makeKey(self, *args, **kwargs)
+                return await self.flights.doAsync(name, func, self, *args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def warpperB(self, *args, **kwargs):
+                name = makeKey(self, *args, **kwargs)
+                return self.flights.do(name, func, self, *args, **kwargs)
+
+        return warpperB
+
+    return warpperA
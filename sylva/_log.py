@@ -1,18 +1,41 @@
 import logging
 
-from rich.logging import RichHandler
-from rich.traceback import install
+__all__ = ["log", "installTraceback"]
 
-__all__ = ["log"]
 
-install()
+class LazyRichHandler(logging.Handler):
+    """首次输出日志时才导入 rich"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.handler = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.handler is None:
+            from rich.console import Console
+            from rich.logging import RichHandler
+
+            # 日志输出到 stderr, 以免混入批量模式的 stdout
+            self.handler = RichHandler(
+                console=Console(stderr=True), rich_tracebacks=True
+            )
+            self.handler.setFormatter(self.formatter)
+        self.handler.handle(record)
+
+
+def installTraceback() -> None:
+    """使用 rich 显示异常, 仅在调试时安装"""
+    from rich.traceback import install
+
+    install()
+
 
 FORMAT = "%(message)s"
 logging.basicConfig(
     level="INFO",
     format=FORMAT,
     datefmt="[%X]",
-    handlers=[RichHandler(rich_tracebacks=True)],
+    handlers=[LazyRichHandler()],
 )
 
 log = logging.getLogger("rich")
@@ -0,0 +1,92 @@
+import heapq
+from typing import AsyncIterator, Iterable
+
+from ._exception import UnexpectedCode
+
+__all__ = ["checkPage", "takePage", "mergeHoles"]
+
+
+def checkPage(got) -> list:
+    """检查一页树洞列表
+
+    Args:
+        got: `getHoles` 响应解析后的结果
+
+    Raises:
+        UnexpectedCode: 异常
+
+    Returns:
+        list: 树洞列表
+    """
+    if "code" in got:
+        raise UnexpectedCode(got)
+    return got
+
+
+def takePage(
+    page: list, limit: int = None, since: int = None, untilPid: int = None
+) -> tuple[list, bool]:
+    """按停止条件截取一页树洞
+
+    Args:
+        page (list): 一页树洞
+        limit (int, optional): 最多还能返回的数量
+        since (int, optional): 只返回 `created_at` 不早于 `since` 的树洞
+        untilPid (int, optional): 遇到不大于 `untilPid` 的 pid 时停止
+
+    Returns:
+        tuple[list, bool]: 截取后的树洞和是否应当停止
+    """
+    stop = False
+    for index, hole in enumerate(page):
+        if (since is not None and hole["created_at"] < since) or (
+            untilPid is not None and int(hole["pid"]) <= untilPid
+        ):
+            page, stop = page[:index], True
+            break
+    if limit is not None and len(page) >= limit:
+        return page[:limit], True
+    return page, stop
+
+
+async def mergeHoles(
+    iterators: Iterable[AsyncIterator[dict]], limit: int = None
+) -> AsyncIterator[dict]:
+    """按 `created_at` 从新到旧多路归并多个树洞列表, 按 pid 去重
+
+    各列表的第一页并发获取, 之后只在某一路被取空时才等待该路
+
+    Args:
+        iterators (Iterable[AsyncIterator[dict]]): 各自从新到旧排列的树洞
+        limit (int, optional): 最多返回的数量
+
+    Yields:
+        AsyncIterator[dict]: 树洞
+    """
+    import asyncio
+
+    iterators = list(iterators)
+    heap = []
+
+    async def pull(index):
+        try:
+            hole = await anext(iterators[index])
+        except StopAsyncIteration:
+            return
+        # index 避免比较字典
+        heapq.heappush(heap, (-hole["created_at"], -int(hole["pid"]), index, hole))
+
+    try:
+        await asyncio.gather(*(pull(i) for i in range(len(iterators))))
+        seen = set()
+        while heap and (limit is None or limit > 0):
+            _, _, index, hole = heapq.heappop(heap)
+            if hole["pid"] not in seen:
+                seen.add(hole["pid"])
+                yield hole
+                if limit is not None:
+                    limit -= 1
+            await pull(index)
+    finally:
+        for i in iterators:
+            await i.aclose()
@@ -0,0 +1,73 @@
+import functools
+import time
+
+__all__ = ["slangTime"]
+
+# 平均每月天数
+DaysOfMonth = 365.25 / 12
+
+
+@functools.lru_cache(maxsize=1024)
+def phrase(unit: str, count: int, future: bool) -> str:
+    """生成相对时间描述, 与 `maya.MayaDT.slang_time` 的英文格式一致
+
+    Args:
+        unit (str): 单位
+        count (int): 数量
+        future (bool): 是否在未来
+
+    Returns:
+        str: 相对时间描述
+    """
+    if unit == "few":
+        text = "a few seconds"
+    else:
+        text = f"{count} {unit}" if count == 1 else f"{count} {unit}s"
+    return f"in {text}" if future else f"{text} ago"
+
+
+def slangTime(timestamp: int, now: float = None) -> str:
+    """将时间戳转换为相对时间, 如 `3 hours ago`
+
+    按 pendulum 的 `diff_for_humans` 规则取整, 月按平均天数、年按 365 天计算
+
+    Args:
+        timestamp (int): 时间戳（秒）
+        now (float, optional): 当前时间戳, 渲染多行时应只取一次
+
+    Returns:
+        str: 相对时间描述
+    """
+    if now is None:
+        now = time.time()
+    delta = int(now) - int(timestamp)
+    future = delta < 0
+    seconds = abs(delta)
+
+    days, seconds = divmod(seconds, 86400)
+    hours, seconds = divmod(seconds, 3600)
+    minutes, seconds = divmod(seconds, 60)
+    years, days = divmod(days, 365)
+    months = int(days / DaysOfMonth)
+    days -= int(months * DaysOfMonth)
+    weeks = days // 7
+
+    if years > 0:
+        unit, count = "year", years + (months > 6)
+    elif months == 11 and days > 15:
+        unit, count = "year", 1
+    elif months > 0:
+        unit, count = "month", months + (days >= 27)
+    elif weeks > 0:
+        unit, count = "week", weeks + (days % 7 > 3)
+    elif days > 0:
+        unit, count = "day", days + (hours >= 22)
+    elif hours > 0:
+        unit, count = "hour", hours
+    elif minutes > 0:
+        unit, count = "minute", minutes
+    elif 10 < seconds < 60:
+        unit, count = "second", seconds
+    else:
+        unit, count = "few", 0
+    return phrase(unit, count, future)
@@ -0,0 +1,218 @@
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+__all__ = ["Tracer", "tracer", "traced"]
+
+
+class Tracer:
+    # 请求结束时累加到发起请求的调用的字段
+    Rollup = ("retries", "bytes")
+
+    def __init__(self, window: int = 1024) -> None:
+        """记录每次调用的耗时、状态码、字节数、重试次数与缓存命中, 并交给导出器
+
+        调用按 (类型, 名称) 统计, 类型为 `api`（`Sylva` 的方法）、`http`（实际发出的请求,
+        包括重试与限流等待）、`decode`（解析响应）或 `render`（排版输出）
+
+        Args:
+            window (int, optional): 计算分位数时使用的最近调用数量
+        """
+        self.window = window
+        self.lock = threading.Lock()
+        # (类型, 名称) -> 统计
+        self.series = {}
+        self.exporters = []
+        self.current = contextvars.ContextVar("span", default=None)
+
+    def addExporter(self, exporter) -> None:
+        """添加导出器, 导出器需要实现 `emit(span)` 与 `flush(tracer)`
+
+        Args:
+            exporter: 导出器
+        """
+        with self.lock:
+            self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **fields):
+        """记录一次调用, 调用中可以通过 `annotate` 补充字段
+
+        Args:
+            kind (str): 类型
+            name (str): 名称
+            fields: 附加字段
+
+        Yields:
+            dict: 调用记录
+        """
+        parent = self.current.get()
+        span = {"kind": kind, "name": name, **fields}
+        token = self.current.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = type(e).__name__
+            raise
+        finally:
+            span["seconds"] = time.perf_counter() - start
+            self.current.reset(token)
+            # 实际发出的请求计入发起请求的调用
+            if parent is not None and kind == "http":
+                for key in Tracer.Rollup:
+                    if key in span:
+                        parent[key] = parent.get(key, 0) + span[key]
+                if "status" in span:
+                    parent.setdefault("status", span["status"])
+            self.record(span)
+
+    def annotate(self, **fields) -> None:
+        """向当前调用补充字段, 不在调用中时忽略
+
+        Args:
+            fields: 字段
+        """
+        span = self.current.get()
+        if span is not None:
+            span.update(fields)
+
+    def record(self, span: dict) -> None:
+        """累加统计并交给导出器
+
+        Args:
+            span (dict): 调用记录
+        """
+        key = (span["kind"], span["name"])
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "seconds": 0.0,
+                    "bytes": 0,
+                    "retries": 0,
+                    "cached": 0,
+                    "statuses": {},
+                    "recent": deque(maxlen=self.window),
+                }
+            series["calls"] += 1
+            series["seconds"] += span["seconds"]
+            series["bytes"] += span.get("bytes", 0)
+            series["retries"] += span.get("retries", 0)
+            series["recent"].append(span["seconds"])
+            if "error" in span:
+                series["errors"] += 1
+            if span.get("cached"):
+                series["cached"] += 1
+            if "status" in span:
+                statuses = series["statuses"]
+                statuses[span["status"]] = statuses.get(span["status"], 0) + 1
+            exporters = list(self.exporters)
+        for exporter in exporters:
+            exporter.emit(span)
+
+    @property
+    def stats(self) -> list[dict]:
+        """各调用的统计, 耗时单位为毫秒
+
+        Returns:
+            list[dict]: 调用次数、失败次数、最近调用耗时的分位数、字节数、重试次数与缓存命中次数
+        """
+        stats = []
+        with self.lock:
+            for (kind, name), series in sorted(self.series.items()):
+                recent = sorted(series["recent"])
+                stats.append(
+                    {
+                        "kind": kind,
+                        "name": name,
+                        "calls": series["calls"],
+                        "errors": series["errors"],
+                        "p50": percentile(recent, 50) * 1000,
+                        "p90": percentile(recent, 90) * 1000,
+                        "p99": percentile(recent, 99) * 1000,
+                        "max": recent[-1] * 1000,
+                        "total": series["seconds"] * 1000,
+                        "bytes": series["bytes"],
+                        "retries": series["retries"],
+                        "cached": series["cached"],
+                        "statuses": dict(series["statuses"]),
+                    }
+                )
+        return stats
+
+    def flush(self) -> None:
+        """让导出器写出数据"""
+        for exporter in list(self.exporters):
+            exporter.flush(self)
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self.lock:
+            self.series.clear()
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    """最近秩法计算分位数
+
+    Args:
+        ordered (list[float]): 升序排列的数据
+        p (float): 百分位, 0 到 100
+
+    Returns:
+        float: 分位数, 没有数据时为 0
+    """
+    if not ordered:
+        return 0.0
+    rank = max(0, -(-len(ordered) * p // 100) - 1)
+    return ordered[int(rank)]
+
+
+def traced(kind: str = "api", name: str = None):
+    """记录方法的调用, 返回 `httpx.Response` 时记录状态码与字节数
+
+    Args:
+        kind (str, optional): 类型
+        name (str, optional): 名称, 默认为方法名
+    """
+
+    def warpperA(func):
+        spanName = name or func.__name__
+
+        def annotate(span, res):
+            if hasattr(res, "status_code"):
+                span["status"] = res.status_code
+                # 缓存或合并得到的响应没有下载, 请求已经记录了字节数时不重复计算
+                if not span.get("cached") and not span.get("coalesced"):
+                    span.setdefault("bytes", res.num_bytes_downloaded)
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def warpperB(*args, **kwargs):
+                with tracer.span(kind, spanName) as span:
+                    res = await func(*args, **kwargs)
+                    annotate(span, res)
+                    return res
+
+        else:
+
+            @functools.wraps(func)
+            def warpperB(*args, **kwargs):
+                with tracer.span(kind, spanName) as span:
+                    res = func(*args, **kwargs)
+                    annotate(span, res)
+                    return res
+
+        return warpperB
+
+    return warpperA
+
+
+tracer = Tracer()
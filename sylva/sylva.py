@@ -1,12 +1,42 @@
-import os
-from typing import Literal
+from __future__ import annotations
 
-import httpx
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterator, Literal
 
 from ._log import log
+from ._cache import cached, invalidates
+from ._flight import SingleFlight, coalesced
 from ._login import loginRequired, willLogin
+from ._paging import checkPage, takePage
+from ._trace import traced
+from .sylva_cache import SylvaCache
+
+if TYPE_CHECKING:
+    import httpx
+
+    from .sylva_transport import HTTPConfig, RetryPolicy, TokenBucket
+
+__all__ = ["Sylva", "conditionalHeaders"]
+
 
-__all__ = ["Sylva"]
+def conditionalHeaders(etag: str = None, lastModified: str = None) -> dict:
+    """条件请求的头部
+
+    Args:
+        etag (str, optional): 上次响应的 ETag
+        lastModified (str, optional): 上次响应的 Last-Modified
+
+    Returns:
+        dict: 头部
+    """
+    headers = {}
+    if etag is not None:
+        headers["if-none-match"] = etag
+    if lastModified is not None:
+        headers["if-modified-since"] = lastModified
+    return headers
 
 
 class Sylva:
@@ -15,11 +45,101 @@ class Sylva:
     Global = "00000001-0001-0001-0001-000000000001"
     School = "00000000-0000-0000-0000-000000000001"
 
-    def __init__(self) -> None:
-        self.client = httpx.Client(proxies={"all://": None})
-        self.client.headers.update({"modelname": "Sylva CLI"})
+    def __init__(
+        self,
+        cache: SylvaCache = None,
+        limiter: TokenBucket = None,
+        retry: RetryPolicy = None,
+        transport: httpx.BaseTransport = None,
+        http: HTTPConfig = None,
+    ) -> None:
+        """客户端
+
+        Args:
+            cache (SylvaCache, optional): 响应缓存, `None` 表示不缓存
+            limiter (TokenBucket, optional): 所有接口共享的令牌桶, `None` 表示不限流
+            retry (RetryPolicy, optional): 重试策略, `None` 表示使用默认策略
+            transport (httpx.BaseTransport, optional): 实际发送请求的传输层,
+                如用于测试的 `httpx.MockTransport`, 为 `RetryTransport` 时直接使用,
+                忽略 `limiter` 与 `retry`
+            http (HTTPConfig, optional): 连接配置, `None` 表示使用默认配置
+        """
+        self.headers = {"modelname": "Sylva CLI"}
+        self._client = None
+        # 多个线程可能同时发出第一个请求, 只创建一个客户端
+        self._clientLock = threading.Lock()
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = retry
+        self.transport = transport
+        self.http = http
+        # 创建连接后才有请求计数
+        self.metrics = None
+        # 合并相同的并发读请求
+        self.flights = SingleFlight()
         self.logged = set()
 
+    @property
+    def client(self) -> httpx.Client:
+        """首次请求时才导入 httpx 并创建连接
+
+        Returns:
+            httpx.Client: 客户端
+        """
+        if self._client is not None:
+            return self._client
+        with self._clientLock:
+            if self._client is None:
+                import httpx
+
+                from .sylva_transport import (
+                    HTTPConfig,
+                    RetryTransport,
+                    TransportMetrics,
+                )
+
+                http = self.http or HTTPConfig()
+                metrics = TransportMetrics()
+                mounts = {}
+                if isinstance(self.transport, RetryTransport):
+                    # 已经带有限流与重试, 再包一层会使重试与等待成倍增加
+                    api = self.transport
+                    metrics = api.metrics
+                elif self.transport is not None:
+                    # 同一个传输层只包一层, API 与图片共用
+                    api = RetryTransport(
+                        self.transport, self.retry, self.limiter, metrics
+                    )
+                else:
+                    # API 与图片使用各自的连接池, 共享限流与计数
+                    api, image = (
+                        RetryTransport(
+                            http.transport(i), self.retry, self.limiter, metrics
+                        )
+                        for i in ("api", "image")
+                    )
+                    mounts[Sylva.IMGRoot] = image
+                client = httpx.Client(
+                    proxies={"all://": None},
+                    headers=self.headers,
+                    transport=api,
+                    mounts=mounts,
+                    timeout=http.timeout(),
+                    event_hooks={"request": [http.applyTimeout]},
+                )
+                # 创建完成后才让其他线程看到
+                self.metrics = metrics
+                self._client = client
+        return self._client
+
+    def warmup(self) -> None:
+        """预先建立到 API 与图片服务器的连接, 之后的请求不必等待 TLS 握手"""
+        for url in (Sylva.APIRoot, Sylva.IMGRoot):
+            try:
+                self.client.head(url)
+            except Exception as e:
+                log.warning(f"预热连接失败：{e}")
+
     @willLogin("Sylva")
     def setToken(self, token: str) -> str:
         """使用 token 登录
@@ -30,9 +150,14 @@ class Sylva:
         Returns:
             str: token
         """
-        self.client.headers.update({"token": token})
+        # 与创建客户端互斥, 否则正在创建的客户端可能复制了旧的头部
+        with self._clientLock:
+            self.headers.update({"token": token})
+            if self._client is not None:
+                self._client.headers.update({"token": token})
         return token
 
+    @traced()
     def sendCode(self, phone: str) -> httpx.Response:
         """发送验证码
 
@@ -46,6 +171,7 @@ class Sylva:
         sendCode = self.client.post(f"{Sylva.APIRoot}/auth/sendcode", json=payload)
         return sendCode
 
+    @traced()
     def register(self, phone: str, validCode: str) -> httpx.Response:
         """注册/登录
 
@@ -61,6 +187,8 @@ class Sylva:
         return register
 
     @loginRequired("Sylva")
+    @traced()
+    @invalidates("holes:")
     def createHole(
         self, content: str, hid: str = Global, tag: str = ""
     ) -> httpx.Response:
@@ -79,6 +207,8 @@ class Sylva:
         return holes
 
     @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
     def createHoleReply(
         self, pid: str, content: str, replyCid: str = None
     ) -> httpx.Response:
@@ -103,6 +233,8 @@ class Sylva:
         pass
 
     @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
     def followHole(self, pid: str) -> httpx.Response:
         """收藏树洞
 
@@ -117,6 +249,9 @@ class Sylva:
         return follow
 
     @loginRequired("Sylva")
+    @traced()
+    @cached("hole:{pid}")
+    @coalesced("hole:{pid}")
     def getHole(self, pid: str) -> httpx.Response:
         """获取树洞
 
@@ -131,6 +266,9 @@ class Sylva:
         return detail
 
     @loginRequired("Sylva")
+    @traced()
+    @cached("holes:{type}:{perPage}:{after}:{search}:{hid}")
+    @coalesced("holes:{type}:{perPage}:{after}:{search}:{hid}")
     def getHoles(
         self,
         type: Literal["timeline", "trending", "replied", "following"] = "timeline",
@@ -163,6 +301,61 @@ class Sylva:
         return holes
 
     @loginRequired("Sylva")
+    def iterHoles(
+        self,
+        type: Literal["timeline", "trending", "replied", "following"] = "timeline",
+        perPage: int = 20,
+        after: str = None,
+        search: str = None,
+        hid: str = Global,
+        limit: int = None,
+        since: int = None,
+        untilPid: int = None,
+    ) -> Iterator[dict]:
+        """逐个获取树洞, 处理当前页时在后台预取下一页
+
+        Args:
+            type (Literal[timeline, trending, replied, following], optional):
+                `timeline` 为时间线, `trending` 为热度, `replied` 为回复, `following` 为关注
+            perPage (int, optional): 每页数量
+            after (str, optional): 从 `after` 开始获取, None 为从时间线获取
+            search (str, optional): 搜索关键字
+            hid (str, optional): hid
+            limit (int, optional): 最多获取的数量
+            since (int, optional): 遇到 `created_at` 早于 `since` 的树洞时停止
+            untilPid (int, optional): 遇到不大于 `untilPid` 的 pid 时停止
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Yields:
+            Iterator[dict]: 树洞
+        """
+
+        def fetch(after):
+            return self.getHoles(type, perPage, after, search, hid).json()
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            future = executor.submit(fetch, after)
+            while True:
+                page = checkPage(future.result())
+                # 最后一页不足 perPage 条
+                last = len(page) < int(perPage)
+                cursor = None if last else str(page[-1]["pid"])
+                page, stop = takePage(page, limit, since, untilPid)
+                if not (stop or last):
+                    future = executor.submit(fetch, cursor)
+                yield from page
+                if stop or last:
+                    break
+                if limit is not None:
+                    limit -= len(page)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    @loginRequired("Sylva")
+    @traced()
     def reportHole(self, pid: str, reason: str) -> httpx.Response:
         """举报树洞
 
@@ -178,6 +371,8 @@ class Sylva:
         return reports
 
     @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
     def unfollowHole(self, pid: str) -> httpx.Response:
         """取消收藏树洞
 
@@ -192,6 +387,8 @@ class Sylva:
         return follow
 
     @loginRequired("Sylva")
+    @traced()
+    @coalesced("hollows")
     def getHollows(self) -> httpx.Response:
         """获取全国树洞
 
@@ -202,27 +399,51 @@ class Sylva:
         return hollows
 
     @loginRequired("Sylva")
-    def getNotifications(self) -> httpx.Response:
+    @traced()
+    @coalesced("notifications:{etag}:{lastModified}")
+    def getNotifications(
+        self, etag: str = None, lastModified: str = None
+    ) -> httpx.Response:
         """获取通知
 
+        Args:
+            etag (str, optional): 上次响应的 ETag, 未变化时返回 304
+            lastModified (str, optional): 上次响应的 Last-Modified, 未变化时返回 304
+
         Returns:
             httpx.Response: 响应
         """
-        notifications = self.client.get(f"{Sylva.APIRoot}/user/notifications")
+        headers = conditionalHeaders(etag, lastModified)
+        notifications = self.client.get(
+            f"{Sylva.APIRoot}/user/notifications", headers=headers
+        )
         return notifications
 
     @loginRequired("Sylva")
-    def getSystemMessages(self) -> httpx.Response:
+    @traced()
+    @coalesced("system-messages:{etag}:{lastModified}")
+    def getSystemMessages(
+        self, etag: str = None, lastModified: str = None
+    ) -> httpx.Response:
         """获取系统通知
 
+        Args:
+            etag (str, optional): 上次响应的 ETag, 未变化时返回 304
+            lastModified (str, optional): 上次响应的 Last-Modified, 未变化时返回 304
+
         Returns:
             httpx.Response: 响应
         """
-        systemMessages = self.client.get(f"{Sylva.APIRoot}/user/system-messages")
+        headers = conditionalHeaders(etag, lastModified)
+        systemMessages = self.client.get(
+            f"{Sylva.APIRoot}/user/system-messages", headers=headers
+        )
         return systemMessages
 
     # 此 API 无效
     @loginRequired("Sylva")
+    @traced()
+    @coalesced("config")
     def getConfig(self) -> httpx.Response:
         """读取配置
 
@@ -233,6 +454,8 @@ class Sylva:
         return config
 
     @loginRequired("Sylva")
+    @traced()
+    @coalesced("devices")
     def getDevices(self) -> httpx.Response:
         """获取登陆设备
 
@@ -243,6 +466,7 @@ class Sylva:
         return devices
 
     @loginRequired("Sylva")
+    @traced()
     def kickDevice(self, uuid: str) -> httpx.Response:
         """踢出登录设备
 
@@ -257,6 +481,7 @@ class Sylva:
         return devices
 
     @loginRequired("Sylva")
+    @traced()
     def logout(self, device=None) -> httpx.Response:
         """登出
 
@@ -268,6 +493,7 @@ class Sylva:
         return devices
 
     @loginRequired("Sylva")
+    @traced()
     def readNotifications(self) -> httpx.Response:
         """已读通知
 
@@ -281,6 +507,8 @@ class Sylva:
         return read
 
     @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
     def sendVote(self, pid: str, option: str) -> httpx.Response:
         """投票树洞
 
@@ -296,6 +524,7 @@ class Sylva:
         return votes
 
     @loginRequired("Sylva")
+    @traced()
     def downloadImage(self, src: str, path: str = "images") -> None:
         """下载图片
 
@@ -0,0 +1,224 @@
+import json
+import sqlite3
+from typing import Iterable, Literal
+
+__all__ = ["SylvaArchive"]
+
+Schema = """
+CREATE TABLE IF NOT EXISTS holes (
+    pid INTEGER PRIMARY KEY,
+    name TEXT,
+    school_name TEXT,
+    tag TEXT,
+    created_at INTEGER,
+    content TEXT,
+    raw TEXT
+);
+CREATE TABLE IF NOT EXISTS replies (
+    cid INTEGER PRIMARY KEY,
+    pid INTEGER,
+    name TEXT,
+    school_name TEXT,
+    tag TEXT,
+    created_at INTEGER,
+    content TEXT,
+    reply_cid INTEGER,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS replies_pid ON replies (pid);
+
+-- 中文没有空格分词, 使用 trigram 支持任意三个字以上的子串搜索
+CREATE VIRTUAL TABLE IF NOT EXISTS holes_fts USING fts5 (
+    content, tag, school_name,
+    content='holes', content_rowid='pid', tokenize='trigram'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS replies_fts USING fts5 (
+    content, name, school_name,
+    content='replies', content_rowid='cid', tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS holes_ai AFTER INSERT ON holes BEGIN
+    INSERT INTO holes_fts (rowid, content, tag, school_name)
+    VALUES (new.pid, new.content, new.tag, new.school_name);
+END;
+CREATE TRIGGER IF NOT EXISTS holes_ad AFTER DELETE ON holes BEGIN
+    INSERT INTO holes_fts (holes_fts, rowid, content, tag, school_name)
+    VALUES ('delete', old.pid, old.content, old.tag, old.school_name);
+END;
+CREATE TRIGGER IF NOT EXISTS holes_au AFTER UPDATE ON holes BEGIN
+    INSERT INTO holes_fts (holes_fts, rowid, content, tag, school_name)
+    VALUES ('delete', old.pid, old.content, old.tag, old.school_name);
+    INSERT INTO holes_fts (rowid, content, tag, school_name)
+    VALUES (new.pid, new.content, new.tag, new.school_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS replies_ai AFTER INSERT ON replies BEGIN
+    INSERT INTO replies_fts (rowid, content, name, school_name)
+    VALUES (new.cid, new.content, new.name, new.school_name);
+END;
+CREATE TRIGGER IF NOT EXISTS replies_ad AFTER DELETE ON replies BEGIN
+    INSERT INTO replies_fts (replies_fts, rowid, content, name, school_name)
+    VALUES ('delete', old.cid, old.content, old.name, old.school_name);
+END;
+CREATE TRIGGER IF NOT EXISTS replies_au AFTER UPDATE ON replies BEGIN
+    INSERT INTO replies_fts (replies_fts, rowid, content, name, school_name)
+    VALUES ('delete', old.cid, old.content, old.name, old.school_name);
+    INSERT INTO replies_fts (rowid, content, name, school_name)
+    VALUES (new.cid, new.content, new.name, new.school_name);
+END;
+"""
+
+
+class SylvaArchive:
+    def __init__(self, path: str = "archive.db") -> None:
+        """树洞本地存档, 支持全文搜索
+
+        Args:
+            path (str, optional): SQLite 数据库路径
+        """
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(Schema)
+
+    def close(self) -> None:
+        """关闭数据库"""
+        self.db.close()
+
+    def upsertHoles(self, holes: Iterable[dict]) -> int:
+        """在一个事务中批量写入树洞, 树洞中的回复会一并写入
+
+        Args:
+            holes (Iterable[dict]): 树洞
+
+        Returns:
+            int: 写入的树洞数量
+        """
+        count = 0
+        with self.db:
+            for hole in holes:
+                replies = hole.get("replies") or []
+                raw = {k: v for k, v in hole.items() if k != "replies"}
+                self.db.execute(
+                    "INSERT INTO holes VALUES (?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (pid) DO UPDATE SET name = excluded.name,"
+                    " school_name = excluded.school_name, tag = excluded.tag,"
+                    " created_at = excluded.created_at, content = excluded.content,"
+                    " raw = excluded.raw",
+                    (
+                        int(hole["pid"]),
+                        hole.get("name"),
+                        hole.get("school_name"),
+                        hole.get("tag"),
+                        hole["created_at"],
+                        hole["content"],
+                        json.dumps(raw, ensure_ascii=False),
+                    ),
+                )
+                self._upsertReplies(hole["pid"], replies)
+                count += 1
+        return count
+
+    def upsertReplies(self, pid: str, replies: Iterable[dict]) -> None:
+        """在一个事务中批量写入回复
+
+        Args:
+            pid (str): 树洞 ID
+            replies (Iterable[dict]): 回复
+        """
+        with self.db:
+            self._upsertReplies(pid, replies)
+
+    def _upsertReplies(self, pid: str, replies: Iterable[dict]) -> None:
+        self.db.executemany(
+            "INSERT INTO replies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (cid) DO UPDATE SET name = excluded.name,"
+            " school_name = excluded.school_name, tag = excluded.tag,"
+            " created_at = excluded.created_at, content = excluded.content,"
+            " reply_cid = excluded.reply_cid, raw = excluded.raw",
+            (
+                (
+                    int(i["cid"]),
+                    int(pid),
+                    i.get("name"),
+                    i.get("school_name"),
+                    i.get("tag"),
+                    i["created_at"],
+                    i["content"],
+                    i.get("reply_cid"),
+                    json.dumps(i, ensure_ascii=False),
+                )
+                for i in replies
+            ),
+        )
+
+    def getHole(self, pid: str) -> dict | None:
+        """读取存档中的树洞及其回复
+
+        Args:
+            pid (str): 树洞 ID
+
+        Returns:
+            dict | None: 树洞, 未存档时为 `None`
+        """
+        row = self.db.execute(
+            "SELECT raw FROM holes WHERE pid = ?", (int(pid),)
+        ).fetchone()
+        if row is None:
+            return None
+        hole = json.loads(row[0])
+        hole["replies"] = [
+            json.loads(i)
+            for (i,) in self.db.execute(
+                "SELECT raw FROM replies WHERE pid = ? ORDER BY cid", (int(pid),)
+            )
+        ]
+        return hole
+
+    def getReplies(self, cids: Iterable[int]) -> dict:
+        """按 cid 读取回复
+
+        Args:
+            cids (Iterable[int]): 回复 ID
+
+        Returns:
+            dict: cid -> 回复
+        """
+        cids = list(set(int(i) for i in cids))
+        if not cids:
+            return {}
+        rows = self.db.execute(
+            f"SELECT raw FROM replies WHERE cid IN ({', '.join('?' * len(cids))})",
+            cids,
+        )
+        replies = (json.loads(i) for (i,) in rows)
+        return {i["cid"]: i for i in replies}
+
+    def search(
+        self,
+        query: str,
+        what: Literal["holes", "replies"] = "holes",
+        limit: int = 20,
+    ) -> list[dict]:
+        """离线全文搜索
+
+        Args:
+            query (str): FTS5 查询语句
+            what (Literal[holes, replies], optional): 搜索树洞或回复
+            limit (int, optional): 最多返回的数量
+
+        Raises:
+            ValueError: `what` 不是 `holes` 或 `replies`
+
+        Returns:
+            list[dict]: 按相关度排序的树洞或回复
+        """
+        keys = {"holes": "pid", "replies": "cid"}
+        if what not in keys:
+            raise ValueError(f"只能搜索 holes 或 replies：{what}")
+        key = keys[what]
+        rows = self.db.execute(
+            f"SELECT {what}.raw FROM {what}_fts"
+            f" JOIN {what} ON {what}.{key} = {what}_fts.rowid"
+            f" WHERE {what}_fts MATCH ? ORDER BY rank LIMIT ?",
+            (query, int(limit)),
+        )
+        return [json.loads(i) for (i,) in rows]
@@ -0,0 +1,556 @@
+import asyncio
+import os
+from typing import AsyncIterator, Iterable, Literal
+
+import httpx
+
+from ._log import log
+from ._cache import cached, invalidates
+from ._flight import SingleFlight, coalesced
+from ._login import loginRequired, willLogin
+from ._paging import checkPage, mergeHoles, takePage
+from ._trace import traced
+from .sylva_cache import SylvaCache
+from .sylva_transport import (
+    AsyncRetryTransport,
+    HTTPConfig,
+    RetryPolicy,
+    TokenBucket,
+    TransportMetrics,
+)
+from .sylva import Sylva, conditionalHeaders
+
+__all__ = ["AsyncSylva"]
+
+
+class AsyncSylva:
+    APIRoot = Sylva.APIRoot
+    IMGRoot = Sylva.IMGRoot
+    Global = Sylva.Global
+    School = Sylva.School
+
+    def __init__(
+        self,
+        maxConnections: int = 100,
+        cache: SylvaCache = None,
+        limiter: TokenBucket = None,
+        retry: RetryPolicy = None,
+        transport: httpx.AsyncBaseTransport = None,
+        http: HTTPConfig = None,
+    ) -> None:
+        """异步客户端
+
+        Args:
+            maxConnections (int, optional): 连接池大小, 超出的请求会排队等待空闲连接
+            cache (SylvaCache, optional): 响应缓存, `None` 表示不缓存
+            limiter (TokenBucket, optional): 所有接口共享的令牌桶, `None` 表示不限流
+            retry (RetryPolicy, optional): 重试策略, `None` 表示使用默认策略
+            transport (httpx.AsyncBaseTransport, optional): 实际发送请求的传输层,
+                如用于测试的 `httpx.MockTransport`, 为 `AsyncRetryTransport` 时直接使用,
+                忽略 `limiter` 与 `retry`
+            http (HTTPConfig, optional): 连接配置, `None` 表示两个连接池的大小
+                都为 `maxConnections`
+        """
+        if http is None:
+            pool = {"maxConnections": maxConnections, "maxKeepalive": maxConnections}
+            http = HTTPConfig(api=pool, image=pool)
+        self.metrics = TransportMetrics()
+        mounts = {}
+        if isinstance(transport, AsyncRetryTransport):
+            # 已经带有限流与重试, 再包一层会使重试与等待成倍增加
+            api = transport
+            self.metrics = api.metrics
+        elif transport is not None:
+            # 同一个传输层只包一层, API 与图片共用
+            api = AsyncRetryTransport(transport, retry, limiter, self.metrics)
+        else:
+            # API 与图片使用各自的连接池, 共享限流与计数
+            api, image = (
+                AsyncRetryTransport(
+                    http.asyncTransport(i), retry, limiter, self.metrics
+                )
+                for i in ("api", "image")
+            )
+            mounts[AsyncSylva.IMGRoot] = image
+        self.client = httpx.AsyncClient(
+            proxies={"all://": None},
+            transport=api,
+            mounts=mounts,
+            # 排队等待连接的请求不应超时
+            timeout=http.timeout(),
+            event_hooks={"request": [http.applyTimeoutAsync]},
+        )
+        self.client.headers.update({"modelname": "Sylva CLI"})
+        self.cache = cache
+        # 合并相同的并发读请求
+        self.flights = SingleFlight()
+        self.logged = set()
+
+    async def warmup(self) -> None:
+        """预先建立到 API 与图片服务器的连接, 之后的请求不必等待 TLS 握手"""
+
+        async def head(url):
+            try:
+                await self.client.head(url)
+            except Exception as e:
+                log.warning(f"预热连接失败：{e}")
+
+        await asyncio.gather(head(AsyncSylva.APIRoot), head(AsyncSylva.IMGRoot))
+
+    async def __aenter__(self) -> "AsyncSylva":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """关闭连接池"""
+        await self.client.aclose()
+
+    @willLogin("Sylva")
+    def setToken(self, token: str) -> str:
+        """使用 token 登录
+
+        Args:
+            token (str): token
+
+        Returns:
+            str: token
+        """
+        self.client.headers.update({"token": token})
+        return token
+
+    @traced()
+    async def sendCode(self, phone: str) -> httpx.Response:
+        """发送验证码
+
+        Args:
+            phone (str): 手机号
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"method": "phone", "username": phone}
+        sendCode = await self.client.post(
+            f"{AsyncSylva.APIRoot}/auth/sendcode", json=payload
+        )
+        return sendCode
+
+    @traced()
+    async def register(self, phone: str, validCode: str) -> httpx.Response:
+        """注册/登录
+
+        Args:
+            phone (str): 手机号
+            validCode (str): 验证码
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"method": "phone", "username": phone, "valid_code": validCode}
+        register = await self.client.post(
+            f"{AsyncSylva.APIRoot}/auth/register", json=payload
+        )
+        return register
+
+    @loginRequired("Sylva")
+    @traced()
+    @invalidates("holes:")
+    async def createHole(
+        self, content: str, hid: str = Global, tag: str = ""
+    ) -> httpx.Response:
+        """发布树洞
+
+        Args:
+            content (str): 内容
+            hid (str, optional): hid
+            tag (str, optional): 标签
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"content": content, "hid": hid, "tag": tag}
+        holes = await self.client.post(f"{AsyncSylva.APIRoot}/holes", json=payload)
+        return holes
+
+    @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
+    async def createHoleReply(
+        self, pid: str, content: str, replyCid: str = None
+    ) -> httpx.Response:
+        """回复树洞
+
+        Args:
+            pid (str): 树洞 ID
+            content (str): 内容
+            replyCid (str, optional): 引用 ID, `None` 表示不引用
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"pid": pid, "content": content}
+        if replyCid is not None:
+            payload.update({"reply_cid": replyCid})
+        replies = await self.client.post(
+            f"{AsyncSylva.APIRoot}/holes/replies", json=payload
+        )
+        return replies
+
+    @loginRequired("Sylva")
+    async def createHoleVote(self):
+        pass
+
+    @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
+    async def followHole(self, pid: str) -> httpx.Response:
+        """收藏树洞
+
+        Args:
+            pid (str): 树洞 ID
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"pid": pid}
+        follow = await self.client.put(
+            f"{AsyncSylva.APIRoot}/holes/follow", params=payload
+        )
+        return follow
+
+    @loginRequired("Sylva")
+    @traced()
+    @cached("hole:{pid}")
+    @coalesced("hole:{pid}")
+    async def getHole(self, pid: str) -> httpx.Response:
+        """获取树洞
+
+        Args:
+            pid (str): 树洞 ID
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"pid": pid}
+        detail = await self.client.get(
+            f"{AsyncSylva.APIRoot}/holes/detail", params=payload
+        )
+        return detail
+
+    @loginRequired("Sylva")
+    async def getHolesByPid(self, pids: Iterable[str]) -> list[httpx.Response]:
+        """并发获取多个树洞
+
+        Args:
+            pids (Iterable[str]): 树洞 ID
+
+        Returns:
+            list[httpx.Response]: 响应, 与 `pids` 顺序一致
+        """
+        return await asyncio.gather(*(self.getHole(pid) for pid in pids))
+
+    @loginRequired("Sylva")
+    @traced()
+    @cached("holes:{type}:{perPage}:{after}:{search}:{hid}")
+    @coalesced("holes:{type}:{perPage}:{after}:{search}:{hid}")
+    async def getHoles(
+        self,
+        type: Literal["timeline", "trending", "replied", "following"] = "timeline",
+        perPage: int = 20,
+        after: str = None,
+        search: str = None,
+        hid: str = Global,
+    ) -> httpx.Response:
+        """获取树洞列表
+
+        Args:
+            type (Literal[timeline, trending, replied, following], optional):
+                `timeline` 为时间线, `trending` 为热度, `replied` 为回复, `following` 为关注
+            perPage (int, optional): 数量
+            after (str, optional): 从 `after` 开始获取, None 为从时间线获取
+            search (str, optional): 搜索关键字
+            hid (str, optional): hid
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {
+            "type": type,
+            "per_page": perPage,
+            "after": after,
+            "search": search,
+            "hid": hid,
+        }
+        holes = await self.client.get(f"{AsyncSylva.APIRoot}/holes", params=payload)
+        return holes
+
+    @loginRequired("Sylva")
+    async def iterHoles(
+        self,
+        type: Literal["timeline", "trending", "replied", "following"] = "timeline",
+        perPage: int = 20,
+        after: str = None,
+        search: str = None,
+        hid: str = Global,
+        limit: int = None,
+        since: int = None,
+        untilPid: int = None,
+    ) -> AsyncIterator[dict]:
+        """逐个获取树洞, 处理当前页时预取下一页
+
+        Args:
+            type (Literal[timeline, trending, replied, following], optional):
+                `timeline` 为时间线, `trending` 为热度, `replied` 为回复, `following` 为关注
+            perPage (int, optional): 每页数量
+            after (str, optional): 从 `after` 开始获取, None 为从时间线获取
+            search (str, optional): 搜索关键字
+            hid (str, optional): hid
+            limit (int, optional): 最多获取的数量
+            since (int, optional): 遇到 `created_at` 早于 `since` 的树洞时停止
+            untilPid (int, optional): 遇到不大于 `untilPid` 的 pid 时停止
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Yields:
+            AsyncIterator[dict]: 树洞
+        """
+
+        async def fetch(after):
+            return (await self.getHoles(type, perPage, after, search, hid)).json()
+
+        task = asyncio.create_task(fetch(after))
+        try:
+            while True:
+                page = checkPage(await task)
+                # 最后一页不足 perPage 条
+                last = len(page) < int(perPage)
+                cursor = None if last else str(page[-1]["pid"])
+                page, stop = takePage(page, limit, since, untilPid)
+                if not (stop or last):
+                    task = asyncio.create_task(fetch(cursor))
+                for hole in page:
+                    yield hole
+                if stop or last:
+                    break
+                if limit is not None:
+                    limit -= len(page)
+        finally:
+            task.cancel()
+
+    @loginRequired("Sylva")
+    def iterHollows(
+        self, hids: Iterable[str], limit: int = None, **kwargs
+    ) -> AsyncIterator[dict]:
+        """并发获取多个树洞的时间线, 合并为一个按 `created_at` 从新到旧的列表
+
+        Args:
+            hids (Iterable[str]): hid
+            limit (int, optional): 最多获取的数量
+            kwargs: `iterHoles` 的其余参数, 如 `perPage` 与 `since`
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            AsyncIterator[dict]: 树洞, 已按 pid 去重
+        """
+        # 每一路最多也只需要 limit 个
+        return mergeHoles(
+            (self.iterHoles(hid=i, limit=limit, **kwargs) for i in hids), limit
+        )
+
+    @loginRequired("Sylva")
+    @traced()
+    async def reportHole(self, pid: str, reason: str) -> httpx.Response:
+        """举报树洞
+
+        Args:
+            pid (str): 树洞 ID
+            reason (str): 原因
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"pid": pid, "reason": reason, "action": "report"}
+        reports = await self.client.post(
+            f"{AsyncSylva.APIRoot}/holes/reports", json=payload
+        )
+        return reports
+
+    @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
+    async def unfollowHole(self, pid: str) -> httpx.Response:
+        """取消收藏树洞
+
+        Args:
+            pid (str): 树洞 ID
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"pid": pid}
+        follow = await self.client.delete(
+            f"{AsyncSylva.APIRoot}/holes/follow", params=payload
+        )
+        return follow
+
+    @loginRequired("Sylva")
+    @traced()
+    @coalesced("hollows")
+    async def getHollows(self) -> httpx.Response:
+        """获取全国树洞
+
+        Returns:
+            httpx.Response: 响应
+        """
+        hollows = await self.client.get(f"{AsyncSylva.APIRoot}/hollows")
+        return hollows
+
+    @loginRequired("Sylva")
+    @traced()
+    @coalesced("notifications:{etag}:{lastModified}")
+    async def getNotifications(
+        self, etag: str = None, lastModified: str = None
+    ) -> httpx.Response:
+        """获取通知
+
+        Args:
+            etag (str, optional): 上次响应的 ETag, 未变化时返回 304
+            lastModified (str, optional): 上次响应的 Last-Modified, 未变化时返回 304
+
+        Returns:
+            httpx.Response: 响应
+        """
+        headers = conditionalHeaders(etag, lastModified)
+        notifications = await self.client.get(
+            f"{AsyncSylva.APIRoot}/user/notifications", headers=headers
+        )
+        return notifications
+
+    @loginRequired("Sylva")
+    @traced()
+    @coalesced("system-messages:{etag}:{lastModified}")
+    async def getSystemMessages(
+        self, etag: str = None, lastModified: str = None
+    ) -> httpx.Response:
+        """获取系统通知
+
+        Args:
+            etag (str, optional): 上次响应的 ETag, 未变化时返回 304
+            lastModified (str, optional): 上次响应的 Last-Modified, 未变化时返回 304
+
+        Returns:
+            httpx.Response: 响应
+        """
+        headers = conditionalHeaders(etag, lastModified)
+        systemMessages = await self.client.get(
+            f"{AsyncSylva.APIRoot}/user/system-messages", headers=headers
+        )
+        return systemMessages
+
+    # 此 API 无效
+    @loginRequired("Sylva")
+    @traced()
+    @coalesced("config")
+    async def getConfig(self) -> httpx.Response:
+        """读取配置
+
+        Returns:
+            httpx.Response: 响应
+        """
+        config = await self.client.get(f"{AsyncSylva.APIRoot}/user/config")
+        return config
+
+    @loginRequired("Sylva")
+    @traced()
+    @coalesced("devices")
+    async def getDevices(self) -> httpx.Response:
+        """获取登陆设备
+
+        Returns:
+            httpx.Response: 响应
+        """
+        devices = await self.client.get(f"{AsyncSylva.APIRoot}/user/devices")
+        return devices
+
+    @loginRequired("Sylva")
+    @traced()
+    async def kickDevice(self, uuid: str) -> httpx.Response:
+        """踢出登录设备
+
+        Args:
+            uuid (str): 设备 UUID
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"uuid": uuid}
+        devices = await self.client.delete(
+            f"{AsyncSylva.APIRoot}/user/devices", params=payload
+        )
+        return devices
+
+    @loginRequired("Sylva")
+    @traced()
+    async def logout(self, device=None) -> httpx.Response:
+        """登出
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"device": device}
+        devices = await self.client.delete(
+            f"{AsyncSylva.APIRoot}/user/devices", params=payload
+        )
+        return devices
+
+    @loginRequired("Sylva")
+    @traced()
+    async def readNotifications(self) -> httpx.Response:
+        """已读通知
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"type": "my"}
+        read = await self.client.post(
+            f"{AsyncSylva.APIRoot}/user/notifications/read", json=payload
+        )
+        return read
+
+    @loginRequired("Sylva")
+    @traced()
+    @invalidates("hole:{pid}", "holes:")
+    async def sendVote(self, pid: str, option: str) -> httpx.Response:
+        """投票树洞
+
+        Args:
+            pid (str): 树洞 ID
+            option (str): 选项
+
+        Returns:
+            httpx.Response: 响应
+        """
+        payload = {"pid": pid, "option": option}
+        votes = await self.client.post(
+            f"{AsyncSylva.APIRoot}/holes/votes", json=payload
+        )
+        return votes
+
+    @loginRequired("Sylva")
+    @traced()
+    async def downloadImage(self, src: str, path: str = "images") -> None:
+        """下载图片
+
+        Args:
+            src (str): 链接
+            path (str, optional): 保存路径
+        """
+        os.makedirs(path, exist_ok=True)
+        image = await self.client.get(f"{AsyncSylva.IMGRoot}/{src}")
+        with open(f"{path}/{src.split('/')[-1]}", "wb") as f:
+            f.write(image.content)
+        log.info(f"图片已保存至 {path}/{src.split('/')[-1]}")
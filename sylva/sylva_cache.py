@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import httpx
+
+__all__ = ["SylvaCache"]
+
+
+class SylvaCache:
+    def __init__(self, size: int = 256, ttl: float = 60, path: str = None) -> None:
+        """响应缓存, 内存中按 LRU 淘汰, 可选 SQLite 持久化
+
+        Args:
+            size (int, optional): 内存中最多缓存的响应数量
+            ttl (float, optional): 缓存有效期（秒）
+            path (str, optional): SQLite 数据库路径, `None` 表示只缓存在内存中
+        """
+        self.size = size
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 清空时加一, 记录过多的键时也加一并重新记录
+        self.generation = 0
+        # 缓存键或前缀 -> 失效次数, 请求期间发生过失效的响应不再写入
+        self.generations = {}
+
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, expires REAL, status INTEGER,"
+                "headers TEXT, url TEXT, content BLOB)"
+            )
+            self.db.commit()
+
+    @property
+    def stats(self) -> dict:
+        """命中统计
+
+        Returns:
+            dict: 命中次数、未命中次数、命中率和内存中的缓存数量
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / total if total else 0.0,
+            "size": len(self.memory),
+        }
+
+    def get(self, key: str) -> httpx.Response | None:
+        """读取缓存
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            httpx.Response | None: 响应, 未命中或已过期时为 `None`
+        """
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+            elif self.db is not None:
+                row = self.db.execute(
+                    "SELECT expires, status, headers, url, content"
+                    " FROM cache WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None:
+                    entry = (row[0], row[1], json.loads(row[2]), row[3], row[4])
+                    self._remember(key, entry)
+
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        import httpx
+
+        expires, status, headers, url, content = entry
+        return httpx.Response(
+            status, headers=headers, content=content, request=httpx.Request("GET", url)
+        )
+
+    def version(self, key: str) -> tuple:
+        """缓存键的版本, 使该键或其前缀失效以及清空缓存时改变
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            tuple: 版本
+        """
+        with self.lock:
+            return self._version(key)
+
+    def set(self, key: str, resp: httpx.Response, version: tuple = None) -> None:
+        """写入缓存, 只缓存状态码为 200 的响应
+
+        Args:
+            key (str): 缓存键
+            resp (httpx.Response): 响应
+            version (tuple, optional): 发出请求前的 `version(key)`,
+                之后该键失效过时不写入, 避免写操作之前的响应覆盖失效
+        """
+        if resp.status_code != 200:
+            return
+        # content 已经解压, 不能保留 content-encoding 等头
+        headers = {"content-type": resp.headers.get("content-type", "")}
+        entry = (
+            time.time() + self.ttl,
+            resp.status_code,
+            headers,
+            str(resp.request.url),
+            resp.content,
+        )
+        with self.lock:
+            if version is not None and version != self._version(key):
+                return
+            self._remember(key, entry)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, entry[0], entry[1], json.dumps(headers), entry[3], entry[4]),
+                )
+                self.db.commit()
+
+    async def getAsync(self, key: str) -> httpx.Response | None:
+        """`get` 的异步版本, 内存未命中时在线程中读取 SQLite, 不阻塞事件循环
+
+        Args:
+            key (str): 缓存键
+
+        Returns:
+            httpx.Response | None: 响应, 未命中或已过期时为 `None`
+        """
+        # 内存中未过期的缓存不会读写 SQLite
+        entry = self.memory.get(key)
+        if self.db is None or (entry is not None and entry[0] >= time.time()):
+            return self.get(key)
+        import asyncio
+
+        return await asyncio.to_thread(self.get, key)
+
+    async def setAsync(
+        self, key: str, resp: httpx.Response, version: tuple = None
+    ) -> None:
+        """`set` 的异步版本, 持久化时在线程中写入 SQLite
+
+        Args:
+            key (str): 缓存键
+            resp (httpx.Response): 响应
+            version (tuple, optional): 发出请求前的 `version(key)`
+        """
+        if self.db is None:
+            return self.set(key, resp, version)
+        import asyncio
+
+        await asyncio.to_thread(self.set, key, resp, version)
+
+    async def invalidateAsync(self, key: str) -> None:
+        """`invalidate` 的异步版本, 持久化时在线程中删除 SQLite 中的缓存
+
+        Args:
+            key (str): 缓存键, 以 `:` 结尾时使所有以其开头的缓存失效
+        """
+        if self.db is None:
+            return self.invalidate(key)
+        import asyncio
+
+        await asyncio.to_thread(self.invalidate, key)
+
+    def invalidate(self, key: str) -> None:
+        """使缓存失效
+
+        Args:
+            key (str): 缓存键, 以 `:` 结尾时使所有以其开头的缓存失效
+        """
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            if len(self.generations) > 4 * self.size:
+                self.generations.clear()
+                self.generation += 1
+            if key.endswith(":"):
+                for i in [i for i in self.memory if i.startswith(key)]:
+                    del self.memory[i]
+                if self.db is not None:
+                    self.db.execute(
+                        "DELETE FROM cache WHERE substr(key, 1, ?) = ?",
+                        (len(key), key),
+                    )
+                    self.db.commit()
+            else:
+                self._forget(key)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self.lock:
+            self.generation += 1
+            self.generations.clear()
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM cache")
+                self.db.commit()
+
+    def _version(self, key: str) -> tuple:
+        # 键本身与其每个以 `:` 结尾的前缀
+        parts = [self.generations.get(key, 0)]
+        i = key.find(":")
+        while i != -1:
+            parts.append(self.generations.get(key[: i + 1], 0))
+            i = key.find(":", i + 1)
+        return (self.generation, *parts)
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
+
+    def _forget(self, key: str) -> None:
+        self.memory.pop(key, None)
+        if self.db is not None:
+            self.db.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.db.commit()
@@ -1,55 +1,108 @@
+import functools
 import json
 import os
-import re
-from typing import Iterable
-
-from rich.console import Console
-from rich.theme import Theme
-
-from ._log import log
+import shlex
+import sys
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Iterable
+
+from ._command import Registry, toBool, toChoice, toSet, tokenize
+from ._log import installTraceback, log
+from ._trace import tracer
 from .sylva import Sylva
-from .sylva_render import SylvaRender
+from .sylva_cache import SylvaCache
+from .sylva_filter import Condition, parseQuery
+from .sylva_index import ReplyIndex
+from .sylva_models import Device, Hole, Reply, Vote, decode, toJSON
+from .sylva_render import SylvaFlatRender, SylvaRender
+from .sylva_sync import SylvaSync
 from ._exception import UnknownCommand, UnexpectedCode
 
+if TYPE_CHECKING:
+    from rich.console import Console
+
+    from .sylva_archive import SylvaArchive
+
 __all__ = ["SylvaCLI"]
 
-console = Console(theme=Theme.read("theme.ini"))
+
+@functools.cache
+def getConsole() -> "Console":
+    """首次输出时才导入 rich 并读取 theme.ini
+
+    Returns:
+        Console: 控制台
+    """
+    from rich.console import Console
+    from rich.theme import Theme
+
+    return Console(theme=Theme.read("theme.ini"))
 
 
 class SylvaCLI:
     Debug = False
+    # 回复超过该数量时分块输出
+    ChunkSize = 50
+    # 最多保留的未同步树洞的回复索引数量
+    IndexSize = 16
+    # 命令表, 由 `Commands.register` 装饰的方法执行
+    Commands = Registry()
 
     def __init__(self) -> None:
-        self.sylva = Sylva()
         config = dict()
         if os.path.exists("config.json"):
             with open("config.json") as f:
                 config.update(json.load(f))
+        # "cache": false 关闭缓存
+        cache = config.get("cache", {})
+        cache = None if cache is False else SylvaCache(**cache)
+        limiter = retry = http = None
+        if "rateLimit" in config:
+            from .sylva_transport import TokenBucket
+
+            limiter = TokenBucket(**config["rateLimit"])
+        if "retry" in config:
+            from .sylva_transport import RetryPolicy
+
+            retry = RetryPolicy(**config["retry"])
+        if "http" in config:
+            from .sylva_transport import HTTPConfig
+
+            http = HTTPConfig(**config["http"])
+        self.sylva = Sylva(cache=cache, limiter=limiter, retry=retry, http=http)
         if "token" in config:
             self.sylva.setToken(config["token"])
         else:
             config.update({"token": self.login()})
             with open("config.json", "wt") as f:
                 json.dump(config, f)
+        self.config = config
+        if http is not None and http.warmup:
+            threading.Thread(target=self.sylva.warmup, daemon=True).start()
+        # "metrics": {"prometheus": "sylva.prom", "jsonl": "trace.jsonl"} 导出调用统计
+        metrics = config.get("metrics", {})
+        if metrics:
+            from .sylva_trace import JSONLExporter, PrometheusExporter
+
+            if "prometheus" in metrics:
+                tracer.addExporter(PrometheusExporter(metrics["prometheus"]))
+            if "jsonl" in metrics:
+                tracer.addExporter(JSONLExporter(metrics["jsonl"]))
+        self.sylvaSync = SylvaSync(self.sylva)
+        self.archive = None
+        self.watcher = None
+        # pid -> 回复索引, 按 LRU 淘汰
+        self.indexes = OrderedDict()
+        # 批量模式下只读命令并发执行, 共享索引与存档
+        self.lock = threading.Lock()
+        # "render": "flat" 使用不嵌套表的渲染器, 大量回复时更快
+        self.render = SylvaFlatRender if config.get("render") == "flat" else SylvaRender
+        # 批量模式下不渲染
+        self.quiet = False
         log.info("登录成功")
 
-    def filter(self, what: Iterable, attr: str, only: str | Iterable[str]) -> Iterable:
-        """过滤器
-
-        Args:
-            what (Iterable): 需要过滤的对象
-            attr (str): 过滤的属性
-            only (str | Iterable[str]): 在 `only` 中可不被过滤
-
-        Returns:
-            Iterable: _description_
-        """
-        if isinstance(only, str):
-            only = {only}
-        elif isinstance(only, Iterable):
-            only = set(only)
-        return filter(lambda i: i[attr] in only, what)
-
     def login(self) -> str:
         """登录
 
@@ -67,6 +120,7 @@ class SylvaCLI:
         token = register.json()["token"]
         return self.sylva.setToken(token)
 
+    @Commands.register("c|create <content>", hid=str, tag=str)
     def createHole(self, content, **kwargs) -> None:
         """发布树洞（交互）
 
@@ -80,7 +134,14 @@ class SylvaCLI:
         if resp.status_code not in {200, 204}:
             raise UnexpectedCode(resp.json())
 
-    def createHoleReply(self, pid: str, content: str, cid=None, **kwargs):
+    @Commands.register(
+        "r|reply <pid> [cid] <content>",
+        cid=int,
+        onlyWho=toSet,
+        onlyWhich=toSet,
+        mode=str,
+    )
+    def createHoleReply(self, pid: str, content: str, cid=None, **kwargs) -> Hole:
         """回复树洞（交互）
 
         Args:
@@ -94,8 +155,9 @@ class SylvaCLI:
         resp = self.sylva.createHoleReply(pid, content, cid)
         if resp.status_code not in {200, 204}:
             raise UnexpectedCode(resp.json())
-        self.getHole(pid, **kwargs)
+        return self.getHole(pid, **kwargs)
 
+    @Commands.register("f|follow <pid>")
     def followHole(self, pid: str) -> None:
         """收藏树洞（交互）
 
@@ -104,62 +166,286 @@ class SylvaCLI:
         """
         self.sylva.followHole(pid)
 
+    def printRender(self, render: SylvaRender, name: str) -> None:
+        """输出表并记录排版耗时
+
+        Args:
+            render (SylvaRender): 表
+            name (str): 统计中使用的名称, 一般为命令对应的方法名
+        """
+        rows = render.table.row_count if render.table is not None else 0
+        with tracer.span("render", name, rows=rows):
+            getConsole().print(render)
+
+    def printChunks(self, chunks: Iterable[SylvaRender], pager: bool = False) -> None:
+        """逐块输出内容表, 第一块排版完成后立即显示
+
+        Args:
+            chunks (Iterable[SylvaRender]): 由 `SylvaRender.iterContentTables` 生成的表
+            pager (bool, optional): 分页模式, 每输出一块等待回车, 输入 q 退出
+        """
+        console = getConsole()
+        separator = self.render.createSeparator()
+        console.print(separator)
+        for index, chunk in enumerate(chunks):
+            if index:
+                console.print(separator)
+            self.printRender(chunk, "printChunks")
+            if pager:
+                try:
+                    if input("-- 回车继续, q 退出 --").strip() == "q":
+                        break
+                except (KeyboardInterrupt, EOFError):
+                    break
+        console.print(separator)
+
+    @Commands.register(
+        "h|hole <pid>",
+        readOnly=True,
+        onlyWho=toSet,
+        onlyWhich=toSet,
+        where=str,
+        mode=str,
+    )
     def getHole(
         self,
         pid: str,
         onlyWho: str | Iterable[str] = None,
         onlyWhich: str | Iterable[str] = None,
+        where: str = None,
+        mode: str = None,
         **kwargs,
-    ) -> None:
+    ) -> Hole:
         """获取树洞（交互）
 
         Args:
             pid (str): 树洞 ID
             onlyWho (str | Iterable[str], optional): 只看 `onlyWho`
             onlyWhich (str | Iterable[str], optional): 只看 `onlyWhich` 高校
+            where (str, optional): 只看匹配的回复, 见 `parseQuery`
+            mode (str, optional): `table` 一次输出, `stream` 分块输出, `page` 分页输出,
+                默认在回复超过 `ChunkSize` 时分块输出
 
         Raises:
             UnexpectedCode: 异常
+
+        Returns:
+            Hole: 树洞, 只包含过滤后的回复
         """
-        render = SylvaRender.createContentTable()
-        got = self.sylva.getHole(pid, **kwargs).json()
-        if "code" in got:
-            raise UnexpectedCode(got)
-        render.addHole(got)
-        if got["replies"]:
-            replies = got["replies"]
-            cites = {i["cid"]: i for i in replies}
-            if onlyWho is not None:
-                replies = self.filter(replies, "name", onlyWho)
-            if onlyWhich is not None:
-                replies = self.filter(replies, "school_name", onlyWhich)
-            for i in replies:
-                render.addHoleReply(i, cites)
-        console.print(render)
+        got = decode(self.sylva.getHole(pid, **kwargs).content, Hole)
+        cites = self.getIndex(pid, got.replies or [])
+        if onlyWho is not None or onlyWhich is not None:
+            got.replies = cites.filter(onlyWho, onlyWhich)
+        else:
+            got.replies = got.replies or []
+        if where is not None:
+            query = parseQuery(where, pushdown=False)
+            got.replies = list(query.filter(got.replies))
+        if self.quiet:
+            return got
+        if mode is None:
+            mode = "stream" if len(got["replies"]) > SylvaCLI.ChunkSize else "table"
+        match mode:
+            case "table":
+                render = self.render.createContentTable()
+                render.addHole(got)
+                for i in got["replies"]:
+                    render.addHoleReply(i, cites)
+                self.printRender(render, "getHole")
+            case "stream":
+                chunks = self.render.iterContentTables(
+                    got, got["replies"], cites, SylvaCLI.ChunkSize
+                )
+                self.printChunks(chunks)
+            case "page":
+                # 每条回复至少占三行, 一页只排版可见的部分
+                size = max(1, (getConsole().height - 3) // 4)
+                chunks = self.render.iterContentTables(got, got["replies"], cites, size)
+                self.printChunks(chunks, pager=True)
+            case _:
+                raise UnknownCommand(f"未知的输出模式：{mode}")
+        return got
 
+    def getIndex(self, pid: str, replies: Iterable[Reply]) -> ReplyIndex:
+        """取得树洞的回复索引并加入新回复, 同步中的树洞使用同步的索引
+
+        Args:
+            pid (str): 树洞 ID
+            replies (Iterable[Reply]): 回复
+
+        Returns:
+            ReplyIndex: 回复索引
+        """
+        pid = str(pid)
+        index = self.sylvaSync.merge(pid, replies)
+        if index is not None:
+            return index
+        with self.lock:
+            if pid in self.indexes:
+                index = self.indexes[pid]
+                self.indexes.move_to_end(pid)
+            else:
+                index = self.indexes[pid] = ReplyIndex()
+                while len(self.indexes) > SylvaCLI.IndexSize:
+                    self.indexes.popitem(last=False)
+            index.add(replies)
+        return index
+
+    @Commands.register(
+        "t|thread <pid> <cid>", readOnly=True, onlyWho=toSet, onlyWhich=toSet
+    )
+    def getThread(
+        self,
+        pid: str,
+        cid: str,
+        onlyWho: str | Iterable[str] = None,
+        onlyWhich: str | Iterable[str] = None,
+    ) -> list[Reply]:
+        """查看回复所在的对话, 包括引用链与所有回复它的回复（交互）
+
+        Args:
+            pid (str): 树洞 ID
+            cid (str): 回复 ID
+            onlyWho (str | Iterable[str], optional): 只看 `onlyWho`
+            onlyWhich (str | Iterable[str], optional): 只看 `onlyWhich` 高校
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            list[Reply]: 对话中的回复
+        """
+        got = decode(self.sylva.getHole(pid).content, Hole)
+        index = self.getIndex(pid, got.replies or [])
+        replies = index.subthread(cid)
+        if onlyWho is not None or onlyWhich is not None:
+            only = {i.cid for i in index.filter(onlyWho, onlyWhich)}
+            replies = [i for i in replies if i.cid in only]
+        if not self.quiet:
+            got.replies = None
+            render = self.render.createContentTable()
+            render.addHole(got)
+            for i in replies:
+                render.addHoleReply(i, index)
+            self.printRender(render, "getThread")
+        return replies
+
+    @Commands.register(
+        "l|list [perPage]",
+        readOnly=True,
+        perPage=int,
+        onlyWhich=toSet,
+        limit=int,
+        scan=int,
+        where=str,
+        type=str,
+        after=str,
+        search=str,
+        hid=str,
+    )
     def getHoles(
-        self, perPage: int = 20, onlyWhich: str | Iterable[str] = None, **kwargs
-    ) -> None:
+        self,
+        perPage: int = 20,
+        onlyWhich: str | Iterable[str] = None,
+        limit: int = None,
+        scan: int = None,
+        where: str = None,
+        **kwargs,
+    ) -> list[Hole]:
         """获取树洞列表（交互）
 
         Args:
             perPage (int, optional): 数量. Defaults to 20
             onlyWhich (str | Iterable[str], optional): 仅看 `onlyWhich` 高校
+            limit (int, optional): 跨页获取的匹配数量, `None` 表示只获取一页
+            scan (int, optional): 跨页获取时最多获取的树洞数量
+            where (str, optional): 只看匹配的树洞, 见 `parseQuery`
 
         Raises:
             UnexpectedCode: 异常
+
+        Returns:
+            list[Hole]: 树洞列表
         """
-        render = SylvaRender.createContentTable()
-        got = self.sylva.getHoles(perPage=perPage, **kwargs).json()
-        if "code" in got:
-            raise UnexpectedCode(got)
-        # 由于旧帖没有 school_name, 请不要在旧帖中使用这个方法
+        # 由于旧帖没有 school_name, 请不要在旧帖中使用 onlyWhich
+        filters = []
         if onlyWhich is not None:
-            got = self.filter(got, "school_name", onlyWhich)
-        for i in got:
-            render.addHole(i)
-        console.print(render)
+            only = {onlyWhich} if isinstance(onlyWhich, str) else set(onlyWhich)
+            filters.append(Condition("school_name", "=", only))
+        query = parseQuery(where, *filters)
+        if not query and limit is None and scan is None:
+            got = decode(self.sylva.getHoles(perPage=perPage, **kwargs).content, Hole)
+        else:
+            if limit is None and scan is None:
+                scan = perPage
+            got = query.scan(self.sylva, perPage, limit, scan, **kwargs)
+            # 只为匹配的树洞创建模型
+            got = map(Hole.fromDict, got)
+        got = list(got)
+        if not self.quiet:
+            render = self.render.createContentTable()
+            for i in got:
+                render.addHole(i)
+            self.printRender(render, "getHoles")
+        return got
+
+    @Commands.register("w|watch <pid>")
+    def watchHole(self, pid: str) -> list[Reply]:
+        """开始增量同步树洞（交互）
+
+        Args:
+            pid (str): 树洞 ID
+
+        Returns:
+            list[Reply]: 树洞的所有回复
+        """
+        replies = self.sylvaSync.watch(pid)
+        if not self.quiet:
+            thread = self.sylvaSync.threads[str(pid)]
+            render = self.render.createContentTable()
+            render.addHole(thread["hole"])
+            for i in replies:
+                render.addHoleReply(i, thread["index"])
+            self.printRender(render, "watchHole")
+        return replies
+
+    @Commands.register("uw|unwatch <pid>")
+    def unwatchHole(self, pid: str) -> None:
+        """停止增量同步树洞（交互）
+
+        Args:
+            pid (str): 树洞 ID
+        """
+        self.sylvaSync.unwatch(pid)
+
+    @Commands.register("p|poll [limit]", limit=int)
+    def pollHoles(self, limit: int = 20) -> dict[str, list[Reply]]:
+        """同步所有关注的树洞, 只显示新回复（交互）
+
+        Args:
+            limit (int, optional): 最多同步的树洞数量, 其余的留到下次
+
+        Returns:
+            dict[str, list[Reply]]: pid -> 新回复
+        """
+        changed = self.sylvaSync.poll(limit)
+        if self.quiet:
+            return changed
+        if not changed:
+            log.info("没有新回复")
+            return changed
+        render = self.render.createContentTable()
+        for pid, replies in changed.items():
+            thread = self.sylvaSync.threads.get(pid)
+            if thread is None:
+                continue
+            render.addHole(thread["hole"])
+            for i in replies:
+                render.addHoleReply(i, thread["index"])
+        self.printRender(render, "pollHoles")
+        return changed
 
+    @Commands.register("uf|unfollow <pid>")
     def unfollowHole(self, pid: str) -> None:
         """取消收藏树洞（交互）
 
@@ -168,7 +454,8 @@ class SylvaCLI:
         """
         self.sylva.followHole(pid)
 
-    def sendVote(self, pid: str, option: str):
+    @Commands.register("v|vote <pid> <option>")
+    def sendVote(self, pid: str, option: str) -> Vote:
         """投票（交互）
 
         Args:
@@ -177,23 +464,31 @@ class SylvaCLI:
 
         Raises:
             UnexpectedCode: 异常
+
+        Returns:
+            Vote: 投票结果
         """
-        got = self.sylva.sendVote(pid, option).json()
-        if "code" in got:
-            raise UnexpectedCode(got)
-        console.print(SylvaRender.createVoteTable(got))
+        got = decode(self.sylva.sendVote(pid, option).content, Vote)
+        if not self.quiet:
+            self.printRender(SylvaRender.createVoteTable(got), "sendVote")
+        return got
 
-    def getDevices(self) -> None:
+    @Commands.register("d|devices", readOnly=True)
+    def getDevices(self) -> list[Device]:
         """获取设备列表（交互）
 
         Raises:
             UnexpectedCode: 异常
+
+        Returns:
+            list[Device]: 设备列表
         """
-        got = self.sylva.getDevices().json()
-        if "code" in got:
-            raise UnexpectedCode(got)
-        console.print(SylvaRender.createDevicesTable(got))
+        got = decode(self.sylva.getDevices().content, Device)
+        if not self.quiet:
+            self.printRender(SylvaRender.createDevicesTable(got), "getDevices")
+        return got
 
+    @Commands.register("kd|kick <uuid>")
     def kickDevice(self, uuid: str) -> None:
         """踢出设备（交互）
 
@@ -202,101 +497,427 @@ class SylvaCLI:
         """
         self.sylva.kickDevice(uuid)
 
-    def downloadHoleImage(self, pid: str) -> None:
+    @Commands.register("i|image <pids...>")
+    def downloadHoleImage(self, *pids: str) -> list[str]:
         """下载树洞图片（交互）
 
         Args:
-            pid (str): 树洞 ID
+            pids (str): 树洞 ID, 可同时下载多个树洞
+
+        Returns:
+            list[str]: 文件路径
         """
-        got = self.sylva.getHole(pid).json()
-        if "image" in got:
-            self.sylva.downloadImage(got["image"]["src"], f"images/{got['pid']}")
-            if got["replies"]:
-                for i in got["replies"]:
-                    if "image" in i:
-                        self.sylva.downloadImage(i["image"]["src"], f"images/{pid}")
+        import asyncio
+
+        from .sylva_async import AsyncSylva
+        from .sylva_download import SylvaDownloader
+
+        async def download():
+            async with AsyncSylva(
+                limiter=self.sylva.limiter, retry=self.sylva.retry, http=self.sylva.http
+            ) as sylva:
+                sylva.setToken(self.config["token"])
+                # "verifyImages": true 用 HEAD 请求核对已存在的图片
+                downloader = SylvaDownloader(
+                    sylva,
+                    concurrency=self.config.get("concurrency", 8),
+                    verify=self.config.get("verifyImages", False),
+                )
+                return await downloader.downloadHoles(pids)
+
+        saved = asyncio.run(download())
+        log.info(f"共保存 {len(saved)} 张图片")
+        return saved
+
+    @Commands.register("hl|hollows <hids...>", readOnly=True, perPage=int, limit=int)
+    def getHollowsHoles(
+        self, *hids: str, perPage: int = 20, limit: int = None
+    ) -> list[Hole]:
+        """由多个账号并发获取多个树洞的列表并合并（交互）
+
+        账号由 config.json 中的 `tokens` 指定, 可以是 token 列表或 hid -> token,
+        `rateLimit` 对每个账号分别生效
+
+        Args:
+            hids (str): hid
+            perPage (int, optional): 每页数量
+            limit (int, optional): 合并后的总数量, `None` 表示每个树洞只获取一页
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            list[Hole]: 按 `created_at` 从新到旧排列的树洞
+        """
+        import asyncio
+
+        from .sylva_pool import SylvaPool
+
+        async def fetch():
+            async with SylvaPool(
+                self.config.get("tokens", [self.config["token"]]),
+                self.config.get("rateLimit"),
+                retry=self.sylva.retry,
+                http=self.sylva.http,
+            ) as pool:
+                if limit is None:
+                    return await pool.getHoles(hids, perPage=perPage)
+                merged = pool.iterHollows(hids, int(limit), perPage=perPage)
+                return [i async for i in merged]
+
+        got = [Hole.fromDict(i) for i in asyncio.run(fetch())]
+        if not self.quiet:
+            render = self.render.createContentTable()
+            for i in got:
+                render.addHole(i)
+            self.printRender(render, "getHollowsHoles")
+        return got
+
+    @Commands.register("n|notify on")
+    def startWatcher(self) -> None:
+        """在后台轮询通知与同步中的树洞, 参数由 config.json 中的 `notify` 指定"""
+        from .sylva_watcher import SylvaWatcher
+
+        if self.watcher is None:
+            self.watcher = SylvaWatcher(
+                self.sylva, self.sylvaSync, **self.config.get("notify", {})
+            )
+        self.watcher.start()
+        log.info("已开始轮询通知")
+
+    @Commands.register("n|notify off")
+    def stopWatcher(self) -> None:
+        """停止轮询通知"""
+        if self.watcher is not None:
+            self.watcher.stop()
+            log.info("已停止轮询通知")
+
+    def flushEvents(self) -> None:
+        """输出后台轮询到的新事件, 在提示符前调用"""
+        if self.watcher is None:
+            return
+        for kind, item in self.watcher.drain():
+            match kind:
+                case "notification" | "system":
+                    title = "通知" if kind == "notification" else "系统通知"
+                    content = (
+                        item.get("content", item) if isinstance(item, dict) else item
+                    )
+                    getConsole().print(f"[reply]>[/] {title}: {content}")
+                case "reply":
+                    pid, replies = item
+                    thread = self.sylvaSync.threads.get(pid)
+                    if thread is None:
+                        continue
+                    render = self.render.createContentTable()
+                    render.addHole(thread["hole"])
+                    for i in replies:
+                        render.addHoleReply(i, thread["index"])
+                    self.printRender(render, "flushEvents")
+
+    def getArchive(self) -> "SylvaArchive":
+        """打开本地存档, 路径由 config.json 中的 `archive` 指定
+
+        Returns:
+            SylvaArchive: 存档
+        """
+        from .sylva_archive import SylvaArchive
+
+        with self.lock:
+            if self.archive is None:
+                self.archive = SylvaArchive(self.config.get("archive", "archive.db"))
+        return self.archive
+
+    @Commands.register("a|archive <pids...>")
+    def archiveHoles(self, *pids: str) -> int:
+        """存档树洞及其回复（交互）
+
+        Args:
+            pids (str): 树洞 ID
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            int: 存档的树洞数量
+        """
+        holes = []
+        for pid in pids:
+            got = self.sylva.getHole(pid).json()
+            if "code" in got:
+                raise UnexpectedCode(got)
+            holes.append(got)
+        count = self.getArchive().upsertHoles(holes)
+        log.info(f"已存档 {count} 个树洞")
+        return count
+
+    @Commands.register(
+        "a|archive list <limit>",
+        limit=int,
+        type=str,
+        perPage=int,
+        after=str,
+        search=str,
+        hid=str,
+        since=int,
+        untilPid=int,
+    )
+    def archiveTimeline(self, limit: int, **kwargs) -> int:
+        """存档树洞列表, 不包含回复（交互）
+
+        Args:
+            limit (int): 数量
+
+        Returns:
+            int: 存档的树洞数量
+        """
+        holes = self.sylva.iterHoles(limit=int(limit), **kwargs)
+        count = self.getArchive().upsertHoles(holes)
+        log.info(f"已存档 {count} 个树洞")
+        return count
+
+    @Commands.register("cr|crawl add <pids...>")
+    @Commands.register(
+        "cr|crawl", limit=int, type=str, perPage=int, search=str, hid=str
+    )
+    def crawlHoles(self, *pids: str, **kwargs) -> dict:
+        """爬取树洞到存档, 中断后再次执行会从上次的位置继续（交互）
+
+        Args:
+            pids (str): 要获取的树洞 ID, 不为空时不翻页
+            kwargs: 传给 `SylvaCrawler.crawl` 的参数, 如 `limit`, `type`, `search`, `hid`
+
+        Returns:
+            dict: 进度
+        """
+        from .sylva_crawler import SylvaCrawler
+
+        # "crawl": {"workers": 8, "checkpointEvery": 100} 调整爬虫
+        crawler = SylvaCrawler(
+            self.sylva, self.getArchive(), **self.config.get("crawl", {})
+        )
+        if pids:
+            crawler.add(pids)
+            kwargs["discover"] = False
+        return crawler.crawl(**kwargs)
+
+    @Commands.register(
+        "e|export <what:holes|replies> <path>",
+        limit=int,
+        format=str,
+        compression=str,
+        resume=toBool,
+        type=str,
+        perPage=int,
+        search=str,
+        hid=str,
+    )
+    def exportHoles(
+        self,
+        what: str,
+        path: str,
+        limit: int = None,
+        format: str = None,
+        compression: str = None,
+        resume: bool = True,
+        **kwargs,
+    ) -> int:
+        """导出树洞列表或回复, 中断后再次执行相同的命令会继续导出（交互）
+
+        Args:
+            what (str): `holes` 或 `replies`
+            path (str): 输出路径, 如 `holes.jsonl.gz`, `replies.csv.zst`, `holes.parquet`
+            limit (int, optional): 最多导出的树洞数量
+            format (str, optional): 格式, 默认根据 `path` 推断
+            compression (str, optional): 压缩, 默认根据 `path` 推断
+            resume (bool, optional): `False` 表示忽略检查点重新导出
+
+        Returns:
+            int: 导出的树洞数量
+        """
+        from .sylva_export import SylvaExporter
+
+        exporter = SylvaExporter(self.sylva, path, what, format, compression)
+        return exporter.export(limit, resume, **kwargs)
+
+    @Commands.register(
+        "s|search <query>",
+        readOnly=True,
+        what=toChoice("holes", "replies"),
+        limit=int,
+    )
+    def searchArchive(
+        self, query: str, what: str = "holes", limit: int = 20
+    ) -> list[dict]:
+        """离线搜索存档（交互）
+
+        Args:
+            query (str): 搜索关键字, 至少三个字
+            what (str, optional): `holes` 搜索树洞, `replies` 搜索回复
+            limit (int, optional): 数量
+
+        Returns:
+            list[dict]: 树洞或回复
+        """
+        archive = self.getArchive()
+        got = archive.search(query, what, limit)
+        if self.quiet:
+            return got
+        render = self.render.createContentTable()
+        if what == "holes":
+            for i in got:
+                render.addHole(i)
         else:
-            raise Exception(got)
+            cites = archive.getReplies(i["reply_cid"] for i in got if "reply_cid" in i)
+            for i in got:
+                render.addHoleReply(i, cites)
+        self.printRender(render, "searchArchive")
+        return got
+
+    @Commands.register("cr|crawl status")
+    def getCrawlStats(self) -> dict:
+        """爬取进度（交互）
+
+        Returns:
+            dict: 待获取、已获取与失败的数量
+        """
+        from .sylva_crawler import SylvaCrawler
+
+        stats = SylvaCrawler(self.sylva, self.getArchive()).stats
+        if not self.quiet:
+            getConsole().print(stats)
+        return stats
+
+    @Commands.register("cr|crawl retry")
+    def retryCrawl(self) -> int:
+        """重新获取爬取失败的树洞
+
+        Returns:
+            int: 数量
+        """
+        from .sylva_crawler import SylvaCrawler
+
+        return SylvaCrawler(self.sylva, self.getArchive()).retryFailed()
+
+    @Commands.register("cache", readOnly=True)
+    def getCacheStats(self) -> dict | None:
+        """缓存统计（交互）
+
+        Returns:
+            dict | None: 统计, 关闭缓存时为 `None`
+        """
+        if self.sylva.cache is not None:
+            if not self.quiet:
+                getConsole().print(self.sylva.cache.stats)
+            return self.sylva.cache.stats
+
+    @Commands.register("cache clear")
+    def clearCache(self) -> None:
+        """清空缓存"""
+        if self.sylva.cache is not None:
+            self.sylva.cache.clear()
+
+    @Commands.register("net", readOnly=True)
+    def getNetStats(self) -> dict | None:
+        """网络统计（交互）
 
-    def match(self, command: str) -> None:
+        Returns:
+            dict | None: 统计, 还没有发出请求时为 `None`
+        """
+        if self.sylva.metrics is not None:
+            stats = {**self.sylva.metrics.stats, **self.sylva.flights.stats}
+            if not self.quiet:
+                getConsole().print(stats)
+            return stats
+
+    @Commands.register("stats", readOnly=True)
+    def getCallStats(self) -> list[dict]:
+        """调用统计, 耗时单位为毫秒（交互）
+
+        Returns:
+            list[dict]: 统计
+        """
+        stats = tracer.stats
+        if not self.quiet:
+            self.printRender(SylvaRender.createStatsTable(stats), "stats")
+        return stats
+
+    @Commands.register("stats clear")
+    def clearCallStats(self) -> None:
+        """清空调用统计"""
+        tracer.reset()
+
+    @Commands.register("debug")
+    def debug(self) -> None:
+        """调试模式"""
+        installTraceback()
+        # client 方便调试
+        client = self.sylva.client
+        getConsole().log(
+            "Entered debug mode, you can press ^C or ^Z to exit debug mode"
+        )
+        while True:
+            try:
+                getConsole().print(eval(input(">>> ")))
+            # ^C
+            except KeyboardInterrupt:
+                getConsole().print()
+                log.info("Exited debug mode")
+                break
+            # ^Z
+            except EOFError:
+                log.info("Exited debug mode")
+                break
+            except SyntaxError as e:
+                log.error(e)
+                continue
+
+    def parse(self, command: str) -> list[list[str]]:
+        """拆分命令, 包含空格的参数需在两侧加引号, `;` 分隔多条命令
+
+        Args:
+            command (str): 命令
+
+        Raises:
+            UnknownCommand: 引号不匹配
+
+        Returns:
+            list[list[str]]: 每条命令的参数
+        """
+        return tokenize(command)
+
+    def dispatch(self, args: list[str]):
+        """执行一条已经拆分的命令
+
+        Args:
+            args (list[str]): 参数
+
+        Raises:
+            UnknownCommand: 未知命令、参数数量不对、未知选项或值无效
+
+        Returns:
+            命令的结果
+        """
+        command, args = SylvaCLI.Commands.find(args)
+        varargs, kwargs = command.bind(args)
+        return command.func(self, *varargs, **kwargs)
+
+    def match(self, command: str):
         """交互选项
 
         Args:
-            command (str): 参数
+            command (str): 命令, `;` 分隔的多条命令依次执行
 
         Raises:
             UnknownCommand: 未知命令
+
+        Returns:
+            命令的结果, 多条命令时为结果列表
         """
-        # content 包含空格时需在两侧加引号
-        command = re.findall(r"(['\"](.+)['\"])|([^ ]+)", command)
-        command = list(i[1] if i[1] != "" else i[2] for i in command)
-        match (command):
-            # 发布树洞
-            case ["c" | "create", content, *args]:
-                kwargs = {args[i]: args[i + 1] for i in range(0, len(args), 2)}
-                self.createHole(content, **kwargs)
-            # 回复树洞
-            case ["r" | "reply", pid, cid, content, *args]:
-                kwargs = {args[i]: args[i + 1] for i in range(0, len(args), 2)}
-                self.createHoleReply(pid, content, cid, **kwargs)
-            # 回复树洞
-            case ["r" | "reply", pid, content]:
-                self.createHoleReply(pid, content)
-            # 收藏树洞
-            case ["f" | "follow", pid]:
-                self.followHole(pid)
-            # 获取树洞
-            case ["h" | "hole", pid, *args]:
-                kwargs = {args[i]: args[i + 1] for i in range(0, len(args), 2)}
-                self.getHole(pid, **kwargs)
-            # 获取树洞列表
-            case ["l" | "list", perPage]:
-                self.getHoles(perPage)
-            # 获取树洞列表
-            case ["l" | "list", *args]:
-                kwargs = {args[i]: args[i + 1] for i in range(0, len(args), 2)}
-                self.getHoles(**kwargs)
-            # 取消收藏树洞
-            case ["uf" | "unfollow", pid]:
-                self.unfollowHole(pid)
-            # 投票
-            case ["v" | "vote", pid, option]:
-                self.sendVote(pid, option)
-            # 获取设备
-            case ["d" | "devices"]:
-                self.getDevices()
-            # 踢出设备
-            case ["kd" | "kick", uuid]:
-                self.kickDevice(uuid)
-            # 下载图片
-            case ["i" | "image", pid]:
-                self.downloadHoleImage(pid)
-            # 调试模式
-            case ["debug"]:
-                # client 方便调试
-                client = self.sylva.client
-                console.log(
-                    "Entered debug mode, you can press ^C or ^Z to exit debug mode"
-                )
-                while True:
-                    try:
-                        console.print(eval(input(">>> ")))
-                    # ^C
-                    except KeyboardInterrupt:
-                        console.print()
-                        log.info("Exited debug mode")
-                        break
-                    # ^Z
-                    except EOFError:
-                        log.info("Exited debug mode")
-                        break
-                    except SyntaxError as e:
-                        log.error(e)
-                        continue
-            case []:
-                return
-            case _:
-                raise UnknownCommand(f"未知命令：{command}")
+        results = [self.dispatch(i) for i in self.parse(command)]
+        if len(results) == 1:
+            return results[0]
+        return results or None
 
     def main(self):
         """主循环
@@ -304,8 +925,14 @@ class SylvaCLI:
         Raises:
             e: 调试时抛出异常
         """
+        if SylvaCLI.Debug:
+            installTraceback()
+        if "notify" in self.config:
+            self.startWatcher()
         while True:
             try:
+                self.flushEvents()
+                tracer.flush()
                 command = input("> ")
                 self.match(command)
             # ^C
@@ -319,3 +946,67 @@ class SylvaCLI:
                     log.exception(e)
                 else:
                     log.error(e)
+        tracer.flush()
+
+    def run(self, command: str, args: list[str] = None) -> dict:
+        """执行命令并记录结果
+
+        Args:
+            command (str): 命令
+            args (list[str], optional): 已经拆分的一条命令, 避免重复拆分
+
+        Returns:
+            dict: 结果, 失败时包含错误信息
+        """
+        try:
+            result = self.match(command) if args is None else self.dispatch(args)
+            return {"command": command, "ok": True, "result": result}
+        except Exception as e:
+            return {"command": command, "ok": False, "error": str(e)}
+
+    def batch(self, commands: Iterable[str], workers: int = 8) -> None:
+        """批量执行命令, 按输入顺序以 JSON Lines 输出结果, 每条命令一行
+
+        连续的只读命令并发执行, 其余命令按顺序执行, `;` 连接的命令同样按此调度
+
+        Args:
+            commands (Iterable[str]): 命令, 空行与 `#` 开头的行会被忽略
+            workers (int, optional): 并发数量
+        """
+        self.quiet = True
+
+        def emit(result):
+            sys.stdout.write(json.dumps(result, ensure_ascii=False, default=toJSON))
+            sys.stdout.write("\n")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for line in commands:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    chain = self.parse(line)
+                except UnknownCommand as e:
+                    chain = None
+                    error = {"command": line, "ok": False, "error": str(e)}
+                if chain is None:
+                    while pending:
+                        emit(pending.popleft().result())
+                    emit(error)
+                    continue
+                for args in chain:
+                    command = line if len(chain) == 1 else shlex.join(args)
+                    if SylvaCLI.Commands.readOnly(args):
+                        pending.append(executor.submit(self.run, command, args))
+                        # 限制等待输出的结果数量
+                        while len(pending) > workers * 4:
+                            emit(pending.popleft().result())
+                        continue
+                    while pending:
+                        emit(pending.popleft().result())
+                    emit(self.run(command, args))
+            while pending:
+                emit(pending.popleft().result())
+        sys.stdout.flush()
+        tracer.flush()
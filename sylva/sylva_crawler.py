@@ -0,0 +1,317 @@
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterable, Literal
+
+from ._exception import UnexpectedCode
+from ._log import log
+from ._paging import checkPage
+from .sylva import Sylva
+from .sylva_archive import SylvaArchive
+
+__all__ = ["SylvaCrawler"]
+
+Schema = """
+CREATE TABLE IF NOT EXISTS crawl_cursors (
+    name TEXT PRIMARY KEY,
+    after TEXT,
+    listed INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0
+);
+-- state: 0 待获取, 1 已获取, 2 失败
+CREATE TABLE IF NOT EXISTS crawl_frontier (
+    pid INTEGER PRIMARY KEY,
+    state INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    -- 失败后下次尝试的时间戳
+    next_attempt REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS crawl_frontier_state ON crawl_frontier (state, pid);
+"""
+
+Pending, Fetched, Failed = 0, 1, 2
+
+
+class SylvaCrawler:
+    def __init__(
+        self,
+        sylva: Sylva,
+        archive: SylvaArchive,
+        workers: int = 8,
+        checkpointEvery: int = 100,
+        checkpointInterval: float = 10,
+        maxAttempts: int = 3,
+        retryBackoff: float = 1.0,
+    ) -> None:
+        """可以中断后继续的爬虫, 翻页发现 pid, 由多个线程获取树洞详情并写入存档
+
+        待获取的 pid 与翻页位置保存在存档数据库中, 与存档的树洞在同一个事务中提交,
+        中断后从上次提交的位置继续, 已经获取的 pid 不会重复获取
+
+        Args:
+            sylva (Sylva): 已登录的客户端
+            archive (SylvaArchive): 存档
+            workers (int, optional): 同时获取详情的线程数
+            checkpointEvery (int, optional): 每获取多少个树洞提交一次
+            checkpointInterval (float, optional): 最长多少秒提交一次
+            maxAttempts (int, optional): 每个 pid 最多尝试的次数, 之后标记为失败
+            retryBackoff (float, optional): 第一次失败后等待的秒数, 之后每次翻倍
+        """
+        self.sylva = sylva
+        self.archive = archive
+        self.db = archive.db
+        self.db.executescript(Schema)
+        # 旧的存档没有 next_attempt
+        columns = {i[1] for i in self.db.execute("PRAGMA table_info(crawl_frontier)")}
+        if "next_attempt" not in columns:
+            with self.db:
+                self.db.execute(
+                    "ALTER TABLE crawl_frontier"
+                    " ADD COLUMN next_attempt REAL NOT NULL DEFAULT 0"
+                )
+        self.workers = workers
+        self.checkpointEvery = checkpointEvery
+        self.checkpointInterval = checkpointInterval
+        self.maxAttempts = maxAttempts
+        self.retryBackoff = retryBackoff
+
+    def add(self, pids: Iterable[str]) -> int:
+        """加入待获取的 pid, 已经见过的 pid 会被忽略
+
+        Args:
+            pids (Iterable[str]): 树洞 ID
+
+        Returns:
+            int: 新加入的数量
+        """
+        with self.db:
+            return self._add(pids)
+
+    def _add(self, pids: Iterable[str]) -> int:
+        before = self.db.total_changes
+        self.db.executemany(
+            "INSERT OR IGNORE INTO crawl_frontier (pid) VALUES (?)",
+            ((int(i),) for i in pids),
+        )
+        return self.db.total_changes - before
+
+    def retryFailed(self) -> int:
+        """把失败的 pid 重新标记为待获取
+
+        Returns:
+            int: 数量
+        """
+        with self.db:
+            return self.db.execute(
+                "UPDATE crawl_frontier SET state = ?, attempts = 0, next_attempt = 0"
+                " WHERE state = ?",
+                (Pending, Failed),
+            ).rowcount
+
+    @property
+    def stats(self) -> dict:
+        """进度
+
+        Returns:
+            dict: 待获取、已获取与失败的数量
+        """
+        counts = dict(
+            self.db.execute("SELECT state, COUNT(*) FROM crawl_frontier GROUP BY state")
+        )
+        return {
+            "pending": counts.get(Pending, 0),
+            "fetched": counts.get(Fetched, 0),
+            "failed": counts.get(Failed, 0),
+        }
+
+    def fetchHole(self, pid: int) -> dict:
+        got = self.sylva.getHole(str(pid)).json()
+        if "code" in got:
+            raise UnexpectedCode(got)
+        return got
+
+    def fetchPage(self, type: str, perPage: int, after, search, hid) -> list:
+        return checkPage(self.sylva.getHoles(type, perPage, after, search, hid).json())
+
+    def crawl(
+        self,
+        type: Literal["timeline", "trending", "replied", "following"] = "timeline",
+        perPage: int = 20,
+        search: str = None,
+        hid: str = Sylva.Global,
+        limit: int = None,
+        discover: bool = True,
+    ) -> dict:
+        """翻页发现 pid 并获取详情, 直到翻完或达到 `limit`, 再次调用时从上次的位置继续
+
+        Args:
+            type (Literal[timeline, trending, replied, following], optional): 树洞列表
+            perPage (int, optional): 每页数量
+            search (str, optional): 搜索关键字
+            hid (str, optional): hid
+            limit (int, optional): 这个列表最多发现的 pid 数量, 包括之前发现的
+            discover (bool, optional): 是否翻页, `False` 表示只获取已经加入的 pid
+
+        Raises:
+            UnexpectedCode: 翻页连续失败 `maxAttempts` 次
+
+        Returns:
+            dict: 进度
+        """
+        name = json.dumps([type, search, hid])
+        with self.db:
+            self.db.execute(
+                "INSERT OR IGNORE INTO crawl_cursors (name) VALUES (?)", (name,)
+            )
+        after, listed, done = self.db.execute(
+            "SELECT after, listed, done FROM crawl_cursors WHERE name = ?", (name,)
+        ).fetchone()
+        listing = discover and not done and (limit is None or listed < limit)
+        if after is not None:
+            log.info(f"从 pid {after} 之后继续翻页, 已发现 {listed} 个树洞")
+
+        # future -> pid, 翻页为 None
+        inflight = {}
+        pageAttempts = 0
+        # 翻页失败后在这个时间之前不再翻页
+        pageRetryAt = 0.0
+        # 未提交的树洞
+        fetched = []
+        lastCheckpoint = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.workers + 1)
+        try:
+            while True:
+                # 待获取的 pid 不多时才翻页, 避免 frontier 无限增长
+                if (
+                    listing
+                    and None not in inflight.values()
+                    and time.time() >= pageRetryAt
+                ):
+                    # 等待重试的 pid 不计入, 否则它们会阻止翻页
+                    pending = self.db.execute(
+                        "SELECT COUNT(*) FROM crawl_frontier"
+                        " WHERE state = ? AND next_attempt <= ?",
+                        (Pending, time.time()),
+                    ).fetchone()[0]
+                    if pending - len(inflight) < self.workers * 4:
+                        future = executor.submit(
+                            self.fetchPage, type, perPage, after, search, hid
+                        )
+                        inflight[future] = None
+                free = self.workers - sum(i is not None for i in inflight.values())
+                if free > 0:
+                    running = set(inflight.values())
+                    rows = self.db.execute(
+                        "SELECT pid FROM crawl_frontier"
+                        " WHERE state = ? AND next_attempt <= ?"
+                        " ORDER BY pid DESC LIMIT ?",
+                        (Pending, time.time(), free + len(running)),
+                    )
+                    for (pid,) in rows.fetchall():
+                        if pid not in running and free > 0:
+                            inflight[executor.submit(self.fetchHole, pid)] = pid
+                            free -= 1
+                if not inflight:
+                    # 只剩等待重试的 pid 时等到最早的一个可以重试
+                    wake = self.db.execute(
+                        "SELECT MIN(next_attempt) FROM crawl_frontier WHERE state = ?",
+                        (Pending,),
+                    ).fetchone()[0]
+                    if listing:
+                        wake = pageRetryAt if wake is None else min(wake, pageRetryAt)
+                    if wake is None:
+                        break
+                    time.sleep(
+                        max(0.0, min(wake - time.time(), self.checkpointInterval))
+                    )
+                    continue
+
+                finished, _ = wait(
+                    inflight,
+                    timeout=self.checkpointInterval,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in finished:
+                    pid = inflight.pop(future)
+                    if pid is None:
+                        try:
+                            page = future.result()
+                        except Exception as e:
+                            pageAttempts += 1
+                            log.warning(f"翻页失败：{e}")
+                            if pageAttempts >= self.maxAttempts:
+                                raise
+                            pageRetryAt = time.time() + self.retryBackoff * 2 ** (
+                                pageAttempts - 1
+                            )
+                            continue
+                        pageAttempts = 0
+                        # 最后一页不足 perPage 条
+                        done = len(page) < int(perPage)
+                        if limit is not None and len(page) > limit - listed:
+                            page, done = page[: limit - listed], False
+                        self._add(i["pid"] for i in page)
+                        listed += len(page)
+                        if page:
+                            after = str(page[-1]["pid"])
+                        listing = not done and (limit is None or listed < limit)
+                        self.db.execute(
+                            "UPDATE crawl_cursors SET after = ?, listed = ?, done = ?"
+                            " WHERE name = ?",
+                            (after, listed, int(done), name),
+                        )
+                        continue
+                    try:
+                        fetched.append(future.result())
+                        self.db.execute(
+                            "UPDATE crawl_frontier SET state = ? WHERE pid = ?",
+                            (Fetched, pid),
+                        )
+                    except Exception as e:
+                        # 等待时间从 retryBackoff 开始每次翻倍
+                        self.db.execute(
+                            "UPDATE crawl_frontier SET attempts = attempts + 1,"
+                            " error = ?, state = CASE WHEN attempts + 1 >= ?"
+                            " THEN ? ELSE state END,"
+                            " next_attempt = ? + ? * (1 << attempts) WHERE pid = ?",
+                            (
+                                str(e),
+                                self.maxAttempts,
+                                Failed,
+                                time.time(),
+                                self.retryBackoff,
+                                pid,
+                            ),
+                        )
+                        log.warning(f"获取树洞 {pid} 失败：{e}")
+                if (
+                    len(fetched) >= self.checkpointEvery
+                    or time.monotonic() - lastCheckpoint >= self.checkpointInterval
+                ):
+                    self.checkpoint(fetched)
+                    fetched = []
+                    lastCheckpoint = time.monotonic()
+        finally:
+            # 中断时正在获取的 pid 仍然是待获取的状态
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.checkpoint(fetched)
+        stats = self.stats
+        log.info(
+            f"已获取 {stats['fetched']} 个树洞, 待获取 {stats['pending']} 个,"
+            f" 失败 {stats['failed']} 个"
+        )
+        return stats
+
+    def checkpoint(self, holes: list[dict]) -> None:
+        """在一个事务中写入树洞、pid 状态与翻页位置
+
+        Args:
+            holes (list[dict]): 获取的树洞
+        """
+        # pid 状态与翻页位置已经在当前事务中, 由 upsertHoles 一并提交
+        self.archive.upsertHoles(holes)
+        self.db.commit()
+        if holes:
+            stats = self.stats
+            log.info(f"已获取 {stats['fetched']} 个树洞, 待获取 {stats['pending']} 个")
@@ -0,0 +1,174 @@
+import asyncio
+import os
+from typing import Iterable
+
+import httpx
+
+from ._exception import IncompleteDownload, UnexpectedCode
+from ._log import log
+from .sylva_async import AsyncSylva
+
+__all__ = ["SylvaDownloader"]
+
+
+class SylvaDownloader:
+    ChunkSize = 64 * 1024
+
+    def __init__(
+        self,
+        sylva: AsyncSylva,
+        path: str = "images",
+        concurrency: int = 8,
+        retries: int = 3,
+        verify: bool = False,
+    ) -> None:
+        """批量图片下载器
+
+        Args:
+            sylva (AsyncSylva): 已登录的异步客户端
+            path (str, optional): 保存路径, 每个树洞的图片保存在 `path/pid` 下
+            concurrency (int, optional): 同时下载的图片数量
+            retries (int, optional): 下载中断时的重试次数
+            verify (bool, optional): 已存在的图片是否用 HEAD 请求核对大小,
+                默认直接跳过, 不发出请求
+        """
+        self.sylva = sylva
+        self.path = path
+        self.retries = retries
+        self.verify = verify
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.madeDirs = set()
+
+    def makeDirs(self, path: str) -> None:
+        """创建目录, 每个目录只检查一次
+
+        Args:
+            path (str): 目录
+        """
+        if path not in self.madeDirs:
+            os.makedirs(path, exist_ok=True)
+            self.madeDirs.add(path)
+
+    async def downloadImage(self, src: str, path: str) -> str:
+        """流式下载单张图片, 中断后从已下载的部分继续
+
+        Args:
+            src (str): 链接
+            path (str): 保存路径
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            str: 文件路径
+        """
+        self.makeDirs(path)
+        dest = f"{path}/{src.split('/')[-1]}"
+        # 图片下载完整后才从 .part 改名, 存在即完整
+        if not self.verify and os.path.exists(dest):
+            log.info(f"图片已存在 {dest}")
+            return dest
+        async with self.semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    await self._downloadImage(src, dest)
+                    return dest
+                except (httpx.TransportError, IncompleteDownload) as e:
+                    if attempt == self.retries:
+                        raise
+                    log.warning(f"图片 {src} 下载中断, 正在重试: {e}")
+                    await asyncio.sleep(0.5 * 2**attempt)
+
+    async def isDownloaded(self, src: str, dest: str) -> bool:
+        """用 HEAD 请求核对已存在的图片的大小
+
+        Args:
+            src (str): 链接
+            dest (str): 文件路径
+
+        Returns:
+            bool: 大小一致时为 `True`, 无法核对时为 `False`
+        """
+        if not os.path.exists(dest):
+            return False
+        head = await self.sylva.client.head(f"{AsyncSylva.IMGRoot}/{src}")
+        if (
+            head.status_code != 200
+            or "content-length" not in head.headers
+            or "content-encoding" in head.headers
+        ):
+            return False
+        return int(head.headers["content-length"]) == os.path.getsize(dest)
+
+    async def _downloadImage(self, src: str, dest: str) -> None:
+        if self.verify and await self.isDownloaded(src, dest):
+            log.info(f"图片已存在 {dest}")
+            return
+        part = f"{dest}.part"
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        async with self.sylva.client.stream(
+            "GET", f"{AsyncSylva.IMGRoot}/{src}", headers=headers
+        ) as image:
+            if image.status_code == 416:
+                # .part 已失效, 删除后由重试重新下载
+                os.remove(part)
+                raise IncompleteDownload(f"{part} 无法续传")
+            if image.status_code not in {200, 206}:
+                raise UnexpectedCode(f"{image.status_code} {src}")
+            if image.status_code == 200:
+                offset = 0
+
+            total = None
+            if (
+                "content-length" in image.headers
+                and "content-encoding" not in image.headers
+            ):
+                total = offset + int(image.headers["content-length"])
+
+            with open(part, "ab" if offset else "wb") as f:
+                async for chunk in image.aiter_bytes(SylvaDownloader.ChunkSize):
+                    f.write(chunk)
+
+        if total is not None and os.path.getsize(part) != total:
+            raise IncompleteDownload(f"{dest} 下载不完整")
+        os.replace(part, dest)
+        log.info(f"图片已保存至 {dest}")
+
+    async def downloadHoleImages(self, hole: dict) -> list[str]:
+        """下载树洞及其回复中的所有图片
+
+        Args:
+            hole (dict): 树洞
+
+        Returns:
+            list[str]: 文件路径
+        """
+        path = f"{self.path}/{hole['pid']}"
+        # 同一张图片只下载一次, 否则两个下载会写入同一个 .part
+        srcs = dict.fromkeys(
+            i["image"]["src"] for i in [hole, *(hole["replies"] or [])] if "image" in i
+        )
+        return await asyncio.gather(*(self.downloadImage(i, path) for i in srcs))
+
+    async def downloadHoles(self, pids: Iterable[str]) -> list[str]:
+        """并发下载多个树洞的图片
+
+        Args:
+            pids (Iterable[str]): 树洞 ID
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            list[str]: 文件路径
+        """
+        holes = []
+        for resp in await self.sylva.getHolesByPid(dict.fromkeys(pids)):
+            got = resp.json()
+            if "code" in got:
+                raise UnexpectedCode(got)
+            holes.append(got)
+        saved = await asyncio.gather(*(self.downloadHoleImages(i) for i in holes))
+        return [i for paths in saved for i in paths]
@@ -0,0 +1,430 @@
+import csv
+import io
+import json
+import os
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, Literal
+
+from ._exception import UnexpectedCode
+from ._log import log
+from .sylva import Sylva
+
+__all__ = ["SylvaExporter"]
+
+# 文件后缀 -> 格式
+Formats = {".jsonl": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+# 文件后缀 -> 压缩
+Compressions = {".gz": "gzip", ".zst": "zstd"}
+
+
+def guessFormat(path: str) -> tuple[str, str | None]:
+    """根据文件名推断格式与压缩, 如 `holes.csv.gz`
+
+    Args:
+        path (str): 文件名
+
+    Returns:
+        tuple[str, str | None]: 格式与压缩, 无法推断的格式为 `jsonl`
+    """
+    root, ext = os.path.splitext(path)
+    compression = Compressions.get(ext)
+    if compression is not None:
+        root, ext = os.path.splitext(root)
+    return Formats.get(ext, "jsonl"), compression
+
+
+class SegmentedStream:
+    def __init__(self, path: str, compression: str = None, offset: int = None) -> None:
+        """按段压缩的输出文件, 每段是一个完整的 gzip member 或 zstd frame
+
+        多个 member 或 frame 首尾相接仍然是合法的压缩文件, 段的边界就是可以安全截断并继续写入的位置
+
+        Args:
+            path (str): 文件路径
+            compression (str, optional): `gzip`, `zstd` 或 `None`
+            offset (int, optional): 从该位置截断并继续写入, `None` 表示新建文件
+        """
+        if compression == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("zstd 压缩需要安装 zstandard") from None
+            self.zstd = zstandard
+        elif compression not in ("gzip", None):
+            raise ValueError(f"未知的压缩：{compression}")
+        self.compression = compression
+        self.compressor = None
+        if offset is None:
+            self.file = open(path, "wb")
+        else:
+            self.file = open(path, "r+b")
+            self.file.truncate(offset)
+            self.file.seek(offset)
+
+    def write(self, data: bytes) -> None:
+        if self.compression is None:
+            self.file.write(data)
+            return
+        if self.compressor is None:
+            if self.compression == "gzip":
+                # wbits 31 表示带 gzip 头
+                self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+            else:
+                self.compressor = self.zstd.ZstdCompressor().compressobj()
+        self.file.write(self.compressor.compress(data))
+
+    def endSegment(self) -> int:
+        """结束当前段并写入磁盘
+
+        Returns:
+            int: 文件长度, 即下一段的起始位置
+        """
+        if self.compressor is not None:
+            if self.compression == "gzip":
+                self.file.write(self.compressor.flush())
+            else:
+                self.file.write(
+                    self.compressor.flush(self.zstd.COMPRESSOBJ_FLUSH_FINISH)
+                )
+            self.compressor = None
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self) -> None:
+        self.endSegment()
+        self.file.close()
+
+
+class JSONLWriter:
+    def __init__(self, path: str, columns: dict, compression: str = None, state=None):
+        """JSON Lines, 每行保存接口返回的完整内容
+
+        Args:
+            path (str): 文件路径
+            columns (dict): 列, 不使用
+            compression (str, optional): 压缩
+            state (optional): `checkpoint` 返回的状态, `None` 表示新建文件
+        """
+        self.stream = SegmentedStream(path, compression, state)
+
+    def write(self, rows: list[dict]) -> None:
+        self.stream.write(
+            "".join(json.dumps(i, ensure_ascii=False) + "\n" for i in rows).encode()
+        )
+
+    def checkpoint(self) -> int:
+        """结束当前段, 返回的状态可以用于继续写入"""
+        return self.stream.endSegment()
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+class CSVWriter:
+    def __init__(self, path: str, columns: dict, compression: str = None, state=None):
+        """CSV, 嵌套的字段保存为 JSON
+
+        Args:
+            path (str): 文件路径
+            columns (dict): 列名 -> 类型
+            compression (str, optional): 压缩
+            state (optional): `checkpoint` 返回的状态, `None` 表示新建文件
+        """
+        self.columns = columns
+        self.stream = SegmentedStream(path, compression, state)
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        if not state:
+            self.writer.writerow(columns)
+
+    def write(self, rows: list[dict]) -> None:
+        self.writer.writerows(flatten(i, self.columns) for i in rows)
+        self.stream.write(self.buffer.getvalue().encode())
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def checkpoint(self) -> int:
+        """结束当前段, 返回的状态可以用于继续写入"""
+        if self.buffer.tell():
+            self.write([])
+        return self.stream.endSegment()
+
+    def close(self) -> None:
+        self.checkpoint()
+        self.stream.close()
+
+
+class ParquetWriter:
+    def __init__(self, path: str, columns: dict, compression: str = None, state=None):
+        """Parquet, `path` 为目录, 每个检查点之间的数据写入一个文件
+
+        Parquet 文件关闭时才写入元数据, 无法在中断后继续写入, 因此按检查点分成多个文件,
+        读取时可以把目录当作一个数据集, 如 `pyarrow.dataset.dataset(path)`
+
+        Args:
+            path (str): 目录
+            columns (dict): 列名 -> 类型
+            compression (str, optional): 压缩, Parquet 默认使用 snappy
+            state (optional): `checkpoint` 返回的状态, `None` 表示新建目录
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("导出 Parquet 需要安装 pyarrow") from None
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        types = {int: pyarrow.int64(), bool: pyarrow.bool_(), str: pyarrow.string()}
+        self.schema = pyarrow.schema([(k, types[v]) for k, v in columns.items()])
+        self.columns = columns
+        self.path = path
+        self.compression = compression or "snappy"
+        self.part = state or 0
+        os.makedirs(path, exist_ok=True)
+        # 删除上次中断时没有写完的文件
+        for i in os.listdir(path):
+            if i.startswith("part-") and int(i[5:10]) >= self.part:
+                os.remove(os.path.join(path, i))
+        self.writer = None
+
+    def write(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(
+                os.path.join(self.path, f"part-{self.part:05}.parquet"),
+                self.schema,
+                compression=self.compression,
+            )
+        self.writer.write_table(
+            self.pa.Table.from_pylist(
+                [dict(zip(self.columns, flatten(i, self.columns))) for i in rows],
+                self.schema,
+            )
+        )
+
+    def checkpoint(self) -> int:
+        """关闭当前文件, 返回的状态可以用于继续写入"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+            self.part += 1
+        return self.part
+
+    def close(self) -> None:
+        self.checkpoint()
+
+
+Writers = {"jsonl": JSONLWriter, "csv": CSVWriter, "parquet": ParquetWriter}
+
+
+def flatten(row: dict, columns: dict) -> list:
+    """把一条记录转换为固定的列, 嵌套的字段转换为 JSON
+
+    Args:
+        row (dict): 记录
+        columns (dict): 列名 -> 类型
+
+    Returns:
+        list: 各列的值
+    """
+    values = []
+    for name, kind in columns.items():
+        value = row.get(name)
+        if value is not None:
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value, ensure_ascii=False)
+            elif kind is not str:
+                value = kind(value)
+        values.append(value)
+    return values
+
+
+class SylvaExporter:
+    # 导出的列 -> 类型, 图片与投票保存为 JSON
+    Columns = {
+        "holes": {
+            "pid": int,
+            "name": str,
+            "school_name": str,
+            "tag": str,
+            "content": str,
+            "created_at": int,
+            "followed": bool,
+            "followers_count": int,
+            "replies_count": int,
+            "image": str,
+            "vote": str,
+        },
+        "replies": {
+            "cid": int,
+            "pid": int,
+            "name": str,
+            "school_name": str,
+            "tag": str,
+            "content": str,
+            "created_at": int,
+            "reply_cid": int,
+            "image": str,
+        },
+    }
+
+    def __init__(
+        self,
+        sylva: Sylva,
+        path: str,
+        what: Literal["holes", "replies"] = "holes",
+        format: Literal["jsonl", "csv", "parquet"] = None,
+        compression: Literal["gzip", "zstd"] = None,
+        bufferSize: int = 1000,
+        checkpointEvery: int = 10000,
+        workers: int = 4,
+    ) -> None:
+        """流式导出树洞列表或回复, 定期记录检查点, 中断后从上次的位置继续
+
+        内存中最多保留 `bufferSize` 条待写入的记录、预取的一页树洞和 `workers * 2` 个树洞的回复
+
+        Args:
+            sylva (Sylva): 已登录的客户端
+            path (str): 输出路径, 检查点保存在 `path.checkpoint`
+            what (Literal[holes, replies], optional): 导出树洞列表或树洞的回复
+            format (Literal[jsonl, csv, parquet], optional): 格式, 默认根据 `path` 推断
+            compression (Literal[gzip, zstd], optional): 压缩, 默认根据 `path` 推断
+            bufferSize (int, optional): 每次写入的记录数
+            checkpointEvery (int, optional): 每导出多少个树洞记录一次检查点
+            workers (int, optional): 同时获取回复的树洞数量
+        """
+        if what not in SylvaExporter.Columns:
+            raise ValueError(f"未知的导出内容：{what}")
+        guessed, guessedCompression = guessFormat(path)
+        self.sylva = sylva
+        self.path = path
+        self.what = what
+        self.format = format or guessed
+        if self.format not in Writers:
+            raise ValueError(f"未知的格式：{self.format}")
+        self.compression = compression or guessedCompression
+        self.bufferSize = bufferSize
+        self.checkpointEvery = checkpointEvery
+        self.workers = workers
+        self.checkpointPath = f"{path}.checkpoint"
+
+    def loadCheckpoint(self) -> dict | None:
+        if not os.path.exists(self.checkpointPath):
+            return None
+        with open(self.checkpointPath) as f:
+            return json.load(f)
+
+    def saveCheckpoint(self, checkpoint: dict) -> None:
+        # 先写入临时文件再替换, 中断时不会留下写了一半的检查点
+        temp = f"{self.checkpointPath}.tmp"
+        with open(temp, "wt") as f:
+            json.dump(checkpoint, f)
+        os.replace(temp, self.checkpointPath)
+
+    def iterRows(self, holes: Iterable[dict]) -> Iterator[tuple[dict, list[dict]]]:
+        """按顺序取得每个树洞要导出的记录
+
+        Args:
+            holes (Iterable[dict]): 树洞
+
+        Yields:
+            Iterator[tuple[dict, list[dict]]]: 树洞与记录
+        """
+        if self.what == "holes":
+            for hole in holes:
+                yield hole, [hole]
+            return
+
+        def fetch(hole):
+            got = self.sylva.getHole(hole["pid"]).json()
+            if "code" in got:
+                raise UnexpectedCode(got)
+            replies = got.get("replies") or []
+            for i in replies:
+                i.setdefault("pid", hole["pid"])
+            return hole, replies
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for hole in holes:
+                pending.append(executor.submit(fetch, hole))
+                # 限制已经获取但还没有写入的回复数量
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def export(self, limit: int = None, resume: bool = True, **kwargs) -> int:
+        """导出
+
+        Args:
+            limit (int, optional): 最多导出的树洞数量, 包括之前已经导出的
+            resume (bool, optional): 存在检查点时是否继续上次的导出
+            kwargs: 传给 `Sylva.iterHoles` 的参数, 如 `type`, `search`, `hid`
+
+        Raises:
+            ValueError: 检查点与本次导出的参数不同
+            UnexpectedCode: 异常
+
+        Returns:
+            int: 导出的树洞数量, 包括之前已经导出的
+        """
+        query = {
+            "what": self.what,
+            "format": self.format,
+            "compression": self.compression,
+            "kwargs": kwargs,
+        }
+        checkpoint = self.loadCheckpoint() if resume else None
+        if checkpoint is None:
+            checkpoint = {"query": query, "after": None, "holes": 0, "rows": 0}
+            state = None
+        else:
+            if checkpoint["query"] != query:
+                raise ValueError(
+                    f"{self.checkpointPath} 的导出参数与本次不同, 请删除检查点或使用相同的参数"
+                )
+            state = checkpoint["state"]
+            log.info(f"从 {checkpoint['holes']} 个树洞之后继续导出")
+        if limit is not None:
+            limit -= checkpoint["holes"]
+            if limit <= 0:
+                return checkpoint["holes"]
+
+        writer = Writers[self.format](
+            self.path, SylvaExporter.Columns[self.what], self.compression, state
+        )
+        holes = self.sylva.iterHoles(after=checkpoint["after"], limit=limit, **kwargs)
+        buffer = []
+        pending = 0
+        try:
+            for hole, rows in self.iterRows(holes):
+                buffer.extend(rows)
+                if len(buffer) >= self.bufferSize:
+                    writer.write(buffer)
+                    buffer.clear()
+                checkpoint["after"] = str(hole["pid"])
+                checkpoint["holes"] += 1
+                checkpoint["rows"] += len(rows)
+                pending += 1
+                if pending >= self.checkpointEvery:
+                    writer.write(buffer)
+                    buffer.clear()
+                    checkpoint["state"] = writer.checkpoint()
+                    self.saveCheckpoint(checkpoint)
+                    pending = 0
+                    log.info(f"已导出 {checkpoint['holes']} 个树洞")
+            writer.write(buffer)
+        finally:
+            writer.close()
+        # 导出完成, 再次导出时重新开始
+        if os.path.exists(self.checkpointPath):
+            os.remove(self.checkpointPath)
+        log.info(
+            f"已导出 {checkpoint['holes']} 个树洞, {checkpoint['rows']} 条记录至 {self.path}"
+        )
+        return checkpoint["holes"]
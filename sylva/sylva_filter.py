@@ -0,0 +1,459 @@
+import itertools
+import operator
+import re
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from ._command import unquote
+from ._exception import InvalidQuery
+from ._log import log
+
+__all__ = ["Filter", "Condition", "And", "Or", "Not", "Query", "parseQuery"]
+
+# 查询中的一个记号, 条件的值可以用引号包含空格, 正则表达式可以写成 /.../
+Token = re.compile(
+    r"""\s*(?:(?P<paren>[()])|(?P<word>and|or|not)(?![\w=!<>:~])"""
+    r"""|(?P<field>\w+)\s*(?P<op>!=|>=|<=|[=<>:~])\s*"""
+    r"""(?P<value>"(?:[^"\\]|\\.)*"|'[^']*'|/(?:[^/\\]|\\.)*/|[^\s()]+)"""
+    r"""|(?P<bad>\S+))""",
+    re.DOTALL,
+)
+Relative = re.compile(r"(\d+)([smhdw])")
+Units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def toTime(value: str) -> int:
+    """时间戳、相对时间或 ISO 格式的本地时间
+
+    Args:
+        value (str): 如 `1792141464`, `3d`（三天前）或 `2026-10-01T08:00`
+
+    Raises:
+        InvalidQuery: 无法解析
+
+    Returns:
+        int: 时间戳（秒）
+    """
+    if value.isdigit():
+        return int(value)
+    if (match := Relative.fullmatch(value)) is not None:
+        return int(time.time()) - int(match[1]) * Units[match[2]]
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        raise InvalidQuery(f"无法解析时间：{value}") from None
+
+
+# 查询中的字段名 -> (树洞或回复的字段, 值的类型)
+Fields = {
+    "pid": ("pid", int),
+    "cid": ("cid", int),
+    "name": ("name", str),
+    "school": ("school_name", str),
+    "school_name": ("school_name", str),
+    "tag": ("tag", str),
+    "content": ("content", str),
+    "created": ("created_at", toTime),
+    "created_at": ("created_at", toTime),
+    "followers": ("followers_count", int),
+    "followers_count": ("followers_count", int),
+    "replies": ("replies_count", int),
+    "replies_count": ("replies_count", int),
+}
+# 由 API 完成的条件, 只能用 `=` 并以 and 连接
+Pushdown = ("search", "hid", "type")
+# 运算符 -> 判断, 相同的代价下越便宜的判断越先执行
+Operators = {
+    "=": (lambda value, bound: value in bound, 1),
+    "!=": (lambda value, bound: value not in bound, 1),
+    ">": (lambda value, bound: value > bound, 1),
+    ">=": (lambda value, bound: value >= bound, 1),
+    "<": (lambda value, bound: value < bound, 1),
+    "<=": (lambda value, bound: value <= bound, 1),
+    ":": (lambda value, bound: bound in value, 2),
+    "~": (lambda value, bound: bound.search(value) is not None, 3),
+}
+
+
+class Filter(ABC):
+    """过滤条件, 可以用 `&`, `|` 与 `~` 组合, 调用时返回树洞或回复是否匹配"""
+
+    # 估计的判断代价, `And` 与 `Or` 先执行代价低的条件
+    cost = 1
+
+    @abstractmethod
+    def __call__(self, item) -> bool:
+        """判断树洞或回复是否匹配
+
+        Args:
+            item: 树洞或回复, 字典或模型
+
+        Returns:
+            bool: 是否匹配
+        """
+
+    def __and__(self, other: "Filter") -> "Filter":
+        return And(self, other)
+
+    def __or__(self, other: "Filter") -> "Filter":
+        return Or(self, other)
+
+    def __invert__(self) -> "Filter":
+        return Not(self)
+
+
+class Condition(Filter):
+    def __init__(self, field: str, op: str, bound) -> None:
+        """单个字段的条件, 缺少该字段时只有 `!=` 匹配
+
+        Args:
+            field (str): 树洞或回复的字段, 如 `school_name`
+            op (str): `=` 或 `!=` 时 `bound` 为可选值的集合, `:` 为子串,
+                `~` 为编译后的正则表达式, 其余为比较
+            bound: 条件的值
+        """
+        self.field = field
+        self.op = op
+        self.bound = bound
+        self.test, self.cost = Operators[op]
+        self.missing = op == "!="
+
+    def __call__(self, item) -> bool:
+        value = item.get(self.field)
+        if value is None:
+            return self.missing
+        return self.test(value, self.bound)
+
+    def __repr__(self) -> str:
+        return f"Condition({self.field!r}, {self.op!r}, {self.bound!r})"
+
+
+class And(Filter):
+    def __init__(self, *filters: Filter) -> None:
+        """全部匹配, 遇到不匹配的条件立即返回
+
+        Args:
+            filters (Filter): 条件
+        """
+        flat = []
+        for i in filters:
+            flat.extend(i.filters if isinstance(i, And) else [i])
+        self.filters = sorted(flat, key=lambda i: i.cost)
+        self.cost = sum(i.cost for i in self.filters)
+
+    def __call__(self, item) -> bool:
+        for i in self.filters:
+            if not i(item):
+                return False
+        return True
+
+    def __repr__(self) -> str:
+        return f"And{tuple(self.filters)!r}"
+
+
+class Or(Filter):
+    def __init__(self, *filters: Filter) -> None:
+        """任一匹配, 遇到匹配的条件立即返回
+
+        Args:
+            filters (Filter): 条件
+        """
+        flat = []
+        for i in filters:
+            flat.extend(i.filters if isinstance(i, Or) else [i])
+        self.filters = sorted(flat, key=lambda i: i.cost)
+        self.cost = sum(i.cost for i in self.filters)
+
+    def __call__(self, item) -> bool:
+        for i in self.filters:
+            if i(item):
+                return True
+        return False
+
+    def __repr__(self) -> str:
+        return f"Or{tuple(self.filters)!r}"
+
+
+class Not(Filter):
+    def __init__(self, filter: Filter) -> None:
+        """不匹配
+
+        Args:
+            filter (Filter): 条件
+        """
+        self.filter = filter
+        self.cost = filter.cost
+
+    def __call__(self, item) -> bool:
+        return not self.filter(item)
+
+    def __repr__(self) -> str:
+        return f"Not({self.filter!r})"
+
+
+class Query:
+    def __init__(self, where: Filter = None, params: dict = None) -> None:
+        """查询, 由 API 完成的参数与本地逐个判断的条件
+
+        Args:
+            where (Filter, optional): 本地判断的条件, `None` 表示全部匹配
+            params (dict, optional): 传给 `getHoles` 的 `search`, `hid` 与 `type`
+        """
+        self.where = where
+        self.params = params or {}
+
+    def __bool__(self) -> bool:
+        return self.where is not None or bool(self.params)
+
+    def __call__(self, item) -> bool:
+        return self.where is None or self.where(item)
+
+    def filter(self, items: Iterable) -> Iterator:
+        """逐个判断, 不会提前读取
+
+        Args:
+            items (Iterable): 树洞或回复
+
+        Returns:
+            Iterator: 匹配的树洞或回复
+        """
+        if self.where is None:
+            return iter(items)
+        return filter(self.where, items)
+
+    def conditions(self) -> list[Condition]:
+        """以 and 连接在最外层的条件, 只有它们可以转换为翻页的停止条件"""
+        if isinstance(self.where, Condition):
+            return [self.where]
+        if isinstance(self.where, And):
+            return [i for i in self.where.filters if isinstance(i, Condition)]
+        return []
+
+    def bounds(self) -> dict:
+        """从最外层的 `created_at` 与 `pid` 条件得到 `iterHoles` 的翻页范围
+
+        时间线从新到旧排列, `created_at` 的下限与 `pid` 的下限可以提前停止翻页,
+        `pid` 的上限可以作为起始位置, 这些条件仍然会在本地判断
+
+        Returns:
+            dict: `since`, `untilPid` 与 `after`
+        """
+        bounds = {}
+
+        def lower(key, value):
+            bounds[key] = max(bounds.get(key, value), value)
+
+        def upper(key, value):
+            bounds[key] = min(bounds.get(key, value), value)
+
+        for i in self.conditions():
+            match i.field, i.op:
+                case "created_at", ">=":
+                    lower("since", i.bound)
+                case "created_at", ">":
+                    lower("since", i.bound + 1)
+                case "pid", ">":
+                    lower("untilPid", i.bound)
+                case "pid", ">=":
+                    lower("untilPid", i.bound - 1)
+                case "pid", "<":
+                    upper("after", i.bound)
+                case "pid", "<=":
+                    upper("after", i.bound + 1)
+                case "pid", "=":
+                    lower("untilPid", min(i.bound) - 1)
+                    upper("after", max(i.bound) + 1)
+        return bounds
+
+    def scan(
+        self,
+        sylva,
+        perPage: int = 20,
+        limit: int = None,
+        scan: int = None,
+        **kwargs,
+    ) -> Iterator[dict]:
+        """翻页并逐个判断, 匹配 `limit` 个或超出翻页范围时停止翻页
+
+        Args:
+            sylva (Sylva): 客户端
+            perPage (int, optional): 每页数量
+            limit (int, optional): 最多返回的匹配数量
+            scan (int, optional): 最多获取的树洞数量
+            kwargs: 传给 `iterHoles` 的参数, 如 `type`, `after`
+
+        Raises:
+            InvalidQuery: 查询与参数冲突
+
+        Yields:
+            Iterator[dict]: 匹配的树洞
+        """
+        for key, value in self.params.items():
+            if kwargs.get(key, value) != value:
+                raise InvalidQuery(f"{key} 与查询中的值冲突：{kwargs[key]}")
+        kwargs.update(self.params)
+        if kwargs.get("type", "timeline") == "timeline":
+            for key, value in self.bounds().items():
+                if key == "after":
+                    after = kwargs.get("after")
+                    kwargs[key] = str(
+                        value if after is None else min(int(after), value)
+                    )
+                else:
+                    kwargs[key] = max(kwargs.get(key) or value, value)
+        holes = sylva.iterHoles(perPage=perPage, limit=scan, **kwargs)
+        # zip 先取树洞再计数, 计数器的下一个值即获取的数量
+        scanned = itertools.count()
+        counted = map(operator.itemgetter(0), zip(holes, scanned))
+        matched = 0
+        try:
+            for i in itertools.islice(self.filter(counted), limit):
+                matched += 1
+                yield i
+        finally:
+            holes.close()
+            log.info(f"获取了 {next(scanned)} 个树洞, {matched} 个匹配")
+
+
+def parseQuery(text: str = None, *filters: Filter, pushdown: bool = True) -> Query:
+    """解析查询
+
+    条件形如 `字段 运算符 值`, 多个条件用 `and`, `or` 与 `not` 组合, 相邻的条件为 and,
+    如 `school=北京大学,清华大学 content:考试 (replies>=10 or followers>=20)`
+
+    - `=` 与 `!=`: 等于或不等于逗号分隔的任一值, `created` 只能用范围
+    - `:`: 包含子串
+    - `~`: 匹配正则表达式, 如 `name~/^A/`
+    - `>`, `>=`, `<`, `<=`: 比较 `pid`, `created`, `followers` 或 `replies`,
+      `created` 可以是时间戳、相对时间（如 `3d`）或 ISO 格式的本地时间
+    - `search`, `hid`, `type`: 交给 API, 只能用 `=` 并以 and 连接在最外层
+
+    Args:
+        text (str, optional): 查询, `None` 表示没有条件
+        filters (Filter): 以 and 连接的其他条件
+        pushdown (bool, optional): 是否允许交给 API 的条件, 过滤回复时为 `False`
+
+    Raises:
+        InvalidQuery: 无法解析
+
+    Returns:
+        Query: 查询
+    """
+    params = {}
+    where = Parser(text, params, pushdown).parse() if text else None
+    for i in filters:
+        where = i if where is None else where & i
+    return Query(where, params)
+
+
+class Parser:
+    def __init__(self, text: str, params: dict, pushdown: bool) -> None:
+        self.text = text
+        self.params = params
+        self.pushdown = pushdown
+        self.tokens = list(Token.finditer(text))
+        self.index = 0
+
+    def peek(self, group: str) -> str | None:
+        if self.index < len(self.tokens):
+            return self.tokens[self.index][group]
+        return None
+
+    def parse(self) -> Filter | None:
+        where = self.parseOr(0)
+        if self.index < len(self.tokens):
+            raise InvalidQuery(f"多余的内容：{self.tokens[self.index][0].strip()}")
+        return where
+
+    def parseOr(self, depth: int) -> Filter | None:
+        pushed = len(self.params)
+        filters = [self.parseAnd(depth)]
+        while self.peek("word") == "or":
+            self.index += 1
+            filters.append(self.parseAnd(depth))
+        if len(filters) == 1:
+            return filters[0]
+        if None in filters or len(self.params) != pushed:
+            raise InvalidQuery(f"{'、'.join(Pushdown)} 只能以 and 连接")
+        return Or(*filters)
+
+    def parseAnd(self, depth: int) -> Filter | None:
+        filters = []
+        while self.index < len(self.tokens):
+            if self.peek("word") == "or" or self.peek("paren") == ")":
+                break
+            if filters and self.peek("word") == "and":
+                self.index += 1
+            filters.append(self.parseNot(depth))
+        if not filters:
+            raise InvalidQuery(f"缺少条件：{self.text}")
+        filters = [i for i in filters if i is not None]
+        if not filters:
+            return None
+        return filters[0] if len(filters) == 1 else And(*filters)
+
+    def parseNot(self, depth: int) -> Filter | None:
+        if self.index >= len(self.tokens):
+            raise InvalidQuery(f"缺少条件：{self.text}")
+        token = self.tokens[self.index]
+        self.index += 1
+        if token["word"] == "not":
+            where = self.parseNot(depth + 1)
+            if where is None:
+                raise InvalidQuery(f"{'、'.join(Pushdown)} 只能以 and 连接")
+            return Not(where)
+        if token["paren"] == "(":
+            where = self.parseOr(depth + 1)
+            if self.peek("paren") != ")":
+                raise InvalidQuery(f"括号不匹配：{self.text}")
+            self.index += 1
+            return where
+        if token["field"] is not None:
+            return self.condition(token, depth)
+        raise InvalidQuery(f"无法解析：{token[0].strip()}")
+
+    def condition(self, token: re.Match, depth: int) -> Condition | None:
+        name, op, value = token["field"], token["op"], token["value"]
+        if value[0] == "/" and op == "~":
+            value = value[1:-1].replace("\\/", "/")
+        else:
+            value = unquote(value)
+
+        if name in Pushdown:
+            if not self.pushdown:
+                raise InvalidQuery(f"不支持的字段：{name}")
+            if op != "=" or depth > 0:
+                raise InvalidQuery(f"{'、'.join(Pushdown)} 只能用 = 并以 and 连接")
+            self.params[name] = value
+            return None
+        if name not in Fields:
+            raise InvalidQuery(f"未知字段：{name}")
+        field, type = Fields[name]
+
+        # 时间戳精确到秒, 相等几乎不会匹配
+        if type is toTime and op in ("=", "!="):
+            raise InvalidQuery(
+                f"{name} 不能用 {op}, 请用范围, 如 "
+                f"{name}>=2026-10-01 and {name}<2026-10-02"
+            )
+        try:
+            match op:
+                case "=" | "!=":
+                    bound = {type(i) for i in value.split(",") if i}
+                case ":":
+                    bound = value
+                case "~":
+                    bound = re.compile(value)
+                case _:
+                    if type is str:
+                        raise InvalidQuery(f"{name} 不能比较大小")
+                    bound = type(value)
+        except re.error as e:
+            raise InvalidQuery(f"无效的正则表达式：{value} ({e})") from None
+        except ValueError:
+            raise InvalidQuery(f"{name} 的值无效：{value}") from None
+        if op in ":~" and type is not str:
+            raise InvalidQuery(f"{name} 不是文本")
+        return Condition(field, op, bound)
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from typing import Iterable
+
+from .sylva_models import Reply
+
+__all__ = ["ReplyIndex"]
+
+
+class ReplyIndex:
+    def __init__(self, replies: Iterable[Reply] = ()) -> None:
+        """单个树洞的回复索引, 只追加, 可以随同步增量更新
+
+        可以直接作为渲染时的 `cites` 使用
+
+        Args:
+            replies (Iterable[Reply], optional): 回复
+        """
+        # cid -> 回复, 按加入顺序
+        self.replies = {}
+        # cid -> 加入顺序, 用于排序过滤结果
+        self.position = {}
+        # reply_cid -> 回复它的 cid
+        self.children = defaultdict(list)
+        self.byName = defaultdict(list)
+        self.bySchool = defaultdict(list)
+        self.add(replies)
+
+    def add(self, replies: Iterable[Reply]) -> list[Reply]:
+        """加入回复, 已索引的回复会被跳过
+
+        Args:
+            replies (Iterable[Reply]): 回复
+
+        Returns:
+            list[Reply]: 新加入的回复
+        """
+        added = []
+        for i in replies:
+            cid = i["cid"]
+            if cid in self.replies:
+                continue
+            self.position[cid] = len(self.replies)
+            self.replies[cid] = i
+            if "reply_cid" in i:
+                self.children[i["reply_cid"]].append(cid)
+            self.byName[i.get("name")].append(cid)
+            self.bySchool[i.get("school_name")].append(cid)
+            added.append(i)
+        return added
+
+    def repliesTo(self, cid: int) -> list[Reply]:
+        """直接回复 `cid` 的回复
+
+        Args:
+            cid (int): 回复 ID
+
+        Returns:
+            list[Reply]: 回复
+        """
+        return [self.replies[i] for i in self.children.get(int(cid), [])]
+
+    def chain(self, cid: int) -> list[Reply]:
+        """沿引用向上找到对话的起点
+
+        Args:
+            cid (int): 回复 ID
+
+        Returns:
+            list[Reply]: 从起点到 `cid` 的回复, 引用的回复未索引时从其后开始
+        """
+        chain = []
+        seen = set()
+        cid = int(cid)
+        while cid in self.replies and cid not in seen:
+            seen.add(cid)
+            reply = self.replies[cid]
+            chain.append(reply)
+            cid = reply.get("reply_cid")
+        chain.reverse()
+        return chain
+
+    def subthread(self, cid: int) -> list[Reply]:
+        """`cid` 所在的对话, 包括引用链和所有直接或间接回复它的回复
+
+        Args:
+            cid (int): 回复 ID
+
+        Returns:
+            list[Reply]: 按加入顺序排列的回复
+        """
+        chain = self.chain(cid)
+        found = {i["cid"] for i in chain}
+        stack = [int(cid)]
+        while stack:
+            for i in self.children.get(stack.pop(), []):
+                if i not in found:
+                    found.add(i)
+                    stack.append(i)
+        return self.ordered(found)
+
+    def filter(
+        self, who: str | Iterable[str] = None, which: str | Iterable[str] = None
+    ) -> list[Reply]:
+        """按昵称和高校过滤回复, 只访问匹配的回复
+
+        Args:
+            who (str | Iterable[str], optional): 只看 `who`
+            which (str | Iterable[str], optional): 只看 `which` 高校
+
+        Returns:
+            list[Reply]: 按加入顺序排列的回复
+        """
+        found = None
+        for key, index in ((who, self.byName), (which, self.bySchool)):
+            if key is None:
+                continue
+            keys = {key} if isinstance(key, str) else set(key)
+            cids = {cid for i in keys for cid in index.get(i, [])}
+            found = cids if found is None else found & cids
+        if found is None:
+            return list(self.replies.values())
+        return self.ordered(found)
+
+    def ordered(self, cids: Iterable[int]) -> list[Reply]:
+        """按加入顺序排列回复
+
+        Args:
+            cids (Iterable[int]): 回复 ID
+
+        Returns:
+            list[Reply]: 回复
+        """
+        return [self.replies[i] for i in sorted(cids, key=self.position.__getitem__)]
+
+    def get(self, cid: int, default=None) -> Reply | None:
+        return self.replies.get(cid, default)
+
+    def __getitem__(self, cid: int) -> Reply:
+        return self.replies[cid]
+
+    def __contains__(self, cid: int) -> bool:
+        return cid in self.replies
+
+    def __len__(self) -> int:
+        return len(self.replies)
+
+    def __iter__(self):
+        return iter(self.replies.values())
@@ -0,0 +1,193 @@
+import sys
+
+try:
+    import orjson
+
+    loads = orjson.loads
+except ImportError:
+    import json
+
+    loads = json.loads
+
+from ._exception import UnexpectedCode
+from ._trace import tracer
+
+__all__ = ["Model", "Image", "Vote", "Reply", "Hole", "Device", "decode", "toJSON"]
+
+
+class Model:
+    """使用 `__slots__` 的紧凑模型, 可以像字典一样读取字段
+
+    值为 `None` 的字段视为不存在, 与接口中省略的字段一致, 未知字段保存在 `extra` 中
+    """
+
+    __slots__ = ("extra",)
+    # 字段 -> 模型, 值为列表时逐项解码
+    Nested = {}
+    # 取值重复较多的字段, 解码时驻留字符串以共享内存
+    Interned = frozenset()
+
+    def __init__(self, **fields) -> None:
+        for i in self.Fields:
+            setattr(self, i, None)
+        self.extra = None
+        for k, v in fields.items():
+            self[k] = v
+
+    @classmethod
+    def fromDict(cls, data: dict) -> "Model":
+        """由接口返回的字典创建模型
+
+        Args:
+            data (dict): 字典
+
+        Returns:
+            Model: 模型
+        """
+        model = cls.__new__(cls)
+        get = data.get
+        for i in cls.Fields:
+            setattr(model, i, get(i))
+        model.extra = None
+        if not data.keys() <= cls.FieldSet:
+            model.extra = {k: v for k, v in data.items() if k not in cls.FieldSet}
+        for k, nested in cls.Nested.items():
+            v = getattr(model, k)
+            if v is None:
+                continue
+            if isinstance(v, list):
+                setattr(model, k, [nested.fromDict(i) for i in v])
+            else:
+                setattr(model, k, nested.fromDict(v))
+        for k in cls.Interned:
+            v = getattr(model, k)
+            if type(v) is str:
+                setattr(model, k, sys.intern(v))
+        return model
+
+    def toDict(self) -> dict:
+        """转换为字典, 省略值为 `None` 的字段
+
+        Returns:
+            dict: 字典
+        """
+        data = {}
+        for i in self.Fields:
+            v = getattr(self, i)
+            if v is None:
+                continue
+            if isinstance(v, Model):
+                v = v.toDict()
+            elif isinstance(v, list) and v and isinstance(v[0], Model):
+                v = [j.toDict() for j in v]
+            data[i] = v
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key: str):
+        if key in self.FieldSet:
+            v = getattr(self, key)
+            if v is not None:
+                return v
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key in self.FieldSet:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        if key in self.FieldSet:
+            return getattr(self, key) is not None
+        return self.extra is not None and key in self.extra
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Model):
+            return type(self) is type(other) and self.toDict() == other.toDict()
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.toDict()!r})"
+
+    def __init_subclass__(cls) -> None:
+        cls.Fields = tuple(i for i in cls.__slots__ if i != "extra")
+        cls.FieldSet = frozenset(cls.Fields)
+
+
+class Image(Model):
+    __slots__ = ("src",)
+
+
+class Vote(Model):
+    __slots__ = ("options", "results", "voted")
+
+
+class Reply(Model):
+    __slots__ = (
+        *("cid", "pid", "name", "school_name", "tag"),
+        *("content", "created_at", "reply_cid", "image"),
+    )
+    Nested = {"image": Image}
+    Interned = frozenset({"name", "school_name", "tag"})
+
+
+class Hole(Model):
+    __slots__ = (
+        *("pid", "name", "school_name", "tag", "content", "created_at"),
+        *("followed", "followers_count", "replies_count", "image", "vote", "replies"),
+    )
+    Nested = {"image": Image, "vote": Vote, "replies": Reply}
+    Interned = frozenset({"name", "school_name", "tag"})
+
+
+class Device(Model):
+    __slots__ = ("uuid", "login_time", "name")
+    Interned = frozenset({"name"})
+
+
+def decode(content: bytes, model: type[Model]) -> Model | list[Model]:
+    """一次解析响应内容并创建模型, 安装 orjson 时使用 orjson 解析
+
+    Args:
+        content (bytes): 响应内容
+        model (type[Model]): 模型
+
+    Raises:
+        UnexpectedCode: 返回了错误码
+
+    Returns:
+        Model | list[Model]: 模型, 响应为列表时返回模型列表
+    """
+    with tracer.span("decode", model.__name__, bytes=len(content)):
+        data = loads(content)
+        if isinstance(data, dict):
+            if "code" in data:
+                raise UnexpectedCode(data)
+            return model.fromDict(data)
+        return [model.fromDict(i) for i in data]
+
+
+def toJSON(obj):
+    """`json.dumps` 的 `default`, 将模型转换为字典
+
+    Args:
+        obj: 无法直接序列化的对象
+
+    Returns:
+        可以序列化的对象
+    """
+    if isinstance(obj, Model):
+        return obj.toDict()
+    return str(obj)
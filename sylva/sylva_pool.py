@@ -0,0 +1,156 @@
+import asyncio
+from typing import AsyncIterator, Iterable
+
+import httpx
+
+from ._exception import LoginError
+from ._paging import checkPage, mergeHoles
+from .sylva_async import AsyncSylva
+from .sylva_cache import SylvaCache
+from .sylva_transport import HTTPConfig, RetryPolicy, TokenBucket
+
+__all__ = ["SylvaPool"]
+
+
+class SylvaPool:
+    def __init__(
+        self,
+        tokens: Iterable[str] | dict[str, str],
+        rateLimit: dict = None,
+        maxConnections: int = 20,
+        cache: SylvaCache = None,
+        retry: RetryPolicy = None,
+        transport: httpx.AsyncBaseTransport = None,
+        http: HTTPConfig = None,
+    ) -> None:
+        """多账号会话池, 每个账号有独立的连接池与令牌桶, 请求分发给最空闲的账号
+
+        Args:
+            tokens (Iterable[str] | dict[str, str]): token, 为字典时是 hid -> token,
+                带该 hid 的请求固定由对应账号发送
+            rateLimit (dict, optional): 每个账号的 `TokenBucket` 参数, `None` 表示不限流
+            maxConnections (int, optional): 每个账号的连接池大小
+            cache (SylvaCache, optional): 所有账号共享的响应缓存
+            retry (RetryPolicy, optional): 重试策略
+            transport (httpx.AsyncBaseTransport, optional): 实际发送请求的传输层
+            http (HTTPConfig, optional): 每个账号的连接配置
+        """
+        if not isinstance(tokens, dict):
+            tokens = {str(i): token for i, token in enumerate(tokens)}
+        self.accounts = {}
+        for key, token in tokens.items():
+            limiter = TokenBucket(**rateLimit) if rateLimit is not None else None
+            sylva = AsyncSylva(maxConnections, cache, limiter, retry, transport, http)
+            sylva.setToken(token)
+            self.accounts[str(key)] = sylva
+        if not self.accounts:
+            raise LoginError("至少需要一个 token")
+        # 账号 -> 正在发送的请求数
+        self.inflight = dict.fromkeys(self.accounts, 0)
+
+    async def __aenter__(self) -> "SylvaPool":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """关闭所有账号的连接池"""
+        await asyncio.gather(*(i.aclose() for i in self.accounts.values()))
+
+    def pick(self, hid: str = None) -> str:
+        """选择发送请求的账号
+
+        Args:
+            hid (str, optional): hid, 有对应账号时使用该账号
+
+        Returns:
+            str: 账号
+        """
+        if hid is not None and str(hid) in self.accounts:
+            return str(hid)
+        return min(self.inflight, key=self.inflight.__getitem__)
+
+    async def request(self, method: str, *args, **kwargs):
+        """由一个账号调用 `AsyncSylva` 的方法
+
+        Args:
+            method (str): 方法名, 如 `getHole`
+
+        Returns:
+            方法的返回值
+        """
+        account = self.pick(kwargs.get("hid"))
+        self.inflight[account] += 1
+        try:
+            return await getattr(self.accounts[account], method)(*args, **kwargs)
+        finally:
+            self.inflight[account] -= 1
+
+    async def getHolesByPid(self, pids: Iterable[str]) -> list[httpx.Response]:
+        """由所有账号并发获取多个树洞
+
+        Args:
+            pids (Iterable[str]): 树洞 ID
+
+        Returns:
+            list[httpx.Response]: 响应, 与 `pids` 顺序一致
+        """
+        return await asyncio.gather(*(self.request("getHole", i) for i in pids))
+
+    async def getHoles(self, hids: Iterable[str], **kwargs) -> list[dict]:
+        """并发获取多个树洞的列表并合并
+
+        Args:
+            hids (Iterable[str]): hid
+            kwargs: `AsyncSylva.getHoles` 的其余参数
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            list[dict]: 按 `created_at` 从新到旧排列的树洞, 已按 pid 去重
+        """
+        pages = await asyncio.gather(
+            *(self.request("getHoles", hid=i, **kwargs) for i in hids)
+        )
+        merged = {}
+        for page in pages:
+            for hole in checkPage(page.json()):
+                merged.setdefault(hole["pid"], hole)
+        return sorted(merged.values(), key=lambda i: i["created_at"], reverse=True)
+
+    def iterHollows(
+        self, hids: Iterable[str], limit: int = None, **kwargs
+    ) -> AsyncIterator[dict]:
+        """由多个账号并发获取多个树洞的时间线, 合并为一个按 `created_at` 从新到旧的列表
+
+        Args:
+            hids (Iterable[str]): hid
+            limit (int, optional): 最多获取的数量
+            kwargs: `AsyncSylva.iterHoles` 的其余参数, 如 `perPage` 与 `since`
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            AsyncIterator[dict]: 树洞, 已按 pid 去重
+        """
+        iterators = []
+        for i, hid in enumerate(hids):
+            # 没有固定账号的 hid 轮流分给各个账号
+            account = str(hid) if str(hid) in self.accounts else None
+            if account is None:
+                account = list(self.accounts)[i % len(self.accounts)]
+            sylva = self.accounts[account]
+            iterators.append(sylva.iterHoles(hid=hid, limit=limit, **kwargs))
+        return mergeHoles(iterators, limit)
+
+    @property
+    def stats(self) -> dict:
+        """每个账号的请求计数
+
+        Returns:
+            dict: 账号 -> 计数
+        """
+        return {k: v.metrics.stats for k, v in self.accounts.items()}
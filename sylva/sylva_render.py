@@ -1,8 +1,26 @@
-import maya
-from rich import box
-from rich.table import Table
+import time
+from typing import Iterable, Iterator
 
-__all__ = ["SylvaRender"]
+from ._time import slangTime
+
+# rich.table 导入较慢, 在首次渲染时才导入
+__all__ = ["SylvaRender", "SylvaFlatRender"]
+
+
+def formatCite(cid: int, cites: dict) -> str:
+    """引用的回复, 不在 `cites` 中时只显示 cid, 如搜索结果引用了未存档的回复
+
+    Args:
+        cid (int): 引用的回复 ID
+        cites (dict): 用于生成引用的所有回复
+
+    Returns:
+        str: 引用
+    """
+    cite = cites.get(cid)
+    if cite is None:
+        return f"[reply]>[/] [at]@[/][cid]{cid}[/]"
+    return f"[reply]>[/] [name]{cite['name']}[/]: {cite['content']}"
 
 
 class SylvaRender:
@@ -10,23 +28,79 @@ class SylvaRender:
 
     def __init__(self):
         self.table = None
+        self.edge = True
+        # 同一次渲染中的相对时间使用同一个当前时间
+        self.now = time.time()
 
     @classmethod
-    def createContentTable(cls) -> "SylvaRender":
+    def createContentTable(cls, edge: bool = True) -> "SylvaRender":
         """创建内容表
 
+        Args:
+            edge (bool, optional): 是否绘制上下边框, 分块输出时由调用者绘制
+
         Returns:
             SylvaRender: 表
         """
-        render = SylvaRender()
+        from rich import box
+        from rich.table import Table
+
+        render = cls()
+        render.edge = edge
         render.table = Table(
-            box=box.HORIZONTALS, show_header=False, show_lines=True, expand=True
+            box=box.HORIZONTALS,
+            show_header=False,
+            show_lines=True,
+            show_edge=edge,
+            expand=True,
         )
         # 请不要使用垂直居中！！！否则可能出现空行！！！丑陋的空行！！！
         render.table.add_column(ratio=20)
         render.table.add_column(ratio=80)
         return render
 
+    @classmethod
+    def iterContentTables(
+        cls, hole: dict | None, replies: Iterable[dict], cites: dict, size: int = 50
+    ) -> Iterator["SylvaRender"]:
+        """分块创建内容表, 每块最多 `size` 行, 只在取出时才排版
+
+        各块没有上下边框, 依次输出时用分隔线连接, 与一整张内容表的样式相同
+
+        Args:
+            hole (dict | None): 树洞, 为 `None` 时只包含回复
+            replies (Iterable[dict]): 回复, 可以是逐步获取的迭代器
+            cites (dict): 用于生成引用的所有回复
+            size (int, optional): 每块的行数
+
+        Yields:
+            SylvaRender: 表
+        """
+        render = cls.createContentTable(edge=False)
+        now = render.now
+        if hole is not None:
+            render.addHole(hole)
+        for i in replies:
+            if render.table.row_count >= size:
+                yield render
+                render = cls.createContentTable(edge=False)
+                render.now = now
+            render.addHoleReply(i, cites)
+        if render.table.row_count:
+            yield render
+
+    @classmethod
+    def createSeparator(cls):
+        """创建分块输出时使用的分隔线, 与内容表的边框相同
+
+        Returns:
+            Padding: 分隔线
+        """
+        from rich.padding import Padding
+        from rich.rule import Rule
+
+        return Padding(Rule(characters="─", style="none"), (0, 1))
+
     @classmethod
     def createVoteTable(cls, vote: dict) -> "SylvaRender":
         """创建投票表
@@ -37,18 +111,20 @@ class SylvaRender:
         Returns:
             SylvaRender: 表
         """
+        from rich import box
+        from rich.table import Table
+
         render = SylvaRender()
         render.table = Table(box=box.MINIMAL, **SylvaRender.Style)
 
         for _ in vote["options"]:
             render.table.add_column(justify="center")
 
-        if "voted" in vote:
-            voted = vote["voted"]
-            index = vote["options"].index(voted)
-            vote["options"][index] = f"[voted]{vote['options'][index]}[/]"
-
-        options = list(str(i) for i in vote["options"])
+        # 投票可能被再次渲染, 不能修改原始数据
+        voted = vote.get("voted")
+        options = list(
+            f"[voted]{i}[/]" if i == voted else str(i) for i in vote["options"]
+        )
         results = list(str(i) for i in vote["results"])
         render.table.add_row(*options)
         if results[0] != "-1":
@@ -66,6 +142,9 @@ class SylvaRender:
         Returns:
             SylvaRender: 表
         """
+        from rich import box
+        from rich.table import Table
+
         render = SylvaRender()
         render.table = Table(box=box.MINIMAL, expand=True)
         render.table.add_column("UUID", justify="center")
@@ -75,8 +154,43 @@ class SylvaRender:
         for i in devices:
             render.table.add_row(
                 i["uuid"],
-                maya.when(str(i["login_time"]), timezone="Asia/Shanghai").slang_time(),
+                slangTime(i["login_time"], render.now),
+                i["name"],
+            )
+
+        return render
+
+    @classmethod
+    def createStatsTable(cls, stats: list[dict]) -> "SylvaRender":
+        """创建调用统计表
+
+        Args:
+            stats (list[dict]): `Tracer.stats`
+
+        Returns:
+            SylvaRender: 表
+        """
+        from rich import box
+        from rich.table import Table
+
+        render = SylvaRender()
+        render.table = Table(box=box.MINIMAL, expand=True)
+        render.table.add_column("Kind")
+        render.table.add_column("Name")
+        for i in ("Calls", "Errors", "p50", "p90", "p99", "Max", "Bytes", "Retries"):
+            render.table.add_column(i, justify="right")
+        render.table.add_column("Cached", justify="right")
+
+        for i in stats:
+            render.table.add_row(
+                i["kind"],
                 i["name"],
+                str(i["calls"]),
+                str(i["errors"]),
+                *(f"{i[k]:.1f}" for k in ("p50", "p90", "p99", "max")),
+                str(i["bytes"]),
+                str(i["retries"]),
+                str(i["cached"]),
             )
 
         return render
@@ -88,12 +202,12 @@ class SylvaRender:
             self.table (Table): 内容表
             hole (dict): 树洞
         """
+        from rich.table import Table
+
         tag = f'{hole["tag"]}' if "tag" in hole else ""
         schoolName = f'{hole["school_name"]}' if "school_name" in hole else ""
 
-        createdAt = maya.when(
-            str(hole["created_at"]), timezone="Asia/Shanghai"
-        ).slang_time()
+        createdAt = slangTime(hole["created_at"], self.now)
 
         hasImage = "[image]i[/]" if "image" in hole else ""
         hasVote = "[vote]v[/]" if "vote" in hole else ""
@@ -124,12 +238,12 @@ class SylvaRender:
             reply (dict): 单个回复
             cites (dict): 用于生成引用的所有回复
         """
+        from rich.table import Table
+
         tag = f'{reply["tag"]}' if "tag" in reply else ""
         schoolName = f'{reply["school_name"]}' if "school_name" in reply else ""
 
-        createdAt = maya.when(
-            str(reply["created_at"]), timezone="Asia/Shanghai"
-        ).slang_time()
+        createdAt = slangTime(reply["created_at"], self.now)
 
         hasImage = "[image]i[/]" if "image" in reply else ""
 
@@ -144,12 +258,121 @@ class SylvaRender:
         right = Table(box=None, **SylvaRender.Style)
         right.add_column(overflow="fold")
         if "reply_cid" in reply:
-            cite = cites[reply["reply_cid"]]
-            right.add_row(f"[reply]>[/] [name]{cite['name']}[/]: {cite['content']}")
+            right.add_row(formatCite(reply["reply_cid"], cites))
             right.add_row()
         right.add_row(reply["content"])
         self.table.add_row(left, right)
 
     # See https://rich.readthedocs.io/en/stable/protocol.html#console-customization
     def __rich__(self):
+        if not self.edge:
+            from rich.padding import Padding
+
+            # 补上左右边框所占的宽度
+            return Padding(self.table, (0, 1))
         return self.table
+
+
+class CachedCell:
+    def __init__(self, renderable) -> None:
+        """缓存测量结果的单元格, 同一行被多次排版时只测量一次
+
+        Args:
+            renderable: 实际渲染的内容
+        """
+        self.renderable = renderable
+        self.measurements = {}
+
+    def __rich_console__(self, console, options):
+        yield self.renderable
+
+    def __rich_measure__(self, console, options):
+        from rich.measure import Measurement
+
+        measurement = self.measurements.get(options.max_width)
+        if measurement is None:
+            measurement = Measurement.get(console, options, self.renderable)
+            self.measurements[options.max_width] = measurement
+        return measurement
+
+
+class SylvaFlatRender(SylvaRender):
+    """与 `SylvaRender` 布局相同, 但每行只由两段预先组合的 `Text` 构成
+
+    不再为每行创建嵌套的左右两张表, 排版时不需要递归测量
+    """
+
+    @classmethod
+    def createContentTable(cls, edge: bool = True) -> "SylvaFlatRender":
+        """创建内容表
+
+        Args:
+            edge (bool, optional): 是否绘制上下边框, 分块输出时由调用者绘制
+
+        Returns:
+            SylvaFlatRender: 表
+        """
+        render = super().createContentTable(edge)
+        # 补上嵌套表的内边距
+        render.table.padding = (0, 2)
+        return render
+
+    def addHole(self, hole: dict) -> None:
+        """向内容表中添加树洞
+
+        Args:
+            hole (dict): 树洞
+        """
+        from rich.console import Group
+        from rich.text import Text
+
+        tag = f'{hole["tag"]}' if "tag" in hole else ""
+        schoolName = f'{hole["school_name"]}' if "school_name" in hole else ""
+
+        createdAt = slangTime(hole["created_at"], self.now)
+
+        hasImage = "[image]i[/]" if "image" in hole else ""
+        hasVote = "[vote]v[/]" if "vote" in hole else ""
+        followed = "followed" if hole["followed"] else "default"
+        followersCount = f"[star]*[/] {hole['followers_count']}"
+        repliesCount = f"[reply]>[/] {hole['replies_count']}"
+
+        left = Text.from_markup(
+            f"[tag]{tag}[/][schoolName]{schoolName}[/]\n"
+            f"{hasImage}{hasVote} [{followed}]{hole['pid']}[/]\n"
+            f"{followersCount} | {repliesCount}\n"
+            f"{createdAt}",
+            justify="right",
+        )
+        right = Text.from_markup(hole["content"], overflow="fold")
+        if "vote" in hole:
+            right = Group(right, Text(), self.createVoteTable(hole["vote"]))
+        self.table.add_row(CachedCell(left), CachedCell(right))
+
+    def addHoleReply(self, reply: dict, cites: dict) -> None:
+        """向内容表中添加回复
+
+        Args:
+            reply (dict): 单个回复
+            cites (dict): 用于生成引用的所有回复
+        """
+        from rich.text import Text
+
+        tag = f'{reply["tag"]}' if "tag" in reply else ""
+        schoolName = f'{reply["school_name"]}' if "school_name" in reply else ""
+
+        createdAt = slangTime(reply["created_at"], self.now)
+
+        hasImage = "[image]i[/]" if "image" in reply else ""
+
+        left = Text.from_markup(
+            f"[tag]{tag}[/][schoolName]{schoolName}[/]\n"
+            f'{hasImage} [name]{reply["name"]}[/][at]@[/][cid]{reply["cid"]}[/]\n'
+            f"{createdAt}",
+            justify="right",
+        )
+        content = reply["content"]
+        if "reply_cid" in reply:
+            content = f"{formatCite(reply['reply_cid'], cites)}\n\n{content}"
+        right = Text.from_markup(content, overflow="fold")
+        self.table.add_row(CachedCell(left), CachedCell(right))
@@ -0,0 +1,182 @@
+import threading
+import time
+from typing import Iterable
+
+from .sylva import Sylva
+from .sylva_index import ReplyIndex
+from .sylva_models import Hole, Reply, decode
+
+__all__ = ["SylvaSync"]
+
+
+class SylvaSync:
+    def __init__(self, sylva: Sylva, unfollowedLimit: int = 2) -> None:
+        """增量同步关注的树洞, 只返回上次同步后的新回复
+
+        Args:
+            sylva (Sylva): 已登录的客户端
+            unfollowedLimit (int, optional): 每次 `poll` 最多请求的不在关注列表中的树洞数量
+        """
+        self.sylva = sylva
+        # pid -> {"hole": 树洞, "index": 回复索引, "lastCid": 最新回复 cid}
+        self.threads = {}
+        # 同步中但不在关注列表中的树洞, 无法从列表得知回复数, 只能轮流请求详情
+        self.unfollowed = set()
+        self.unfollowedLimit = unfollowedLimit
+        # 后台通知线程也会调用 poll
+        self.lock = threading.RLock()
+
+    def watch(self, pid: str) -> list[Reply]:
+        """开始同步树洞
+
+        Args:
+            pid (str): 树洞 ID
+
+        Returns:
+            list[Reply]: 树洞的所有回复
+        """
+        with self.lock:
+            if str(pid) not in self.threads:
+                self.threads[str(pid)] = {
+                    "hole": None,
+                    "index": ReplyIndex(),
+                    "lastCid": -1,
+                    "synced": 0.0,
+                }
+                created = True
+            else:
+                created = False
+        try:
+            return self.sync(pid)
+        except Exception:
+            if created:
+                self.unwatch(pid)
+            raise
+
+    def unwatch(self, pid: str) -> None:
+        """停止同步树洞
+
+        Args:
+            pid (str): 树洞 ID
+        """
+        with self.lock:
+            self.threads.pop(str(pid), None)
+            self.unfollowed.discard(str(pid))
+
+    def sync(self, pid: str) -> list[Reply]:
+        """同步树洞, 将新回复合并到本地副本
+
+        请求时不持有锁, 只在合并时加锁, 慢请求不会阻塞其他树洞的同步
+
+        Args:
+            pid (str): 树洞 ID
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            list[Reply]: 上次同步后的新回复, 同步期间停止同步时为空
+        """
+        # 同步需要最新数据, 跳过缓存
+        if self.sylva.cache is not None:
+            self.sylva.cache.invalidate(f"hole:{pid}")
+        got = decode(self.sylva.getHole(pid).content, Hole)
+
+        replies = got.replies or []
+        got.replies = None
+        with self.lock:
+            thread = self.threads.get(str(pid))
+            if thread is None:
+                return []
+            delta = [i for i in replies if int(i.cid) > thread["lastCid"]]
+            thread["index"].add(delta)
+            if delta:
+                thread["lastCid"] = max(int(i.cid) for i in delta)
+            thread["hole"] = got
+            thread["synced"] = time.monotonic()
+            return delta
+
+    def merge(self, pid: str, replies: Iterable[Reply]) -> ReplyIndex | None:
+        """合并在其他地方获取的回复, 之后的同步不会再把它们当作新回复
+
+        Args:
+            pid (str): 树洞 ID
+            replies (Iterable[Reply]): 回复
+
+        Returns:
+            ReplyIndex | None: 树洞的回复索引, 树洞不在同步中时为 `None`
+        """
+        with self.lock:
+            thread = self.threads.get(str(pid))
+            if thread is None:
+                return None
+            added = thread["index"].add(replies)
+            if added:
+                cids = (int(i["cid"]) for i in added)
+                thread["lastCid"] = max(thread["lastCid"], *cids)
+            return thread["index"]
+
+    def poll(self, limit: int = 20) -> dict[str, list[Reply]]:
+        """同步回复数有变化的树洞
+
+        先获取关注列表中的回复数, 回复数不变的树洞不会请求详情, 列表中已经找到所有
+        同步中的树洞时停止翻页. 翻完列表仍未找到的树洞记为未关注, 之后不再为它们翻页,
+        每次最多请求其中 `unfollowedLimit` 个的详情, 由 `lastCid` 得到新回复.
+        每次最多请求 `limit` 个树洞的详情, 最久未同步的优先, 其余的留到下次
+
+        Args:
+            limit (int, optional): 每次最多同步的树洞数量, `None` 表示不限制
+
+        Returns:
+            dict[str, list[Reply]]: pid -> 新回复, 只包含有新回复的树洞
+        """
+        with self.lock:
+            known = {
+                pid: (thread["hole"]["replies_count"], thread["synced"])
+                for pid, thread in self.threads.items()
+                if thread["hole"] is not None
+            }
+            watched = set(self.threads)
+            unfollowed = self.unfollowed & watched
+        if not watched:
+            return {}
+
+        # 只为可能在关注列表中的树洞翻页
+        wanted = watched - unfollowed
+        counts = {}
+        if wanted:
+            if self.sylva.cache is not None:
+                self.sylva.cache.invalidate("holes:")
+            holes = self.sylva.iterHoles(type="following", perPage=50)
+            try:
+                for hole in holes:
+                    pid = str(hole["pid"])
+                    if pid in wanted:
+                        counts[pid] = hole["replies_count"]
+                        if len(counts) == len(wanted):
+                            break
+                else:
+                    missing = wanted - counts.keys()
+                    wanted -= missing
+                    unfollowed |= missing
+                    with self.lock:
+                        self.unfollowed |= missing & self.threads.keys()
+            finally:
+                holes.close()
+
+        def synced(pid: str) -> float:
+            return known[pid][1] if pid in known else 0.0
+
+        stale = [
+            pid
+            for pid in wanted
+            if pid not in known or counts.get(pid) != known[pid][0]
+        ]
+        stale += sorted(unfollowed, key=synced)[: self.unfollowedLimit]
+        stale.sort(key=synced)
+        changed = {}
+        for pid in stale[:limit]:
+            delta = self.sync(pid)
+            if delta:
+                changed[pid] = delta
+        return changed
@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+
+from ._trace import Tracer
+
+__all__ = ["JSONLExporter", "PrometheusExporter"]
+
+
+class JSONLExporter:
+    def __init__(self, path: str = "trace.jsonl") -> None:
+        """每次调用追加一行 JSON
+
+        Args:
+            path (str, optional): 文件路径
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "at", encoding="utf-8")
+
+    def emit(self, span: dict) -> None:
+        """写入一次调用
+
+        Args:
+            span (dict): 调用记录
+        """
+        line = json.dumps(span, ensure_ascii=False, default=str)
+        with self.lock:
+            self.file.write(line)
+            self.file.write("\n")
+
+    def flush(self, tracer: Tracer) -> None:
+        with self.lock:
+            self.file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+class PrometheusExporter:
+    # 导出的分位数
+    Quantiles = (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"))
+
+    def __init__(self, path: str = "sylva.prom", prefix: str = "sylva") -> None:
+        """以 Prometheus 文本格式写出统计, 可以由 node_exporter 的 textfile collector 读取
+
+        每次 `flush` 重写整个文件, 先写入临时文件再替换, 读取者不会读到一半的文件
+
+        Args:
+            path (str, optional): 文件路径
+            prefix (str, optional): 指标名前缀
+        """
+        self.path = path
+        self.prefix = prefix
+
+    def emit(self, span: dict) -> None:
+        pass
+
+    def flush(self, tracer: Tracer) -> None:
+        temp = f"{self.path}.tmp"
+        with open(temp, "wt", encoding="utf-8") as f:
+            f.write(self.format(tracer.stats))
+        os.replace(temp, self.path)
+
+    def close(self) -> None:
+        pass
+
+    def format(self, stats: list[dict]) -> str:
+        """转换为 Prometheus 文本格式
+
+        Args:
+            stats (list[dict]): `Tracer.stats`
+
+        Returns:
+            str: 文本
+        """
+        p = self.prefix
+        metrics = {
+            f"{p}_calls_total": ("counter", "调用次数", []),
+            f"{p}_errors_total": ("counter", "抛出异常的调用次数", []),
+            f"{p}_responses_total": ("counter", "按状态码统计的响应数", []),
+            f"{p}_bytes_total": ("counter", "下载的字节数", []),
+            f"{p}_retries_total": ("counter", "重试次数", []),
+            f"{p}_cache_hits_total": ("counter", "缓存命中次数", []),
+            f"{p}_call_seconds": ("summary", "调用耗时（秒）", []),
+        }
+        for i in stats:
+            labels = f'kind="{i["kind"]}",name="{escape(i["name"])}"'
+            metrics[f"{p}_calls_total"][2].append(f"{{{labels}}} {i['calls']}")
+            metrics[f"{p}_errors_total"][2].append(f"{{{labels}}} {i['errors']}")
+            for status, count in sorted(i["statuses"].items()):
+                metrics[f"{p}_responses_total"][2].append(
+                    f'{{{labels},status="{status}"}} {count}'
+                )
+            metrics[f"{p}_bytes_total"][2].append(f"{{{labels}}} {i['bytes']}")
+            metrics[f"{p}_retries_total"][2].append(f"{{{labels}}} {i['retries']}")
+            metrics[f"{p}_cache_hits_total"][2].append(f"{{{labels}}} {i['cached']}")
+            seconds = metrics[f"{p}_call_seconds"][2]
+            for quantile, key in PrometheusExporter.Quantiles:
+                seconds.append(f'{{{labels},quantile="{quantile}"}} {i[key] / 1000}')
+            seconds.append(f"_sum{{{labels}}} {i['total'] / 1000}")
+            seconds.append(f"_count{{{labels}}} {i['calls']}")
+
+        lines = []
+        for name, (kind, help, samples) in metrics.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(name + i for i in samples)
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    """转义标签值
+
+    Args:
+        value (str): 标签值
+
+    Returns:
+        str: 转义后的标签值
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,445 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+import httpx
+
+from ._log import log
+from ._trace import tracer
+
+__all__ = [
+    "TokenBucket",
+    "RetryPolicy",
+    "TransportMetrics",
+    "RetryTransport",
+    "AsyncRetryTransport",
+    "HTTPConfig",
+]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = None, minRate: float = 0.5) -> None:
+        """令牌桶限流, 被限流时减半速率, 成功时逐步恢复
+
+        同一个令牌桶可以被多个客户端（包括同步和异步客户端）共享
+
+        Args:
+            rate (float): 每秒请求数上限
+            burst (int, optional): 突发请求数, 默认为 `rate`
+            minRate (float, optional): 减速后的最低速率
+        """
+        self.maxRate = rate
+        self.rate = rate
+        self.minRate = minRate
+        self.capacity = burst if burst is not None else max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.pausedUntil = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """预订一个令牌
+
+        Returns:
+            float: 发出请求前需要等待的秒数
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.pausedUntil - now)
+
+    def pause(self, seconds: float) -> None:
+        """在 `seconds` 秒内暂停所有请求, 用于遵守 Retry-After
+
+        Args:
+            seconds (float): 秒数
+        """
+        with self.lock:
+            self.pausedUntil = max(self.pausedUntil, time.monotonic() + seconds)
+
+    def slowDown(self) -> None:
+        """被限流后速率减半"""
+        with self.lock:
+            self.rate = max(self.minRate, self.rate / 2)
+
+    def speedUp(self) -> None:
+        """请求成功后逐步恢复速率"""
+        with self.lock:
+            self.rate = min(self.maxRate, self.rate + self.maxRate / 100)
+
+
+class TransportMetrics:
+    def __init__(self) -> None:
+        """请求计数"""
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.errors = 0
+        self.waited = 0.0
+
+    def add(self, **counts) -> None:
+        """累加计数
+
+        Args:
+            counts: 字段 -> 增量
+        """
+        with self.lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    @property
+    def stats(self) -> dict:
+        """计数统计
+
+        Returns:
+            dict: 请求数、重试数、被限流次数、失败数和限流等待的总秒数
+        """
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "waited": round(self.waited, 3),
+        }
+
+
+class RetryPolicy:
+    # 可以安全重发的请求方法
+    Idempotent = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+    def __init__(
+        self,
+        retries: int = 3,
+        backoff: float = 0.5,
+        maxBackoff: float = 30,
+        statuses: set[int] = frozenset({429, 500, 502, 503, 504}),
+    ) -> None:
+        """重试策略, 指数退避并加入随机抖动
+
+        Args:
+            retries (int, optional): 最多重试次数
+            backoff (float, optional): 第一次重试前的等待秒数
+            maxBackoff (float, optional): 最长等待秒数
+            statuses (set[int], optional): 需要重试的状态码
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.statuses = statuses
+
+    def retryResponse(self, request: httpx.Request, response: httpx.Response) -> bool:
+        """响应是否需要重试, 429 说明请求未被处理, 任何方法都可以重试
+
+        Args:
+            request (httpx.Request): 请求
+            response (httpx.Response): 响应
+
+        Returns:
+            bool: 是否重试
+        """
+        if response.status_code not in self.statuses:
+            return False
+        return response.status_code == 429 or request.method in self.Idempotent
+
+    def retryError(self, request: httpx.Request, error: httpx.TransportError) -> bool:
+        """连接异常是否需要重试, 连接未建立时请求一定没有发出
+
+        Args:
+            request (httpx.Request): 请求
+            error (httpx.TransportError): 异常
+
+        Returns:
+            bool: 是否重试
+        """
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+        return request.method in self.Idempotent
+
+    def delay(self, attempt: int, response: httpx.Response = None) -> float:
+        """计算重试前的等待秒数, 优先使用 Retry-After
+
+        Args:
+            attempt (int): 第几次重试, 从 0 开始
+            response (httpx.Response, optional): 响应
+
+        Returns:
+            float: 秒数
+        """
+        if response is not None and "retry-after" in response.headers:
+            retryAfter = parseRetryAfter(response.headers["retry-after"])
+            if retryAfter is not None:
+                return min(self.maxBackoff, retryAfter)
+        return random.uniform(0, min(self.maxBackoff, self.backoff * 2**attempt))
+
+
+def parseRetryAfter(value: str) -> float | None:
+    """解析 Retry-After, 可以是秒数或 HTTP 日期
+
+    Args:
+        value (str): 头部的值
+
+    Returns:
+        float | None: 秒数, 无法解析时为 `None`
+    """
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+def endpoint(url: httpx.URL) -> str:
+    """请求的接口, 用于按接口设置超时与统计
+
+    Args:
+        url (httpx.URL): 链接
+
+    Returns:
+        str: 图片为 `image`, 其余为去掉版本号的路径, 如 `/holes/detail`
+    """
+    if url.host.startswith("img."):
+        return "image"
+    return url.path.removeprefix("/v5")
+
+
+class RetryTransport(httpx.BaseTransport):
+    def __init__(
+        self,
+        transport: httpx.BaseTransport = None,
+        policy: RetryPolicy = None,
+        limiter: TokenBucket = None,
+        metrics: TransportMetrics = None,
+    ) -> None:
+        """带限流与重试的传输层
+
+        Args:
+            transport (httpx.BaseTransport, optional): 实际发送请求的传输层
+            policy (RetryPolicy, optional): 重试策略
+            limiter (TokenBucket, optional): 令牌桶, `None` 表示不限流
+            metrics (TransportMetrics, optional): 计数
+        """
+        self.transport = transport or httpx.HTTPTransport()
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter
+        self.metrics = metrics or TransportMetrics()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        with tracer.span("http", endpoint(request.url), method=request.method) as span:
+            attempt = 0
+            while True:
+                if self.limiter is not None:
+                    wait = self.limiter.reserve()
+                    if wait > 0:
+                        self.metrics.add(waited=wait)
+                        time.sleep(wait)
+                self.metrics.add(requests=1)
+                try:
+                    response = self.transport.handle_request(request)
+                except httpx.TransportError as e:
+                    self.metrics.add(errors=1)
+                    if attempt >= self.policy.retries or not self.policy.retryError(
+                        request, e
+                    ):
+                        raise
+                    delay = self.policy.delay(attempt)
+                else:
+                    if attempt >= self.policy.retries or not self.policy.retryResponse(
+                        request, response
+                    ):
+                        if self.limiter is not None and response.status_code < 400:
+                            self.limiter.speedUp()
+                        span["status"] = response.status_code
+                        if "content-length" in response.headers:
+                            span["bytes"] = int(response.headers["content-length"])
+                        return response
+                    delay = self.policy.delay(attempt, response)
+                    response.close()
+                    if response.status_code == 429:
+                        self.metrics.add(throttled=1)
+                        if self.limiter is not None:
+                            self.limiter.slowDown()
+                            self.limiter.pause(delay)
+                self.metrics.add(retries=1)
+                span["retries"] = attempt = attempt + 1
+                time.sleep(delay)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport = None,
+        policy: RetryPolicy = None,
+        limiter: TokenBucket = None,
+        metrics: TransportMetrics = None,
+    ) -> None:
+        """带限流与重试的异步传输层
+
+        Args:
+            transport (httpx.AsyncBaseTransport, optional): 实际发送请求的传输层
+            policy (RetryPolicy, optional): 重试策略
+            limiter (TokenBucket, optional): 令牌桶, `None` 表示不限流
+            metrics (TransportMetrics, optional): 计数
+        """
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.policy = policy or RetryPolicy()
+        self.limiter = limiter
+        self.metrics = metrics or TransportMetrics()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with tracer.span("http", endpoint(request.url), method=request.method) as span:
+            attempt = 0
+            while True:
+                if self.limiter is not None:
+                    wait = self.limiter.reserve()
+                    if wait > 0:
+                        self.metrics.add(waited=wait)
+                        await asyncio.sleep(wait)
+                self.metrics.add(requests=1)
+                try:
+                    response = await self.transport.handle_async_request(request)
+                except httpx.TransportError as e:
+                    self.metrics.add(errors=1)
+                    if attempt >= self.policy.retries or not self.policy.retryError(
+                        request, e
+                    ):
+                        raise
+                    delay = self.policy.delay(attempt)
+                else:
+                    if attempt >= self.policy.retries or not self.policy.retryResponse(
+                        request, response
+                    ):
+                        if self.limiter is not None and response.status_code < 400:
+                            self.limiter.speedUp()
+                        span["status"] = response.status_code
+                        if "content-length" in response.headers:
+                            span["bytes"] = int(response.headers["content-length"])
+                        return response
+                    delay = self.policy.delay(attempt, response)
+                    await response.aclose()
+                    if response.status_code == 429:
+                        self.metrics.add(throttled=1)
+                        if self.limiter is not None:
+                            self.limiter.slowDown()
+                            self.limiter.pause(delay)
+                self.metrics.add(retries=1)
+                span["retries"] = attempt = attempt + 1
+                await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class HTTPConfig:
+    def __init__(
+        self,
+        http2: bool = False,
+        api: dict = None,
+        image: dict = None,
+        timeouts: dict = None,
+        warmup: bool = False,
+    ) -> None:
+        """连接配置, API 与图片使用各自的连接池
+
+        Args:
+            http2 (bool, optional): 是否使用 HTTP/2, 需要安装 h2
+            api (dict, optional): API 连接池, 可包含 `maxConnections`,
+                `maxKeepalive` 与 `keepaliveExpiry`
+            image (dict, optional): 图片连接池, 参数同 `api`
+            timeouts (dict, optional): 超时秒数, 键为 `default`, `image`
+                或 API 路径, 如 `/holes/detail`
+            warmup (bool, optional): 启动时是否预先建立连接
+        """
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                log.warning("未安装 h2, 使用 HTTP/1.1")
+                http2 = False
+        self.http2 = http2
+        self.pools = {
+            "api": {"maxConnections": 100, "maxKeepalive": 20, **(api or {})},
+            "image": {"maxConnections": 16, "maxKeepalive": 16, **(image or {})},
+        }
+        self.timeouts = {"default": 5.0, "image": 30.0, **(timeouts or {})}
+        self.warmup = warmup
+
+    def limits(self, pool: str) -> httpx.Limits:
+        """连接池大小
+
+        Args:
+            pool (str): `api` 或 `image`
+
+        Returns:
+            httpx.Limits: 连接池大小
+        """
+        config = self.pools[pool]
+        return httpx.Limits(
+            max_connections=config["maxConnections"],
+            max_keepalive_connections=config["maxKeepalive"],
+            keepalive_expiry=config.get("keepaliveExpiry", 5.0),
+        )
+
+    def transport(self, pool: str) -> httpx.HTTPTransport:
+        """创建连接池
+
+        Args:
+            pool (str): `api` 或 `image`
+
+        Returns:
+            httpx.HTTPTransport: 传输层
+        """
+        return httpx.HTTPTransport(http2=self.http2, limits=self.limits(pool))
+
+    def asyncTransport(self, pool: str) -> httpx.AsyncHTTPTransport:
+        """创建异步连接池
+
+        Args:
+            pool (str): `api` 或 `image`
+
+        Returns:
+            httpx.AsyncHTTPTransport: 传输层
+        """
+        return httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits(pool))
+
+    def timeout(self) -> httpx.Timeout:
+        """默认超时, 排队等待连接不会超时
+
+        Returns:
+            httpx.Timeout: 超时
+        """
+        return httpx.Timeout(self.timeouts["default"], pool=None)
+
+    def applyTimeout(self, request: httpx.Request) -> None:
+        """按接口设置超时, 作为 `event_hooks` 的 `request` 钩子
+
+        Args:
+            request (httpx.Request): 请求
+        """
+        name = endpoint(request.url)
+        seconds = self.timeouts.get(name)
+        if seconds is None:
+            return
+        request.extensions["timeout"] = httpx.Timeout(seconds, pool=None).as_dict()
+
+    async def applyTimeoutAsync(self, request: httpx.Request) -> None:
+        """`applyTimeout` 的异步版本, 用于 `httpx.AsyncClient`
+
+        Args:
+            request (httpx.Request): 请求
+        """
+        self.applyTimeout(request)
@@ -0,0 +1,172 @@
+import json
+import queue
+import threading
+from collections import deque
+from typing import Callable
+
+from ._exception import UnexpectedCode
+from ._log import log
+from .sylva import Sylva
+from .sylva_sync import SylvaSync
+
+__all__ = ["SylvaWatcher"]
+
+
+class SylvaWatcher:
+    def __init__(
+        self,
+        sylva: Sylva,
+        sylvaSync: SylvaSync = None,
+        interval: float = 15,
+        maxInterval: float = 300,
+        backoff: float = 1.5,
+        remember: int = 1000,
+    ) -> None:
+        """后台轮询通知、系统通知与同步中的树洞, 新事件放入队列, 由主线程在提示符前输出
+
+        没有新事件时轮询间隔逐渐变长, 有新事件时恢复为 `interval`,
+        通知使用 ETag/Last-Modified 发送条件请求, 未变化时服务器只需返回 304
+
+        Args:
+            sylva (Sylva): 已登录的客户端
+            sylvaSync (SylvaSync, optional): 增量同步, `None` 表示不轮询树洞
+            interval (float, optional): 最短轮询间隔（秒）
+            maxInterval (float, optional): 最长轮询间隔（秒）
+            backoff (float, optional): 没有新事件时间隔的增长倍数
+            remember (int, optional): 用于去重的最近事件数量
+        """
+        self.sylva = sylva
+        self.sylvaSync = sylvaSync
+        self.interval = interval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.delay = interval
+        # (类型, 内容), 类型为 notification, system 或 reply
+        self.events = queue.Queue()
+        # 接口 -> (ETag, Last-Modified)
+        self.validators = {}
+        self.seen = set()
+        self.order = deque()
+        self.remember = remember
+        # 第一次轮询只记录已有的通知
+        self.primed = False
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> None:
+        """启动后台线程"""
+        if self.running:
+            return
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="sylva-watcher")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self) -> None:
+        """停止后台线程"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self) -> None:
+        while True:
+            try:
+                found = self.check()
+            except Exception as e:
+                log.warning(f"轮询失败：{e}")
+                found = 0
+            if found:
+                self.delay = self.interval
+            else:
+                self.delay = min(self.maxInterval, self.delay * self.backoff)
+            if self.stopped.wait(self.delay):
+                break
+
+    def check(self) -> int:
+        """轮询一次
+
+        Returns:
+            int: 新事件数量
+        """
+        found = 0
+        for kind, fetch in (
+            ("notification", self.sylva.getNotifications),
+            ("system", self.sylva.getSystemMessages),
+        ):
+            for i in self.fetch(kind, fetch):
+                if self.remembers(kind, i) or not self.primed:
+                    continue
+                self.events.put((kind, i))
+                found += 1
+        self.primed = True
+        if self.sylvaSync is not None:
+            for pid, replies in self.sylvaSync.poll().items():
+                self.events.put(("reply", (pid, replies)))
+                found += 1
+        return found
+
+    def fetch(self, kind: str, fetch: Callable) -> list:
+        """发送条件请求
+
+        Args:
+            kind (str): 类型
+            fetch (Callable): `getNotifications` 或 `getSystemMessages`
+
+        Raises:
+            UnexpectedCode: 异常
+
+        Returns:
+            list: 通知, 未变化时为空
+        """
+        etag, lastModified = self.validators.get(kind, (None, None))
+        resp = fetch(etag=etag, lastModified=lastModified)
+        if resp.status_code == 304:
+            return []
+        got = resp.json()
+        if isinstance(got, dict) and "code" in got:
+            raise UnexpectedCode(got)
+        self.validators[kind] = (
+            resp.headers.get("etag"),
+            resp.headers.get("last-modified"),
+        )
+        return got if isinstance(got, list) else [got]
+
+    def remembers(self, kind: str, item: dict) -> bool:
+        """记录事件, 已经见过的事件返回 `True`
+
+        Args:
+            kind (str): 类型
+            item (dict): 通知
+
+        Returns:
+            bool: 是否已经见过
+        """
+        key = item.get("id") if isinstance(item, dict) else None
+        if key is None:
+            key = json.dumps(item, sort_keys=True, ensure_ascii=False)
+        key = (kind, key)
+        if key in self.seen:
+            return True
+        self.seen.add(key)
+        self.order.append(key)
+        while len(self.order) > self.remember:
+            self.seen.discard(self.order.popleft())
+        return False
+
+    def drain(self) -> list[tuple]:
+        """取出所有新事件, 不会阻塞
+
+        Returns:
+            list[tuple]: (类型, 内容)
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events